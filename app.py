@@ -1,12 +1,20 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import Flask, Response, request, jsonify, render_template, send_from_directory, stream_with_context
 from flask_cors import CORS
+import atexit
 import logging
 import json
-import uuid
-import re
-from datetime import datetime
 import os
-import random
+import time
+from intent_engine import get_catalog
+from caching import LRUCache
+from sentiment_engine import LEXICONS
+from text_processing import preprocess
+from slot_extraction import FactStore
+from async_memory import AsyncEnhancedMemoryManager, BackgroundLoop
+from session_ids import new_session_id
+from chat_history import Exchange, SessionHistories, session_history
+from session_export import dumps, next_cursor, page_args, to_ndjson
+from session_import import IMPORT_CHUNK_SIZE, import_sessions, read_ndjson
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -25,116 +33,147 @@ CORS(app, origins=[
     "http://localhost:3000"
 ], methods=["GET", "POST", "OPTIONS"])
 
-# In-memory storage
-chat_sessions = {}
-user_data = {}
+# In-memory storage: session_id -> ChatHistory ring buffer,
+# sharded with a lock per shard so request threads can share it
+chat_sessions = SessionHistories()
 
-def generate_enhanced_response(user_input, session_id):
-    """Enhanced response generation with intelligent patterns"""
-    user_input_lower = user_input.lower().strip()
-    
-    # Handle name introduction
-    name_match = re.search(r'my name is (\w+)', user_input_lower)
-    if name_match:
-        name = name_match.group(1).title()
-        user_data[session_id] = user_data.get(session_id, {})
-        user_data[session_id]['name'] = name
-        return f"Nice to meet you, {name}! I'll remember that. How can I help you today?"
-    
-    # Handle favorite color
-    color_match = re.search(r'my (?:favorite|fav) color is (\w+)', user_input_lower)
-    if color_match:
-        color = color_match.group(1)
-        user_data[session_id] = user_data.get(session_id, {})
-        user_data[session_id]['favorite_color'] = color
-        return f"{color.title()} is a lovely color! I'll remember that you like {color}."
-    
-    # Handle memory questions
-    if 'what did i say' in user_input_lower or 'did i say' in user_input_lower:
-        if session_id in user_data:
-            data = user_data[session_id]
-            if 'name' in data and 'name' in user_input_lower:
-                return f"You told me your name is {data['name']}!"
-            elif 'favorite_color' in data and 'color' in user_input_lower:
-                return f"You said your favorite color is {data['favorite_color']}!"
-        return "I don't recall you mentioning that. Could you tell me again?"
-    
-    # Greetings
-    if any(greeting in user_input_lower for greeting in ['hello', 'hi', 'hey', 'good morning', 'good afternoon']):
-        return "Hello! I'm STAN, your AI assistant. How can I help you today?"
-    
-    # ⭐ FIXED: Casual greetings - THIS WAS THE MISSING PIECE!
-    elif any(phrase in user_input_lower for phrase in ["what's up", 'whats up', 'wassup', 'sup', "how's it going"]):
-        return "Not much, just here ready to chat with you! What's going on with you?"
-    
-    # Bot identity questions
-    elif ('name' in user_input_lower and any(word in user_input_lower for word in ['your', 'what', 'called'])) or "what's your name" in user_input_lower:
-        return "I'm STAN, your AI assistant! It's nice to meet you. What's your name?"
-    
-    # Bot confirmation
-    elif any(phrase in user_input_lower for phrase in ['are you a bot', 'are you real', 'are you human', 'are you ai']):
-        return "Yes, I'm STAN, an AI chatbot assistant! I'm here to help and chat with you."
+# Optional local persistence: every exchange is journaled to
+# SESSION_JOURNAL_DIR and recovered from it on start
+if os.environ.get('SESSION_JOURNAL_DIR'):
+    recovery = chat_sessions.open_journal(os.environ['SESSION_JOURNAL_DIR'])
+    atexit.register(chat_sessions.close_journal)
+    logger.info(f"Recovered {len(chat_sessions)} sessions in {recovery['recovery_ms']:.0f} ms")
+fact_store = FactStore()
+
+# Intent/sentiment cache for repeated messages ("hi", "Hi!", "thanks!!")
+response_cache = LRUCache(int(os.environ.get('RESPONSE_CACHE_SIZE', 4096)))
+
+# Largest number of items accepted by /chat/batch
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 5000))
+
+# Shared intent catalog (intents.json), compiled once and hot-reloaded
+intent_catalog = get_catalog()
+
+# Conversation memory for /chat/async: MongoDB via motor when MONGODB_URI is
+# set, in-memory otherwise. Its I/O runs on one background event loop.
+async_memory = AsyncEnhancedMemoryManager(mongodb_uri=os.environ.get('MONGODB_URI'),
+                                          session_cache_size=int(os.environ.get('SESSION_CACHE_SIZE', 1000)))
+storage_loop = BackgroundLoop()
+storage_loop.call(async_memory.connect())
+
+def _generate_response(user_input, session_id, engine, facts=None):
+    """Resolve (response, intent, cacheable) for a message.
     
-    # How are you questions
-    elif any(phrase in user_input_lower for phrase in ['how are you', 'how do you feel', 'how is it going']):
-        return "I'm doing great, thank you for asking! I'm ready to help you with whatever you need. How are you doing today?"
+    ``facts`` are the (slot, value) pairs already extracted from the message,
+    if the caller has them. Personalized branches (fact capture and memory
+    questions) are never cacheable.
+    """
+    text = preprocess(user_input)
+    user_input_lower = text.text
     
-    # Emotional support
-    elif any(word in user_input_lower for word in ['sad', 'down', 'depressed', 'upset']):
-        return "I'm sorry you're feeling down. Would you like to talk about what's bothering you? I'm here to listen."
+    # Remember facts the user shares (name, favorite color, ...)
+    if facts is None:
+        facts = engine.slots.extract(user_input_lower)
+    if facts:
+        fact_store.update(session_id, {slot.key: value for slot, value in facts})
+        slot, value = facts[0]
+        return slot.confirm(value), 'remember_' + slot.key, False
     
-    elif any(word in user_input_lower for word in ['happy', 'excited', 'great', 'awesome']):
-        return "That's wonderful! I love hearing when people are happy. What's made your day so great?"
+    intent = engine.match(text)
     
-    # Jokes
-    elif any(word in user_input_lower for word in ['joke', 'funny', 'humor', 'laugh']):
-        jokes = [
-            "Why don't scientists trust atoms? Because they make up everything! 😄",
-            "What do you call a fake noodle? An impasta! 🍝",
-            "Why did the scarecrow win an award? He was outstanding in his field! 🌾"
-        ]
-        return random.choice(jokes)
+    # Handle memory questions
+    if intent == 'memory_question':
+        response = engine.slots.recall(user_input_lower, fact_store.facts(session_id))
+        if response:
+            return response, intent, False
+        return "I don't recall you mentioning that. Could you tell me again?", intent, False
     
-    # Capabilities
-    elif any(phrase in user_input_lower for phrase in ['what can you do', 'help me', 'your capabilities']):
-        return "I can help with conversations, answer questions, tell jokes, provide support, and much more! What would you like to try?"
+    return engine.response_for(intent), intent, True
+
+def generate_enhanced_response(user_input, session_id):
+    """Enhanced response generation with intelligent patterns"""
+    return _generate_response(user_input, session_id, intent_catalog.engine('full'))[0]
+
+def analyze_sentiment(message):
+    """Simple sentiment analysis"""
+    return LEXICONS['full'].analyze(message)
+
+def respond_to_message(message, session_id, sentiment=None):
+    """Return (response, sentiment), reusing cached intent and sentiment.
     
-    # Boredom
-    elif any(word in user_input_lower for word in ['bored', 'boring', 'nothing to do']):
-        return "Let's fix that boredom! We could chat about your interests, I could tell you a joke, or help you brainstorm activities!"
+    The message is preprocessed once and the same NormalizedText feeds intent
+    matching and sentiment analysis. The cache is keyed on the normalized
+    message text and only holds the resolved intent and sentiment, so the
+    response text is still picked per request. Personalized messages are never
+    cached. ``sentiment`` is the message's label when the caller has already
+    scored it (``chat_batch`` scores a whole batch at once).
+    """
+    message = preprocess(message)
+    engine = intent_catalog.engine('full')
+    facts = engine.slots.extract(message.text)
+    key = engine.normalize(message)
+    if not facts:
+        cached = response_cache.get(key)
+        if cached is not None and cached[0] is engine:
+            _, intent, sentiment = cached
+            return engine.response_for(intent), sentiment
     
-    # Thank you
-    elif any(word in user_input_lower for word in ['thank', 'thanks', 'appreciate']):
-        return "You're very welcome! I'm glad I could help. Is there anything else you'd like to know or discuss?"
+    response, intent, cacheable = _generate_response(message, session_id, engine, facts)
+    if sentiment is None:
+        sentiment = analyze_sentiment(message)
+    if cacheable:
+        response_cache.put(key, (engine, intent, sentiment))
+    return response, sentiment
+
+def chat_batch(items):
+    """Process a batch of {session_id, message} items in one call.
     
-    # Goodbye
-    elif any(word in user_input_lower for word in ['bye', 'goodbye', 'see you', 'talk later']):
-        return "Goodbye! It was great chatting with you. Feel free to come back anytime!"
+    Items are handled in list order, so messages of the same session keep their
+    order. Every item gets its own result dict (or an ``error`` entry) at the
+    same position in the returned list, and each session's exchanges are
+    appended to storage in a single step. The valid messages are scored for
+    sentiment together, with one vectorized ``analyze_batch`` call.
+    """
+    results = []
+    pending = {}
+    timestamp = time.time()
+    valid = [isinstance(item, dict) and isinstance(item.get('message'), str) and bool(item['message'])
+             for item in items]
+    sentiments = iter(LEXICONS['full'].analyze_batch(
+        [item['message'] for item, ok in zip(items, valid) if ok]))
     
-    # Default responses
-    else:
-        responses = [
-            "That's interesting! Tell me more about that.",
-            "I see. What else would you like to discuss?", 
-            "Thanks for sharing that with me. How can I help you further?",
-            "I understand. What would you like to know more about?"
-        ]
-        return random.choice(responses)
-
-def analyze_sentiment(message):
-    """Simple sentiment analysis"""
-    positive_words = ['happy', 'good', 'great', 'awesome', 'love', 'like', 'wonderful']
-    negative_words = ['sad', 'bad', 'awful', 'hate', 'dislike', 'terrible', 'upset']
+    for item, ok in zip(items, valid):
+        if not ok:
+            results.append({'error': 'Message is required'})
+            continue
+        
+        message = item['message']
+        session_id = item.get('session_id') or new_session_id()
+        
+        try:
+            response, sentiment = respond_to_message(message, session_id, next(sentiments))
+        except Exception as e:
+            logger.error(f"Batch chat error: {str(e)}")
+            results.append({'session_id': session_id, 'error': 'An error occurred'})
+            continue
+        
+        exchanges = pending.setdefault(session_id, [])
+        exchanges.append(Exchange(message, response, timestamp, sentiment))
+        history = chat_sessions.get(session_id)
+        exchange_count = (history.total if history else 0) + len(exchanges)
+        
+        results.append({
+            'response': response,
+            'session_id': session_id,
+            'sentiment': sentiment,
+            'context': f"Conversation has {exchange_count} exchanges"
+        })
     
-    message_lower = message.lower()
-    positive_count = sum(1 for word in positive_words if word in message_lower)
-    negative_count = sum(1 for word in negative_words if word in message_lower)
+    # Store conversations
+    for session_id, exchanges in pending.items():
+        session_history(chat_sessions, session_id).extend(exchanges)
     
-    if positive_count > negative_count:
-        return 'positive'
-    elif negative_count > positive_count:
-        return 'negative'
-    return 'neutral'
+    return results
 
 # Frontend route
 @app.route('/')
@@ -151,8 +190,15 @@ def api_info():
             "/": "Frontend chatbot interface",
             "/api": "API information",
             "/chat": "POST - Send message to chatbot",
+            "/chat/batch": "POST - Send a list of {session_id, message} items",
+            "/chat/async": "POST - Send message, stored by the async memory manager",
             "/health": "GET - Health check",
-            "/stats": "GET - Get statistics"
+            "/stats": "GET - Get statistics",
+            "/data": "GET - Page through stored conversations (?cursor=&limit=)",
+            "/data/export": "GET - Stream every stored conversation as NDJSON",
+            "/data/import": "POST - Load an NDJSON archive from /data/export",
+            "/data/memory": "GET - Page through async memory sessions (?cursor=&limit=)",
+            "/data/memory/export": "GET - Stream every async memory session as NDJSON"
         },
         "features": [
             "Enhanced response patterns",
@@ -170,24 +216,16 @@ def chat():
             return jsonify({'error': 'Message is required'}), 400
         
         message = data['message']
-        session_id = data.get('session_id', str(uuid.uuid4()))
+        session_id = data.get('session_id', new_session_id())
         
         # Generate enhanced response
-        response = generate_enhanced_response(message, session_id)
-        sentiment = analyze_sentiment(message)
+        response, sentiment = respond_to_message(message, session_id)
         
         # Store conversation
-        if session_id not in chat_sessions:
-            chat_sessions[session_id] = []
-        
-        chat_sessions[session_id].append({
-            'user': message,
-            'bot': response,
-            'timestamp': datetime.now().isoformat(),
-            'sentiment': sentiment
-        })
+        history = session_history(chat_sessions, session_id)
+        history.append(Exchange(message, response, sentiment=sentiment))
         
-        exchange_count = len(chat_sessions[session_id])
+        exchange_count = history.total
         context = f"Conversation has {exchange_count} exchanges"
         
         logger.info(f"Chat - Session: {session_id}, Message: {message}, Response: {response[:50]}...")
@@ -203,6 +241,57 @@ def chat():
         logger.error(f"Chat error: {str(e)}")
         return jsonify({'error': 'An error occurred'}), 500
 
+@app.route('/chat/async', methods=['POST'])
+async def chat_async():
+    try:
+        data = request.get_json()
+        if not data or 'message' not in data:
+            return jsonify({'error': 'Message is required'}), 400
+        
+        message = data['message']
+        session_id = data.get('session_id', new_session_id())
+        
+        response, sentiment = respond_to_message(message, session_id)
+        
+        # Store the exchange without blocking on database round trips
+        await storage_loop.run(async_memory.add_message(session_id, message, response, sentiment))
+        context = await storage_loop.run(async_memory.get_context_summary(session_id))
+        
+        logger.info(f"Async chat - Session: {session_id}, Message: {message}, Response: {response[:50]}...")
+        
+        return jsonify({
+            'response': response,
+            'session_id': session_id,
+            'sentiment': sentiment,
+            'context': context
+        })
+        
+    except Exception as e:
+        logger.error(f"Async chat error: {str(e)}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch_route():
+    try:
+        data = request.get_json(silent=True)
+        items = data.get('items') if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            return jsonify({'error': 'A list of items is required'}), 400
+        if len(items) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'Batch size exceeds limit of {MAX_BATCH_SIZE}'}), 400
+        
+        results = chat_batch(items)
+        logger.info(f"Batch chat - {len(items)} items")
+        
+        return jsonify({
+            'results': results,
+            'count': len(results)
+        })
+        
+    except Exception as e:
+        logger.error(f"Batch chat error: {str(e)}")
+        return jsonify({'error': 'An error occurred'}), 500
+
 @app.route('/health')
 def health():
     return jsonify({
@@ -218,19 +307,84 @@ def health():
 def stats():
     return jsonify({
         'total_sessions': len(chat_sessions),
-        'total_messages': sum(len(session) for session in chat_sessions.values()),
+        'total_messages': chat_sessions.total_messages,
         'storage_type': 'in-memory',
-        'deployment_type': 'full-stack'
+        'deployment_type': 'full-stack',
+        'response_cache': response_cache.stats(),
+        'async_memory': storage_loop.call(async_memory.get_session_stats()),
+        'journal': chat_sessions.journal.metrics() if chat_sessions.journal is not None else None
     })
 
+def _with_facts(record):
+    """An in-memory history record with the session's remembered facts"""
+    record['user_data'] = fact_store.facts(record['session_id'])
+    return record
+
+def _history_page(after, limit):
+    """A page of in-memory histories with each session's remembered facts"""
+    return [_with_facts(record) for record in chat_sessions.page(after, limit)]
+
+def _ndjson_response(records, name):
+    return Response(stream_with_context(to_ndjson(records)), mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': f'attachment; filename={name}.ndjson'})
+
 @app.route('/data')
 def view_data():
+    """One page of stored conversations; pass ``next_cursor`` back as ``cursor``"""
+    try:
+        cursor, limit = page_args(request.args)
+    except ValueError:
+        return jsonify({'error': 'limit must be a positive integer'}), 400
+    records = _history_page(cursor, limit)
     return jsonify({
-        'sessions': chat_sessions,
-        'user_data': user_data,
+        'sessions': {record['session_id']: record['history'] for record in records},
+        'user_data': {record['session_id']: record['user_data'] for record in records if record['user_data']},
+        'next_cursor': next_cursor(records, limit),
         'total_sessions': len(chat_sessions)
     })
 
+@app.route('/data/export')
+def export_data():
+    """Every stored conversation as NDJSON, streamed one session per line"""
+    return _ndjson_response(map(_with_facts, chat_sessions.export()), 'sessions')
+
+def _import_histories(records):
+    """Load a chunk of exported records into chat_sessions and the fact store"""
+    chat_sessions.load(records)
+    for record in records:
+        if record.get('user_data'):
+            fact_store.update(record['session_id'], record['user_data'])
+
+@app.route('/data/import', methods=['POST'])
+def import_data():
+    """Load an NDJSON archive from /data/export, read from the request body a chunk at a time"""
+    try:
+        chunk_size = int(request.args.get('chunk_size', IMPORT_CHUNK_SIZE))
+        stats = import_sessions(read_ndjson(request.stream), _import_histories, chunk_size)
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': f'Invalid archive: {e}'}), 400
+    logger.info(f"Imported {stats}")
+    return jsonify(stats.to_dict())
+
+@app.route('/data/memory')
+def view_memory():
+    """One page of sessions from the async memory manager (MongoDB or in-memory)"""
+    try:
+        cursor, limit = page_args(request.args)
+    except ValueError:
+        return jsonify({'error': 'limit must be a positive integer'}), 400
+    records = storage_loop.call(async_memory.page_sessions(cursor, limit))
+    return Response(dumps({
+        'sessions': records,
+        'next_cursor': next_cursor(records, limit),
+        'storage_type': async_memory.storage_type
+    }), mimetype='application/json')
+
+@app.route('/data/memory/export')
+def export_memory():
+    """Every session of the async memory manager as NDJSON, fetched a batch at a time"""
+    return _ndjson_response(storage_loop.iterate(async_memory.export_sessions()), 'memory_sessions')
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
@@ -1,11 +1,18 @@
 """
 Lightweight STAN Chatbot - Reduced Memory Usage
 """
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
+import atexit
 import logging
+import os
 import json
-import uuid
-from datetime import datetime
+from intent_engine import get_catalog
+from sentiment_engine import LEXICONS
+from text_processing import preprocess
+from session_ids import new_session_id
+from chat_history import Exchange, SessionHistories, session_history
+from session_export import next_cursor, page_args, to_ndjson
+from session_import import IMPORT_CHUNK_SIZE, import_sessions, read_ndjson
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -13,99 +20,32 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
-# Simple in-memory storage
-chat_sessions = {}
+# Simple in-memory storage: session_id -> ChatHistory ring buffer,
+# sharded with a lock per shard so request threads can share it
+chat_sessions = SessionHistories()
+
+# Optional local persistence: every exchange is journaled to
+# SESSION_JOURNAL_DIR and recovered from it on start
+if os.environ.get('SESSION_JOURNAL_DIR'):
+    recovery = chat_sessions.open_journal(os.environ['SESSION_JOURNAL_DIR'])
+    atexit.register(chat_sessions.close_journal)
+    logger.info(f"Recovered {len(chat_sessions)} sessions in {recovery['recovery_ms']:.0f} ms")
 
 class SimpleChatbot:
     """Lightweight chatbot without heavy ML models"""
     
     def __init__(self):
-        self.responses = {
-            'greeting': [
-                "Hello! I'm STAN, your AI assistant. How can I help you today?",
-                "Hi there! I'm here to assist you. What can I do for you?",
-                "Welcome! I'm STAN. What would you like to know?",
-            ],
-            'how_are_you': [
-                "I'm doing great, thank you for asking! How are you?",
-                "I'm functioning well and ready to help! How can I assist you?",
-            ],
-            'capabilities': [
-                "I can help you with conversations, answer questions, provide assistance with various topics, and even tell jokes!",
-                "I'm here to chat, provide information, tell jokes, and help with any questions you might have!",
-            ],
-            'jokes': [
-                "Why don't scientists trust atoms? Because they make up everything! 😄",
-                "Why did the scarecrow win an award? Because he was outstanding in his field! 🌾",
-                "What do you call a fake noodle? An impasta! 🍝",
-                "Why don't eggs tell jokes? They'd crack each other up! 🥚",
-                "What do you call a bear with no teeth? A gummy bear! 🐻",
-                "Why did the math book look so sad? Because it had too many problems! 📚",
-                "What's the best thing about Switzerland? I don't know, but the flag is a big plus! 🇨🇭"
-            ],
-            'thanks': [
-                "You're very welcome! Happy to help!",
-                "My pleasure! Is there anything else I can assist you with?",
-            ],
-            'default': [
-                "That's interesting! Tell me more about that.",
-                "I understand. What would you like to know more about?",
-                "Thanks for sharing that with me. How can I help you further?",
-                "I see. What else would you like to discuss?",
-            ]
-        }
+        # Keyword patterns and responses come from the shared intent catalog
+        self.catalog = get_catalog()
         logger.info("✅ Lightweight chatbot initialized")
     
     def analyze_sentiment(self, text):
         """Simple sentiment analysis"""
-        positive_words = ['good', 'great', 'excellent', 'happy', 'love', 'wonderful', 'amazing']
-        negative_words = ['bad', 'terrible', 'sad', 'hate', 'awful', 'horrible', 'angry']
-        
-        text_lower = text.lower()
-        
-        positive_count = sum(1 for word in positive_words if word in text_lower)
-        negative_count = sum(1 for word in negative_words if word in text_lower)
-        
-        if positive_count > negative_count:
-            return 'positive'
-        elif negative_count > positive_count:
-            return 'negative'
-        else:
-            return 'neutral'
+        return LEXICONS['lightweight'].analyze(text)
     
     def generate_response(self, user_input, history=None):
         """Generate response based on keywords"""
-        user_input_lower = user_input.lower()
-        
-        # Greeting patterns
-        if any(word in user_input_lower for word in ['hello', 'hi', 'hey', 'greetings']):
-            import random
-            return random.choice(self.responses['greeting'])
-        
-        # How are you patterns
-        elif any(phrase in user_input_lower for phrase in ['how are you', 'how are you doing']):
-            import random
-            return random.choice(self.responses['how_are_you'])
-        
-        # Joke patterns
-        elif any(phrase in user_input_lower for phrase in ['joke', 'funny', 'make me laugh', 'tell me something funny']):
-            import random
-            return random.choice(self.responses['jokes'])
-        
-        # Capabilities patterns
-        elif any(phrase in user_input_lower for phrase in ['what can you do', 'help me', 'capabilities']):
-            import random
-            return random.choice(self.responses['capabilities'])
-        
-        # Thanks patterns
-        elif any(word in user_input_lower for word in ['thank', 'thanks', 'appreciate']):
-            import random
-            return random.choice(self.responses['thanks'])
-        
-        # Default response
-        else:
-            import random
-            return random.choice(self.responses['default'])
+        return self.catalog.engine('lightweight').respond(preprocess(user_input))
 
 # Initialize lightweight chatbot
 chatbot = SimpleChatbot()
@@ -121,36 +61,25 @@ def chat():
     try:
         data = request.get_json()
         user_message = data.get('message', '').strip()
-        session_id = data.get('session_id', str(uuid.uuid4()))
+        session_id = data.get('session_id', new_session_id())
         
         if not user_message:
             return jsonify({'error': 'Empty message'}), 400
         
-        # Simple sentiment analysis
-        sentiment = chatbot.analyze_sentiment(user_message)
+        # Normalize once for sentiment and intent matching
+        text = preprocess(user_message)
         
-        # Get or create session
-        if session_id not in chat_sessions:
-            chat_sessions[session_id] = []
+        # Simple sentiment analysis
+        sentiment = chatbot.analyze_sentiment(text)
         
-        history = chat_sessions[session_id]
+        # Get or create session (keeps the last Config.MAX_CHAT_HISTORY exchanges)
+        history = session_history(chat_sessions, session_id)
         
         # Generate response
-        bot_response = chatbot.generate_response(user_message, history)
+        bot_response = chatbot.generate_response(text, history)
         
         # Store conversation
-        history.append({
-            'user': user_message,
-            'bot': bot_response,
-            'timestamp': datetime.now().isoformat(),
-            'sentiment': sentiment
-        })
-        
-        # Keep only last 10 exchanges
-        if len(history) > 10:
-            history = history[-10:]
-        
-        chat_sessions[session_id] = history
+        history.append(Exchange(user_message, bot_response, sentiment=sentiment))
         
         # Create context summary
         context = f"Conversation has {len(history)} exchanges"
@@ -181,12 +110,10 @@ def health():
 def stats():
     """Get session statistics"""
     try:
-        total_messages = sum(len(session) for session in chat_sessions.values())
-        
         return jsonify({
             'total_sessions': len(chat_sessions),
             'active_sessions': len(chat_sessions),
-            'total_messages': total_messages,
+            'total_messages': chat_sessions.total_messages,
             'storage_type': 'In-Memory'
         })
     except Exception as e:
@@ -195,12 +122,18 @@ def stats():
 
 @app.route('/data')
 def view_data():
-    """View all stored conversation data"""
+    """View one page of stored conversation data; pass ``next_cursor`` back as ``cursor``"""
+    try:
+        cursor, limit = page_args(request.args)
+    except ValueError:
+        return jsonify({'error': 'limit must be a positive integer'}), 400
     try:
+        records = chat_sessions.page(cursor, limit)
         return jsonify({
             'storage_type': 'In-Memory',
             'total_sessions': len(chat_sessions),
-            'sessions': chat_sessions,
+            'sessions': {record['session_id']: record['history'] for record in records},
+            'next_cursor': next_cursor(records, limit),
             'data_structure': {
                 'session_id': 'Contains array of conversation exchanges',
                 'each_exchange': {
@@ -215,6 +148,24 @@ def view_data():
         logger.error(f"Error viewing data: {e}")
         return jsonify({'error': 'Failed to retrieve data'}), 500
 
+@app.route('/data/export')
+def export_data():
+    """Stream every stored conversation as NDJSON, one session per line"""
+    return Response(stream_with_context(to_ndjson(chat_sessions.export())),
+                    mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': 'attachment; filename=sessions.ndjson'})
+
+@app.route('/data/import', methods=['POST'])
+def import_data():
+    """Load an NDJSON archive from /data/export, read from the request body a chunk at a time"""
+    try:
+        chunk_size = int(request.args.get('chunk_size', IMPORT_CHUNK_SIZE))
+        stats = import_sessions(read_ndjson(request.stream), chat_sessions.load, chunk_size)
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': f'Invalid archive: {e}'}), 400
+    logger.info(f"Imported {stats}")
+    return jsonify(stats.to_dict())
+
 if __name__ == '__main__':
     logger.info("🚀 Starting lightweight STAN chatbot...")
     app.run(debug=True, host='127.0.0.1', port=5000)
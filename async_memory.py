@@ -0,0 +1,225 @@
+"""
+Asyncio memory management for STAN Chatbot
+"""
+
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Awaitable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from enhanced_features import EnhancedMemoryManager
+from expiry_scheduler import ExpiryScheduler
+from mongodb_config import MongoDBConfig, get_config
+from session_export import DEFAULT_PAGE_SIZE, EXPORT_BATCH_SIZE
+from storage_backends import AsyncMemoryBackend, AsyncMongoBackend, AsyncSessionBackend
+from text_processing import NormalizedText, preprocess
+from topic_taxonomy import get_taxonomy
+
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except ImportError:  # async MongoDB storage needs motor; in-memory mode still works
+    AsyncIOMotorClient = None
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncEnhancedMemoryManager:
+    """EnhancedMemoryManager with non-blocking MongoDB I/O.
+
+    Same API as ``EnhancedMemoryManager`` with every method a coroutine, so a
+    single event loop can keep many conversations waiting on the database at
+    once. MongoDB access goes through motor; without ``mongodb_uri`` (or
+    without motor, or when ``connect`` fails) sessions are kept in memory.
+    ``database`` accepts an already created async database object instead of
+    a URI. ``session_cache_size`` turns on a read-through ``SessionCache``
+    for MongoDB sessions. MongoDB expires idle sessions through a TTL index; the session
+    cap (and in-memory expiry) is enforced by a background scheduler that
+    ``connect`` starts on the manager's event loop. Storage goes through an
+    ``AsyncMongoBackend`` or ``AsyncMemoryBackend`` (see storage_backends).
+    """
+
+    # Messages kept per session history
+    HISTORY_LIMIT = EnhancedMemoryManager.HISTORY_LIMIT
+    TOUCH_INTERVAL = EnhancedMemoryManager.TOUCH_INTERVAL
+
+    def __init__(self, max_sessions=1000, session_timeout_hours=24, mongodb_uri: Optional[str] = None,
+                 database=None, cleanup_interval=60, cleanup_batch=1000, session_cache_size=0,
+                 session_cache_ttl=30, mongo_config: Optional[MongoDBConfig] = None):
+        self.mongo_config = mongo_config or get_config()
+        self.client = None
+        self.db = database
+        if database is None and mongodb_uri:
+            if AsyncIOMotorClient is None:
+                logger.error("motor is not installed, async memory falls back to in-memory storage")
+            else:
+                # motor clients belong to one event loop, so this one is not
+                # shared through the mongodb_config registry; pool settings are
+                self.client = AsyncIOMotorClient(mongodb_uri, **self.mongo_config.get_connection_options())
+                self.db = self.client[self.mongo_config.DATABASE_NAME]
+        self.preferences_collection = self.db.user_preferences if self.db is not None else None
+        self.user_preferences = {}
+
+        self.max_sessions = max_sessions
+        self.session_timeout = timedelta(hours=session_timeout_hours)
+        self._common = dict(max_sessions=max_sessions, ttl=self.session_timeout, history_limit=self.HISTORY_LIMIT)
+        self.backend: AsyncSessionBackend = AsyncMemoryBackend(**self._common)
+        if self.db is not None:
+            self.backend = AsyncMongoBackend(self.db.sessions, session_cache_size=session_cache_size,
+                                             session_cache_ttl=session_cache_ttl, touch_interval=self.TOUCH_INTERVAL,
+                                             **self._common)
+        self.taxonomy = get_taxonomy()
+        self.cleanup_interval = cleanup_interval
+        self.expiry = ExpiryScheduler(cleanup_interval or 0, cleanup_batch)
+
+    @property
+    def mongodb(self) -> bool:
+        return isinstance(self.backend, AsyncMongoBackend)
+
+    @property
+    def sessions_collection(self):
+        return getattr(self.backend, 'collection', None)
+
+    @property
+    def sessions(self):
+        """The in-memory ``SessionStore`` (in-memory mode only)"""
+        return self.backend.sessions
+
+    @property
+    def session_cache(self):
+        return getattr(self.backend, 'session_cache', None)
+
+    @property
+    def activity(self):
+        return self.backend.activity
+
+    async def connect(self):
+        """Create indexes and start background expiry on the running loop.
+
+        Falls back to in-memory storage if MongoDB is unreachable.
+        """
+        if not self.expiry.metrics()['jobs']:
+            self.expiry.add_job('sessions', self._cleanup_old_sessions, loop=asyncio.get_running_loop())
+            if self.cleanup_interval:
+                self.expiry.start()
+        if not self.mongodb:
+            return
+        try:
+            await self.backend.connect()
+            logger.info("Async MongoDB connection established successfully")
+        except Exception as e:
+            logger.error(f"Async MongoDB connection failed: {e}")
+            logger.info("Falling back to in-memory storage")
+            if self.client:
+                self.client.close()
+            self.client = None
+            self.db = self.preferences_collection = None
+            self.backend = AsyncMemoryBackend(**self._common)
+
+    async def get_session(self, session_id: str, fields: Optional[Iterable[str]] = None,
+                          history: Optional[int] = None) -> Dict:
+        """Get or create a session; ``fields`` and ``history`` as in ``EnhancedMemoryManager.get_session``"""
+        return await self.backend.get(session_id, fields, history)
+
+    async def add_message(self, session_id: str, user_message: Union[str, NormalizedText], bot_response: str,
+                          sentiment: str = None):
+        """Add message with enhanced context tracking"""
+        text = preprocess(user_message)
+
+        new_message = {
+            'timestamp': datetime.now().isoformat(),
+            'user': text.raw,
+            'bot': bot_response,
+            'sentiment': sentiment
+        }
+
+        # A single upsert in MongoDB mode, like EnhancedMemoryManager.add_message
+        await self.backend.append(session_id, new_message, self.taxonomy.extract(text))
+
+    async def get_context_summary(self, session_id: str) -> str:
+        """Generate context summary for better responses"""
+        session = await self.get_session(session_id, fields=('conversation_topics',), history=5)
+
+        if not session.get('history'):
+            return ""
+
+        topics = list(session.get('conversation_topics', []))[-3:]
+        return f"Recent topics: {', '.join(topics) if topics else 'general conversation'}"
+
+    async def _cleanup_old_sessions(self, budget: int = 1000) -> Tuple[int, int]:
+        """Remove up to ``budget`` expired or surplus sessions; returns (removed, still due)"""
+        return await self.backend.expire(budget)
+
+    async def page_sessions(self, after: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE) -> List[Dict]:
+        """Up to ``limit`` sessions whose id sorts after ``after``, as in ``EnhancedMemoryManager.page_sessions``"""
+        return await self.backend.page(after, limit)
+
+    def export_sessions(self, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[Dict]:
+        """Every stored session, one at a time, holding one batch in memory"""
+        return self.backend.export(batch_size)
+
+    @property
+    def storage_type(self) -> str:
+        return self.backend.storage_type
+
+    async def get_session_stats(self) -> Dict:
+        """Get statistics about stored sessions; O(1), as in ``EnhancedMemoryManager``"""
+        stats = await self.backend.stats()
+        stats["expiry"] = self.expiry.metrics()
+        return stats
+
+    async def close_connection(self):
+        """Stop background expiry and close MongoDB connection"""
+        # A tick may be waiting on this loop, so join the scheduler elsewhere
+        await asyncio.get_running_loop().run_in_executor(None, self.expiry.stop)
+        await self.backend.close()
+        if self.client:
+            self.client.close()
+            logger.info("Async MongoDB connection closed")
+
+
+class BackgroundLoop:
+    """An event loop running in a daemon thread.
+
+    Async drivers such as motor bind their connections to one event loop,
+    while Flask runs every async view in a fresh loop. Running storage
+    coroutines here lets a single client serve all requests in flight.
+    """
+
+    def __init__(self, name: str = 'stan-async-io'):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self._thread.start()
+
+    def run(self, coro) -> Awaitable:
+        """Schedule ``coro`` on the background loop; await the result from any loop"""
+        return asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+    def call(self, coro):
+        """Run ``coro`` on the background loop and block for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def iterate(self, items: AsyncIterator, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator:
+        """Iterate an async generator running on the background loop, pulling
+        ``batch_size`` items per hop between the threads"""
+        async def take():
+            batch = []
+            try:
+                while len(batch) < batch_size:
+                    batch.append(await items.__anext__())
+            except StopAsyncIteration:
+                pass
+            return batch
+
+        try:
+            while True:
+                batch = self.call(take())
+                yield from batch
+                if len(batch) < batch_size:
+                    return
+        finally:
+            self.call(items.aclose())
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Benchmark: blocking vs asyncio memory manager under concurrent conversations
+
+Both managers talk to an in-process fake MongoDB collection that simulates a
+fixed network round trip per command, so no mongod is needed.
+"""
+
+import sys
+import os
+import asyncio
+import time
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_mongo import FakeAsyncCollection, FakeCollection, async_manager, blocking_manager
+
+
+def conversation(session, count):
+    return [(f"session-{session}", f"message {i} about work and the weather", "Got it!") for i in range(count)]
+
+
+def run_blocking(sessions, messages, latency):
+    memory = blocking_manager(FakeCollection(latency))
+    start = time.perf_counter()
+    for session in range(sessions):
+        for session_id, message, response in conversation(session, messages):
+            memory.add_message(session_id, message, response, 'neutral')
+    return time.perf_counter() - start, memory
+
+
+def run_async(sessions, messages, latency):
+    memory = async_manager(FakeAsyncCollection(latency))
+
+    async def talk(session):
+        for session_id, message, response in conversation(session, messages):
+            await memory.add_message(session_id, message, response, 'neutral')
+
+    async def main():
+        start = time.perf_counter()
+        await asyncio.gather(*(talk(session) for session in range(sessions)))
+        return time.perf_counter() - start
+
+    return asyncio.run(main()), memory
+
+
+def run_benchmark(sessions=100, messages=5, latency=0.002):
+    total = sessions * messages
+    print(f"🔀 Memory manager throughput ({sessions} concurrent sessions, {messages} messages each, "
+          f"{latency * 1000:.0f} ms per round trip)")
+    print("=" * 60)
+    blocking, _ = run_blocking(sessions, messages, latency)
+    concurrent, _ = run_async(sessions, messages, latency)
+    print(f"blocking (one worker) {total / blocking:8.0f} messages/s")
+    print(f"asyncio  (one loop)   {total / concurrent:8.0f} messages/s   {blocking / concurrent:5.1f}x")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark: /chat throughput of the pre-fork cluster as workers are added
+
+Starts ``cluster.py`` with app_lightweight and drives it from several
+client processes, each talking to its own sessions over a keep-alive
+connection. One worker is the single-process baseline (plus the
+dispatcher hop); more workers only help with as many free cores, since
+each worker is one Python process. Also shows how much of each worker's
+memory is still shared with the master after the preload and gc.freeze().
+"""
+
+import sys
+import os
+import json
+import socket
+import subprocess
+import time
+import urllib.request
+from http.client import HTTPConnection
+from multiprocessing import Pool
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def call(port, path, body=None, headers=None):
+    """(JSON response, X-Worker header) of a request to the cluster"""
+    request = urllib.request.Request(f"http://127.0.0.1:{port}{path}",
+                                     data=json.dumps(body).encode() if body is not None else None,
+                                     headers={'Content-Type': 'application/json', **(headers or {})})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.load(response), response.headers.get('X-Worker')
+
+
+def wait_for(condition, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if condition():
+                return
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise AssertionError("timed out")
+
+
+def cluster_workers(port):
+    return call(port, '/cluster')[0]['workers']
+
+
+def start_cluster(workers, app='app_lightweight:app', env=None, drain_timeout=5):
+    """(master process, port) of a cluster whose workers all serve"""
+    port = free_port()
+    master = subprocess.Popen([sys.executable, 'cluster.py', '--app', app, '--workers', str(workers),
+                               '--port', str(port), '--drain-timeout', str(drain_timeout)],
+                              cwd=HERE, env=dict(os.environ, **(env or {})),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for(lambda: [worker['state'] for worker in cluster_workers(port)] == ['ready'] * workers)
+    except BaseException:
+        master.kill()
+        master.wait()
+        raise
+    return master, port
+
+
+def chat(args):
+    port, client, requests = args
+    connection = HTTPConnection('127.0.0.1', port)
+    start = time.perf_counter()
+    for i in range(requests):
+        connection.request('POST', '/chat', json.dumps({'message': "how is the weather today?",
+                                                        'session_id': f"client-{client}-{i % 20}"}),
+                           {'Content-Type': 'application/json'})
+        connection.getresponse().read()
+    connection.close()
+    return time.perf_counter() - start
+
+
+def memory_mb(pid):
+    """(resident, private) MB of a process, from /proc on Linux"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as smaps:
+        for line in smaps:
+            name, _, value = line.partition(':')
+            if value.strip().endswith('kB'):
+                fields[name] = int(value.split()[0])
+    return fields['Rss'] / 1024, (fields['Private_Clean'] + fields['Private_Dirty']) / 1024
+
+
+def run_benchmark(worker_counts=(1, 2, 4), clients=8, requests=500):
+    print(f"🧩 Cluster /chat throughput ({clients} client processes, {requests} requests each, "
+          f"{os.cpu_count()} CPUs)")
+    print("=" * 72)
+    print(f"{'workers':>8} {'requests/s':>12} {'speedup':>9} {'worker RSS MB':>14} {'private MB':>11}")
+    baseline = None
+    with Pool(clients) as pool:
+        for workers in worker_counts:
+            master, port = start_cluster(workers)
+            try:
+                pool.map(chat, [(port, client, 20) for client in range(clients)])  # warm up
+                start = time.perf_counter()
+                pool.map(chat, [(port, client, requests) for client in range(clients)])
+                rate = clients * requests / (time.perf_counter() - start)
+                baseline = baseline or rate
+                try:
+                    usage = [memory_mb(worker['pid']) for worker in cluster_workers(port)]
+                    rss, private = (f"{sum(column) / len(usage):.1f}" for column in zip(*usage))
+                except OSError:
+                    rss = private = "n/a"
+                print(f"{workers:>8} {rate:>12,.0f} {rate / baseline:>8.1f}x {rss:>14} {private:>11}")
+            finally:
+                master.terminate()
+                master.wait()
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Benchmark: peak memory of dumping every session at once vs the streaming export
+
+The old /data built one JSON document holding every session; the export
+encodes one session per NDJSON line, a batch of sessions at a time. Peak
+memory is measured with tracemalloc while the output is produced and
+discarded, as a WSGI server would do while sending it. (MongoDB exports
+page through the session_id index the same way; the fake collection does
+not model server memory, so they are not measured here.)
+"""
+
+import sys
+import os
+import json
+import time
+import tracemalloc
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from chat_history import Exchange, SessionHistories, session_history
+from session_export import to_ndjson
+
+
+def peak_kib(produce):
+    tracemalloc.start()
+    start = time.perf_counter()
+    produce()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024, elapsed
+
+
+def drain(lines):
+    for _ in lines:
+        pass
+
+
+def run_benchmark(sizes=(1000, 10000, 50000)):
+    print("🌊 Peak memory while exporting every session (KiB, seconds)")
+    print("=" * 40)
+    print(f"{'sessions':>9} {'full dump':>11} {'export':>9} {'export s':>8}")
+    for size in sizes:
+        histories = SessionHistories()
+        for i in range(size):
+            history = session_history(histories, f"s{i:07d}")
+            for turn in range(5):
+                history.append(Exchange(f"message {turn}", "a reply of moderate length"))
+        full, _ = peak_kib(lambda: json.dumps(
+            {session_id: history.to_list() for session_id, history in histories.items()}))
+        streamed, streamed_s = peak_kib(lambda: drain(to_ndjson(histories.export())))
+        print(f"{size:>9} {full:>11.0f} {streamed:>9.0f} {streamed_s:>8.2f}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark: bytes per session for dict exchanges vs compact ring-buffer history
+"""
+
+import sys
+import os
+import time
+import tracemalloc
+from datetime import datetime
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from chat_history import ChatHistory, Exchange
+from config import Config
+from intent_engine import get_catalog
+
+RESPONSES = [r for responses in get_catalog().engine('full').responses.values() for r in responses]
+SENTIMENTS = ['neutral', 'positive', 'negative']
+
+
+def dict_sessions(sessions, exchanges):
+    """Original storage: a growing list of dicts with ISO timestamp strings"""
+    store = {}
+    for s in range(sessions):
+        history = store[f"session-{s}"] = []
+        for i in range(exchanges):
+            history.append({
+                'user': f"message {i} from session {s}",
+                'bot': RESPONSES[i % len(RESPONSES)],
+                'timestamp': datetime.now().isoformat(),
+                'sentiment': SENTIMENTS[i % 3]
+            })
+    return store
+
+
+def ring_sessions(sessions, exchanges):
+    """Compact storage: Exchange records in a Config.MAX_CHAT_HISTORY ring buffer"""
+    store = {}
+    for s in range(sessions):
+        history = store[f"session-{s}"] = ChatHistory(Config.MAX_CHAT_HISTORY)
+        for i in range(exchanges):
+            history.append(Exchange(f"message {i} from session {s}", RESPONSES[i % len(RESPONSES)],
+                                    time.time(), SENTIMENTS[i % 3]))
+    return store
+
+
+def bytes_per_session(build, sessions, exchanges):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = build(sessions, exchanges)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del store
+    return (after - before) / sessions
+
+
+def run_benchmark(sessions=2000):
+    print(f"💾 History memory per session ({sessions} sessions, capacity {Config.MAX_CHAT_HISTORY})")
+    print("=" * 60)
+    for exchanges in (5, Config.MAX_CHAT_HISTORY, 100):
+        old = bytes_per_session(dict_sessions, sessions, exchanges)
+        new = bytes_per_session(ring_sessions, sessions, exchanges)
+        print(f"{exchanges:4d} exchanges   dicts {old:9,.0f} B   ring buffer {new:8,.0f} B   {old / new:5.2f}x smaller")
+
+
+if __name__ == "__main__":
+    run_benchmark()
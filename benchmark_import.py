@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark: NDJSON import throughput and peak memory by archive size
+
+Archives are generated line by line, so the only memory the import holds
+is its current chunk; tracemalloc measures the peak while importing into
+the in-memory histories the apps use (whose own growth is subtracted) and
+into MongoDB through bulk_write against a fake collection that discards
+what it receives.
+"""
+
+import sys
+import os
+import json
+import tracemalloc
+from types import SimpleNamespace
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_mongo import FakeCollection, blocking_manager
+from chat_history import SessionHistories
+from session_import import import_sessions, read_ndjson
+
+
+class DiscardingCollection(FakeCollection):
+    """Counts bulk writes without keeping the documents"""
+
+    def bulk_write(self, requests, ordered=True):
+        self._round_trip()
+        return SimpleNamespace(modified_count=len(requests))
+
+
+def archive(size):
+    exchange = {'user': "how's work?", 'bot': "busy", 'timestamp': "2024-01-01T12:00:00", 'sentiment': "neutral"}
+    for i in range(size):
+        yield json.dumps({'session_id': f"s{i:07d}", 'history': [exchange] * 5}) + "\n"
+
+
+def measure(run):
+    tracemalloc.start()
+    stats = run()  # rates are taken from untraced runs
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return stats, peak / 1024
+
+
+def run_benchmark(sizes=(1000, 10000, 100000), chunk_size=1000):
+    print(f"📥 NDJSON import (chunks of {chunk_size})")
+    print("=" * 66)
+    print(f"{'sessions':>9} {'histories/s':>12} {'mongo/s':>10} {'mongo peak KiB':>15} {'bulk writes':>12}")
+    for size in sizes:
+        histories = SessionHistories()
+        history_stats = import_sessions(read_ndjson(archive(size)), histories.load, chunk_size)
+
+        collection = DiscardingCollection()
+        memory = blocking_manager(collection)
+        commands = collection.commands
+        mongo_stats = memory.import_sessions(read_ndjson(archive(size)), chunk_size)
+        bulk_writes = collection.commands - commands
+        _, peak = measure(lambda: memory.import_sessions(read_ndjson(archive(size)), chunk_size))
+        print(f"{size:>9} {history_stats.rate:>12,.0f} {mongo_stats.rate:>10,.0f} {peak:>15,.0f} "
+              f"{bulk_writes:>12}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: compiled intent matcher vs the original elif chain
+"""
+
+import sys
+import os
+import random
+import timeit
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from intent_engine import get_catalog
+
+intent_matcher = get_catalog().engine('full').matcher
+
+# Realistic traffic: mostly free-form chatter that falls through to the default
+SAMPLE_MESSAGES = [
+    "Hi!",
+    "hello there",
+    "thanks!!",
+    "What's up?",
+    "what's your name",
+    "are you a bot?",
+    "How are you today?",
+    "I'm feeling a bit sad about work",
+    "tell me a joke",
+    "I'm so bored right now",
+    "bye, talk later",
+    "I went to the market yesterday and bought some vegetables for dinner",
+    "My computer keeps crashing when I open too many tabs in the browser",
+    "Do you think it will rain tomorrow?",
+    "I've been reading a novel about a detective in London",
+    "We are planning a trip to the mountains next month",
+    "Can you recommend a good recipe for pasta?",
+    "I just finished my exams and now I need to plan the summer",
+    "My cat knocked a glass off the table this morning",
+    "The meeting took forever and nobody agreed on anything",
+    "I'm learning to play the guitar but my fingers hurt",
+    "What did I say my name was?",
+]
+
+
+def legacy_detect_intent(user_input_lower):
+    """The intent selection of the original if/elif chain, kept as a reference"""
+    if 'what did i say' in user_input_lower or 'did i say' in user_input_lower:
+        return 'memory_question'
+    if any(greeting in user_input_lower for greeting in ['hello', 'hi', 'hey', 'good morning', 'good afternoon']):
+        return 'greeting'
+    elif any(phrase in user_input_lower for phrase in ["what's up", 'whats up', 'wassup', 'sup', "how's it going"]):
+        return 'casual_greeting'
+    elif ('name' in user_input_lower and any(word in user_input_lower for word in ['your', 'what', 'called'])) or "what's your name" in user_input_lower:
+        return 'bot_identity'
+    elif any(phrase in user_input_lower for phrase in ['are you a bot', 'are you real', 'are you human', 'are you ai']):
+        return 'bot_confirmation'
+    elif any(phrase in user_input_lower for phrase in ['how are you', 'how do you feel', 'how is it going']):
+        return 'how_are_you'
+    elif any(word in user_input_lower for word in ['sad', 'down', 'depressed', 'upset']):
+        return 'sad'
+    elif any(word in user_input_lower for word in ['happy', 'excited', 'great', 'awesome']):
+        return 'happy'
+    elif any(word in user_input_lower for word in ['joke', 'funny', 'humor', 'laugh']):
+        return 'jokes'
+    elif any(phrase in user_input_lower for phrase in ['what can you do', 'help me', 'your capabilities']):
+        return 'capabilities'
+    elif any(word in user_input_lower for word in ['bored', 'boring', 'nothing to do']):
+        return 'boredom'
+    elif any(word in user_input_lower for word in ['thank', 'thanks', 'appreciate']):
+        return 'thanks'
+    elif any(word in user_input_lower for word in ['bye', 'goodbye', 'see you', 'talk later']):
+        return 'goodbye'
+    return None
+
+
+def build_message_mix(count=5000, seed=42):
+    """Lowercased message mix used by the benchmark"""
+    rng = random.Random(seed)
+    return [rng.choice(SAMPLE_MESSAGES).lower().strip() for _ in range(count)]
+
+
+def run_benchmark(count=5000, repeat=5):
+    messages = build_message_mix(count)
+
+    def legacy():
+        for message in messages:
+            legacy_detect_intent(message)
+
+    def compiled():
+        for message in messages:
+            intent_matcher.match(message)
+
+    legacy_time = min(timeit.repeat(legacy, number=1, repeat=repeat))
+    compiled_time = min(timeit.repeat(compiled, number=1, repeat=repeat))
+
+    print("⏱️  Intent matching benchmark")
+    print("=" * 40)
+    print(f"Messages:       {count}")
+    print(f"elif chain:     {legacy_time / count * 1e6:.2f} µs/message")
+    print(f"compiled:       {compiled_time / count * 1e6:.2f} µs/message")
+    print(f"Speedup:        {legacy_time / compiled_time:.2f}x")
+
+
+if __name__ == "__main__":
+    run_benchmark()
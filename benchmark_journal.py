@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark: session journal throughput and recovery time at 1M messages
+
+Writes a million exchanges through SessionHistories with the journal on,
+then times recovery from the journal alone and from a snapshot plus a
+short tail. A second run measures group commit: concurrent writers that
+each wait for their exchange to be fsynced.
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from chat_history import Exchange, SessionHistories, session_history
+
+
+def fill(histories, messages, sessions):
+    for i in range(messages):
+        session_history(histories, f"session-{i % sessions:06d}").append(
+            Exchange(f"message {i} about work", "Got it, tell me more!", sentiment='neutral'))
+
+
+def recover(directory):
+    histories = SessionHistories()
+    stats = histories.open_journal(directory)
+    histories.close_journal()
+    return stats
+
+
+def directory_mib(directory):
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)) / 2 ** 20
+
+
+def run_recovery(messages=1_000_000, sessions=10_000, tail=10_000):
+    directory = tempfile.mkdtemp(prefix='stan-journal-')
+    try:
+        print(f"📓 Journal recovery ({messages:,} messages over {sessions:,} sessions)")
+        print("=" * 72)
+        histories = SessionHistories()
+        histories.open_journal(directory, sync_commit=False, snapshot_every=10 * messages)
+        start = time.perf_counter()
+        fill(histories, messages, sessions)
+        elapsed = time.perf_counter() - start
+        histories.close_journal()
+        print(f"append (commit every 10 ms)    {messages / elapsed:>10,.0f} msg/s   "
+              f"{directory_mib(directory):>7.1f} MiB on disk")
+
+        stats = recover(directory)
+        print(f"recover: replay whole journal  {stats['recovery_ms'] / 1000:>10.2f} s       "
+              f"{stats['replayed_records']:>9,} records replayed")
+
+        histories = SessionHistories()
+        histories.open_journal(directory, sync_commit=False, snapshot_every=10 * messages)
+        histories.journal.snapshot()
+        fill(histories, tail, sessions)
+        histories.close_journal()
+        stats = recover(directory)
+        print(f"recover: snapshot + tail       {stats['recovery_ms'] / 1000:>10.2f} s       "
+              f"{stats['snapshot_records']:>9,} sessions + {stats['replayed_records']:,} records "
+              f"({directory_mib(directory):.1f} MiB)")
+    finally:
+        shutil.rmtree(directory)
+
+
+def run_group_commit(writers=(1, 4, 16), per_writer=200):
+    print(f"\n🔒 Group commit (every append waits for its fsync, {per_writer} appends per writer)")
+    print("=" * 72)
+    print(f"{'writers':>8} {'msg/s':>10} {'fsyncs':>8} {'msg/fsync':>10} {'p50 ms':>8}")
+    for count in writers:
+        directory = tempfile.mkdtemp(prefix='stan-journal-')
+        try:
+            histories = SessionHistories()
+            histories.open_journal(directory)
+            latencies = []
+            lock = threading.Lock()
+
+            def writer(index):
+                history = session_history(histories, f"writer-{index}")
+                for i in range(per_writer):
+                    start = time.perf_counter()
+                    history.append(Exchange(f"message {i}", "ok"))
+                    with lock:
+                        latencies.append(time.perf_counter() - start)
+
+            threads = [threading.Thread(target=writer, args=(i,)) for i in range(count)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            commits = histories.journal.metrics()['commits']
+            histories.close_journal()
+            latencies.sort()
+            total = count * per_writer
+            print(f"{count:>8} {total / elapsed:>10,.0f} {commits:>8} {total / max(commits, 1):>10.1f} "
+                  f"{latencies[len(latencies) // 2] * 1000:>8.2f}")
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    run_recovery()
+    run_group_commit()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Stress test: many worker threads sharing one MongoClient connection pool
+
+Needs a running mongod (MONGODB_URI, default mongodb://localhost:27017/).
+Every worker plays chat turns through EnhancedMemoryManager; a pool listener
+times how long each operation waits to check a connection out of the pool.
+Pool settings come from MongoDBConfig, so the MONGODB_* pool variables apply.
+"""
+
+import sys
+import os
+import threading
+import time
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pymongo import MongoClient, monitoring
+from pymongo.errors import PyMongoError
+
+from enhanced_features import EnhancedMemoryManager
+from mongodb_config import get_config
+
+
+class PoolWaitListener(monitoring.ConnectionPoolListener):
+    """Records the time between check-out started and checked out, per operation"""
+
+    def __init__(self):
+        self._started = threading.local()
+        self._lock = threading.Lock()
+        self.waits = []
+        self.failures = 0
+        self.connections = 0
+
+    def connection_check_out_started(self, event):
+        self._started.at = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        wait = time.perf_counter() - self._started.at
+        with self._lock:
+            self.waits.append(wait)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.failures += 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else 0.0
+
+
+def stress(uri, pool_size, threads, turns):
+    config = get_config()
+    options = dict(config.get_connection_options(), maxPoolSize=pool_size)
+    listener = PoolWaitListener()
+    client = MongoClient(uri, event_listeners=[listener], **options)
+    try:
+        client.admin.command('ping')
+        database = client['stan_chatbot_pool_benchmark']
+        database.sessions.drop()
+        memory = EnhancedMemoryManager(database=database, cleanup_interval=None)
+
+        def worker(index):
+            for turn in range(turns):
+                session_id = f"worker-{index}-{turn % 5}"
+                memory.get_session(session_id)
+                memory.add_message(session_id, f"message {turn} about work", "Got it!", 'neutral')
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        database.sessions.drop()
+    finally:
+        client.close()
+    waits = sorted(listener.waits)
+    return elapsed, waits, listener
+
+
+def run_benchmark(threads=64, turns=50, pool_sizes=(4, 16, 64)):
+    uri = os.environ.get('MONGODB_URI', 'mongodb://localhost:27017/')
+    print(f"🏊 MongoDB pool stress ({threads} threads x {turns} turns against {uri})")
+    print("=" * 76)
+    print(f"{'pool':>5} {'ops/s':>8} {'wait p50 ms':>12} {'wait p99 ms':>12} {'wait max ms':>12} "
+          f"{'conns':>6} {'failed':>7}")
+    for pool_size in pool_sizes:
+        try:
+            elapsed, waits, listener = stress(uri, pool_size, threads, turns)
+        except PyMongoError as e:
+            print(f"MongoDB is not reachable ({e.__class__.__name__}); start mongod or set MONGODB_URI")
+            return
+        operations = len(waits)
+        print(f"{pool_size:>5} {operations / elapsed:>8.0f} {percentile(waits, 0.5) * 1000:>12.3f} "
+              f"{percentile(waits, 0.99) * 1000:>12.3f} {(waits[-1] if waits else 0) * 1000:>12.3f} "
+              f"{listener.connections:>6} {listener.failures:>7}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
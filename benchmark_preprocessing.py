@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Benchmark: one shared preprocessing stage vs per-consumer lowercasing
+"""
+
+import sys
+import os
+import timeit
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from intent_engine import get_catalog
+from sentiment_engine import LEXICONS
+from enhanced_features import EnhancedMemoryManager
+from topic_taxonomy import get_taxonomy
+from text_processing import preprocess
+from benchmark_intents import build_message_mix
+
+engine = get_catalog().engine('full')
+lexicon = LEXICONS['full']
+# Only the topic extraction helpers are exercised, no database needed
+memory = object.__new__(EnhancedMemoryManager)
+memory.taxonomy = get_taxonomy()
+
+
+def per_consumer(message):
+    """Each stage lowercases and scans the raw message on its own"""
+    engine.match(message.lower().strip())
+    lexicon.analyze(message)
+    memory._extract_topics({'conversation_topics': set()}, message)
+
+
+def shared_stage(message):
+    """The message is normalized once and handed to every stage"""
+    text = preprocess(message)
+    engine.match(text)
+    lexicon.analyze(text)
+    memory._extract_topics({'conversation_topics': set()}, text)
+
+
+def run_benchmark(count=5000, repeat=5):
+    short = build_message_mix(count)
+    long = [' '.join([m] * 20) for m in short]
+
+    print("⏱️  Preprocessing benchmark (intent + sentiment + topics per message)")
+    print("=" * 60)
+    for title, messages in [("chat-sized messages", short), ("long messages (20x)", long)]:
+        old = min(timeit.repeat(lambda: [per_consumer(m) for m in messages], number=1, repeat=repeat))
+        new = min(timeit.repeat(lambda: [shared_stage(m) for m in messages], number=1, repeat=repeat))
+        print(f"{title:22s} per-consumer {old / count * 1e6:6.2f} µs   shared {new / count * 1e6:6.2f} µs"
+              f"   {old / new:4.2f}x")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Benchmark: MongoDB session reads per chat turn, with and without the session cache
+
+Each turn reads the session, builds a context summary, stores the exchange
+and summarizes again, against a fake collection with a simulated round trip.
+"""
+
+import sys
+import os
+import time
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_mongo import FakeCollection, fake_database
+from enhanced_features import EnhancedMemoryManager
+
+
+def chat_turn(memory, session_id, turn):
+    memory.get_session(session_id)
+    memory.get_context_summary(session_id)
+    memory.add_message(session_id, f"message {turn} about work", "Got it!", 'neutral')
+    memory.get_context_summary(session_id)
+
+
+def run(sessions, turns, latency, cache_size):
+    collection = FakeCollection(latency)
+    memory = EnhancedMemoryManager(database=fake_database(collection), cleanup_interval=None,
+                                   session_cache_size=cache_size)
+    commands = collection.commands
+    start = time.perf_counter()
+    for turn in range(turns):
+        for session in range(sessions):
+            chat_turn(memory, f"session-{session}", turn)
+    elapsed = time.perf_counter() - start
+    return elapsed, collection.commands - commands, memory
+
+
+def run_benchmark(sessions=50, turns=10, latency=0.001):
+    total = sessions * turns
+    print(f"🗄️  Session reads per chat turn ({sessions} sessions x {turns} turns, "
+          f"{latency * 1000:.0f} ms per round trip)")
+    print("=" * 64)
+    print(f"{'mode':<14} {'ms/turn':>8} {'commands/turn':>14} {'hit ratio':>10}")
+    for label, cache_size in (("no cache", 0), ("cache 1000", 1000)):
+        elapsed, commands, memory = run(sessions, turns, latency, cache_size)
+        hit_ratio = memory.session_cache.metrics()['hit_ratio'] if memory.session_cache is not None else 0.0
+        print(f"{label:<14} {elapsed / total * 1000:>8.2f} {commands / total:>14.2f} {hit_ratio:>10.1%}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark: MongoDB session expiry and cap enforcement, per-request vs TTL index
+
+The original manager ran its cleanup inside every get_session call: a
+delete_many over last_active and a full count_documents. Now MongoDB expires
+sessions through a TTL index and the cap is enforced by a background tick
+that sizes the collection with estimated_document_count. Both run against the
+in-process fake collection, where a count or filtered delete scans every
+document, as a collection scan would.
+"""
+
+import sys
+import os
+import time
+from datetime import timedelta
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_mongo import FakeCollection, blocking_manager
+from enhanced_features import utcnow
+
+
+def legacy_cleanup(collection, max_sessions, session_timeout):
+    """_cleanup_old_sessions as originally written, run on every get_session"""
+    collection.delete_many({"last_active": {"$lt": utcnow() - session_timeout}})
+    total_sessions = collection.count_documents({})
+    if total_sessions > max_sessions:
+        oldest_sessions = collection.find().sort("last_active", 1).limit(total_sessions - max_sessions)
+        session_ids_to_remove = [session["session_id"] for session in oldest_sessions]
+        if session_ids_to_remove:
+            collection.delete_many({"session_id": {"$in": session_ids_to_remove}})
+
+
+def populated(count, max_sessions):
+    collection = FakeCollection()
+    memory = blocking_manager(collection, max_sessions=max_sessions)
+    start = utcnow() - timedelta(hours=1)
+    for i in range(count):
+        collection.documents[f"s{i}"] = {'session_id': f"s{i}", 'history': [],
+                                         'last_active': start + timedelta(microseconds=i)}
+    return collection, memory
+
+
+def measure(collection, action, repeat):
+    commands = collection.commands
+    start = time.perf_counter()
+    for i in range(repeat):
+        action(i)
+    elapsed = time.perf_counter() - start
+    return elapsed / repeat * 1000, (collection.commands - commands) / repeat
+
+
+def run_benchmark(sizes=(1000, 10000, 50000), requests=200):
+    print("⏳ MongoDB session expiry: cleanup per request vs TTL index + background cap")
+    print("=" * 72)
+    print(f"{'sessions':>9} {'legacy ms/req':>14} {'cmds/req':>9} {'now ms/req':>11} {'cmds/req':>9} "
+          f"{'cap tick ms':>12}  (tick removes 1000)")
+    for size in sizes:
+        collection, memory = populated(size, max_sessions=size)
+
+        def legacy(i):
+            memory.get_session(f"s{i}")
+            legacy_cleanup(collection, memory.max_sessions, memory.session_timeout)
+
+        legacy_ms, legacy_commands = measure(collection, legacy, requests)
+        now_ms, now_commands = measure(collection, lambda i: memory.get_session(f"s{i}"), requests)
+
+        # A full batch: the cap was lowered by 1000 sessions
+        memory.max_sessions = size - 1000
+        start = time.perf_counter()
+        memory._cleanup_old_sessions(1000)
+        tick_ms = (time.perf_counter() - start) * 1000
+        print(f"{size:>9} {legacy_ms:>14.3f} {legacy_commands:>9.0f} {now_ms:>11.3f} {now_commands:>9.0f} "
+              f"{tick_ms:>12.1f}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Benchmark: bytes read from MongoDB per session read, whole document vs projection
+
+A long-running session (full 20-message history, a long sentiment history)
+is read the way get_context_summary used to (whole document) and the way it
+does now (topics plus the last 5 messages, sliced by the server). Sizes are
+the BSON bytes the fake collection returns, i.e. what would cross the wire.
+"""
+
+import sys
+import os
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_mongo import FakeCollection, blocking_manager
+
+
+def long_session(memory, collection, turns=40, sentiments=500):
+    for turn in range(turns):
+        memory.add_message('long', f"message {turn}: tell me about work and the weather this week",
+                           "Here is a detailed answer that runs for a couple of sentences. " * 4, 'neutral')
+    collection.documents['long']['sentiment_history'] = [
+        {'sentiment': 'neutral', 'score': 0.0, 'turn': i} for i in range(sentiments)]
+
+
+def bytes_per_call(collection, read, calls=100):
+    start = collection.bytes_read
+    for _ in range(calls):
+        read()
+    return (collection.bytes_read - start) / calls
+
+
+def run_benchmark():
+    collection = FakeCollection()
+    memory = blocking_manager(collection)
+    long_session(memory, collection)
+
+    print("📦 Bytes read per session lookup (BSON, one long-running session)")
+    print("=" * 60)
+    reads = (
+        ("get_session (whole document)", lambda: memory.get_session('long')),
+        ("get_session(history=5)", lambda: memory.get_session('long', history=5)),
+        ("get_context_summary", lambda: memory.get_context_summary('long')),
+        ("get_session(fields=(), history=1)", lambda: memory.get_session('long', fields=(), history=1)),
+    )
+    whole = None
+    for label, read in reads:
+        size = bytes_per_call(collection, read)
+        whole = whole or size
+        print(f"{label:<36} {size:>9.0f} B   {size / whole:6.1%}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-request get_session latency as the number of sessions grows
+"""
+
+import sys
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from enhanced_features import EnhancedMemoryManager
+from session_store import SessionStore
+
+
+class LegacyInMemorySessions:
+    """In-memory get_session as originally written: scan and sort on every call"""
+
+    def __init__(self, max_sessions, session_timeout):
+        self.sessions = {}
+        self.max_sessions = max_sessions
+        self.session_timeout = session_timeout
+
+    def get_session(self, session_id):
+        if session_id not in self.sessions:
+            self.sessions[session_id] = {'history': [], 'last_active': datetime.now()}
+        else:
+            self.sessions[session_id]['last_active'] = datetime.now()
+        self._cleanup_old_sessions()
+        return self.sessions[session_id]
+
+    def _cleanup_old_sessions(self):
+        current_time = datetime.now()
+        expired_sessions = [session_id for session_id, session_data in self.sessions.items()
+                            if current_time - session_data['last_active'] > self.session_timeout]
+        for session_id in expired_sessions:
+            del self.sessions[session_id]
+        if len(self.sessions) > self.max_sessions:
+            sorted_sessions = sorted(self.sessions.items(), key=lambda x: x[1]['last_active'])
+            for i in range(len(self.sessions) - self.max_sessions):
+                del self.sessions[sorted_sessions[i][0]]
+
+
+def in_memory_manager(max_sessions):
+    """EnhancedMemoryManager in in-memory mode, expiry left to explicit ticks"""
+    return EnhancedMemoryManager(max_sessions=max_sessions, mongodb_uri=None, cleanup_interval=None)
+
+
+def fill(sessions, count):
+    """Pre-populate ``count`` sessions, oldest first"""
+    start = datetime.now() - timedelta(hours=1)
+    for i in range(count):
+        session = {'history': [], 'last_active': start + timedelta(microseconds=i)}
+        if isinstance(sessions, SessionStore):
+            sessions.add(f"s{i}", session)
+        else:
+            sessions[f"s{i}"] = session
+
+
+def per_request(memory, count, requests):
+    """Mean get_session latency for a mix of returning and new sessions at capacity"""
+    rng = random.Random(1)
+    ids = [f"s{rng.randrange(count)}" if i % 2 else f"new{i}" for i in range(requests)]
+    start = time.perf_counter()
+    for session_id in ids:
+        memory.get_session(session_id)
+    return (time.perf_counter() - start) / requests
+
+
+def run_benchmark(sizes=(1_000, 10_000, 100_000, 1_000_000), legacy_limit=100_000):
+    print("🗂️  In-memory get_session latency at capacity (half returning, half new sessions)")
+    print("=" * 60)
+    for count in sizes:
+        memory = in_memory_manager(count)
+        fill(memory.sessions, count)
+        new = per_request(memory, count, 20_000)
+        line = f"{count:>9,} sessions   store {new * 1e6:7.2f} µs"
+        if count <= legacy_limit:
+            legacy = LegacyInMemorySessions(count, timedelta(hours=24))
+            fill(legacy.sessions, count)
+            old = per_request(legacy, count, max(10, 200_000 // count))
+            line += f"   legacy {old * 1e6:11.2f} µs   {old / new:8.0f}x"
+        else:
+            line += "   legacy (skipped, seconds per request)"
+        print(line)
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cost of a stats call as the number of sessions grows
+
+Compares summing message counts over every session, and counting active
+sessions by scanning, with the running totals and sliding activity window
+that are kept up to date on every write.
+"""
+
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_mongo import FakeCollection, blocking_manager
+from benchmark_session_store import in_memory_manager
+from chat_history import Exchange, SessionHistories, session_history
+from enhanced_features import utcnow
+
+
+def per_call_us(action, calls=200):
+    start = time.perf_counter()
+    for _ in range(calls):
+        action()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def run_benchmark(sizes=(1000, 10000, 100000)):
+    print("📊 Stats call cost by session count (µs per call)")
+    print("=" * 78)
+    print(f"{'sessions':>9} {'/stats sum':>11} {'/stats now':>11} {'memory scan':>12} {'memory now':>11} "
+          f"{'mongo scan':>11} {'mongo now':>10}")
+    for size in sizes:
+        histories = SessionHistories()
+        for i in range(size):
+            session_history(histories, f"s{i}", capacity=4).append(Exchange("hi", "hello"))
+        summed = per_call_us(lambda: sum(history.total for history in histories.values()), 20)
+        counted = per_call_us(lambda: histories.total_messages)
+
+        memory = in_memory_manager(max_sessions=size)
+        for i in range(size):
+            memory.get_session(f"s{i}")
+        scan = per_call_us(lambda: memory.sessions.count_active(datetime.now() - timedelta(hours=1)), 20)
+        window = per_call_us(memory.get_session_stats)
+
+        collection = FakeCollection()
+        mongo = blocking_manager(collection, max_sessions=size)
+        for i in range(size):
+            collection.documents[f"s{i}"] = {'session_id': f"s{i}", 'last_active': utcnow()}
+            mongo.activity.touch(f"s{i}")
+        legacy = per_call_us(lambda: (collection.count_documents({}), collection.count_documents(
+            {'last_active': {'$gte': utcnow() - timedelta(hours=1)}})), 20)
+        current = per_call_us(mongo.get_session_stats)
+        print(f"{size:>9} {summed:>11.1f} {counted:>11.2f} {scan:>12.1f} {window:>11.1f} "
+              f"{legacy:>11.1f} {current:>10.1f}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
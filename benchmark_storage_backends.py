@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark: the same session workload against every storage backend
+
+Appends messages across many sessions, reads recent history back, exports
+every session page by page, then trims the store to half its cap (the
+in-memory store enforces its cap as sessions are added instead). MongoDB
+runs on the fake collection without simulated latency, so its column is
+the client-side cost only; SQLite writes a real WAL database in a
+temporary directory.
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_mongo import FakeCollection
+from storage_backends import MemoryBackend, MongoBackend, SQLiteBackend
+
+
+def backends(directory, max_sessions):
+    collection = FakeCollection()
+    ttl = timedelta(hours=24)
+    return [MemoryBackend(max_sessions, ttl),
+            MongoBackend(lambda: collection, max_sessions, ttl),
+            SQLiteBackend(os.path.join(directory, 'sessions.db'), max_sessions, ttl)]
+
+
+def rate(count, operation):
+    start = time.perf_counter()
+    for i in range(count):
+        operation(i)
+    return count / (time.perf_counter() - start)
+
+
+def run_benchmark(messages=50_000, sessions=2_000):
+    directory = tempfile.mkdtemp(prefix='stan-backends-')
+    try:
+        print(f"🗄️  Storage backends ({messages:,} messages over {sessions:,} sessions, operations per second)")
+        print("=" * 78)
+        print(f"{'backend':>10} {'append':>10} {'get (5 msgs)':>13} {'export':>10} {'stats':>10} {'expire 50%':>11}")
+        for backend in backends(directory, sessions):
+            appended = rate(messages, lambda i: backend.append(
+                f"session-{i % sessions:06d}",
+                {'timestamp': datetime.now().isoformat(), 'user': f"message {i} about work",
+                 'bot': "Got it, tell me more!", 'sentiment': 'neutral'},
+                ['work']))
+            read = rate(messages // 5, lambda i: backend.get(f"session-{i % sessions:06d}", history=5))
+            start = time.perf_counter()
+            exported = sum(1 for _ in backend.export(500))
+            export_rate = exported / (time.perf_counter() - start)
+            stats_rate = rate(1000, lambda i: backend.stats())
+            backend.max_sessions = sessions // 2
+            start = time.perf_counter()
+            removed, _ = backend.expire(sessions)
+            expired = f"{removed / (time.perf_counter() - start):,.0f}" if removed else "on insert"
+            backend.close()
+            print(f"{backend.storage_type:>10} {appended:>10,.0f} {read:>13,.0f} {export_rate:>10,.0f} "
+                  f"{stats_rate:>10,.0f} {expired:>11}")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Benchmark: compiled topic taxonomy vs a keyword loop over every phrase
+"""
+
+import sys
+import os
+import json
+import timeit
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from topic_taxonomy import DEFAULT_TAXONOMY_PATH, get_taxonomy
+from benchmark_intents import build_message_mix
+
+taxonomy = get_taxonomy()
+with open(DEFAULT_TAXONOMY_PATH, 'r', encoding='utf-8') as f:
+    TOPIC_PHRASES = [(topic['name'], topic['phrases']) for topic in json.load(f)['topics']]
+
+
+def keyword_loop(message):
+    """The original approach, scaled up to the whole taxonomy"""
+    message_lower = message.lower()
+    return [name for name, phrases in TOPIC_PHRASES if any(phrase in message_lower for phrase in phrases)]
+
+
+def run_benchmark(count=5000, repeat=5):
+    messages = build_message_mix(count)
+    assert [keyword_loop(m) for m in messages] == [taxonomy.extract(m) for m in messages]
+
+    print(f"🏷️  Topic extraction benchmark ({len(taxonomy.topics)} topics, "
+          f"{len(taxonomy.matcher.phrases)} phrases)")
+    print("=" * 60)
+    old = min(timeit.repeat(lambda: [keyword_loop(m) for m in messages], number=1, repeat=repeat))
+    new = min(timeit.repeat(lambda: [taxonomy.extract(m) for m in messages], number=1, repeat=repeat))
+    print(f"keyword loop {old / count * 1e6:7.2f} µs/message")
+    print(f"taxonomy     {new / count * 1e6:7.2f} µs/message   {old / new:4.2f}x")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Benchmark: synchronous add_message vs write-behind buffering under a burst
+
+A burst of messages from a handful of sessions hits EnhancedMemoryManager
+backed by a fake MongoDB collection with a simulated round trip. Reported are
+the time add_message adds to each response and the database commands issued.
+"""
+
+import sys
+import os
+import time
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_mongo import FakeCollection, fake_database
+from enhanced_features import EnhancedMemoryManager
+
+
+def burst(memory, sessions, messages):
+    latencies = []
+    for i in range(messages):
+        start = time.perf_counter()
+        memory.add_message(f"session-{i % sessions}", f"message {i} about work", "Got it!", 'neutral')
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies
+
+
+def run(sessions, messages, latency, **options):
+    collection = FakeCollection(latency)
+    memory = EnhancedMemoryManager(database=fake_database(collection), cleanup_interval=None, **options)
+    commands = collection.commands
+    start = time.perf_counter()
+    latencies = burst(memory, sessions, messages)
+    memory.close_connection()  # flushes whatever is still buffered
+    elapsed = time.perf_counter() - start
+    stored = sum(document['message_count'] for document in collection.documents.values())
+    assert stored == messages
+    return latencies, collection.commands - commands, elapsed
+
+
+def run_benchmark(sessions=20, messages=2000, latency=0.002):
+    print(f"✍️  add_message under a burst ({messages} messages, {sessions} sessions, "
+          f"{latency * 1000:.0f} ms per round trip)")
+    print("=" * 72)
+    print(f"{'mode':<28} {'p50 ms':>8} {'p99 ms':>8} {'commands':>9} {'total s':>8}")
+    for label, options in (("synchronous", {}),
+                           ("write-behind 50 ms / 500", {'write_behind_ms': 50, 'write_behind_ops': 500})):
+        latencies, commands, elapsed = run(sessions, messages, latency, **options)
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000
+        print(f"{label:<28} {p50:>8.3f} {p99:>8.3f} {commands:>9} {elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
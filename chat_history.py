@@ -0,0 +1,322 @@
+"""
+Compact conversation history for STAN Chatbot
+"""
+
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config import Config
+from sentiment_engine import Sentiment
+from session_export import DEFAULT_PAGE_SIZE, EXPORT_BATCH_SIZE, export_ids, page_ids
+from session_journal import SessionJournal
+from sharded_store import DEFAULT_SHARDS, ShardedDict
+
+
+class Exchange:
+    """One user message and the bot's reply.
+
+    Stored with ``__slots__``, an epoch-seconds timestamp and a ``Sentiment``
+    code instead of a dict with an ISO string, which keeps long-lived
+    histories small. ``to_dict`` produces the original JSON shape, and item
+    access (``exchange['user']``) still works for existing callers.
+    """
+
+    __slots__ = ('user', 'bot', 'timestamp', 'sentiment')
+
+    def __init__(self, user: str, bot: str, timestamp: Optional[float] = None,
+                 sentiment: Optional[str] = None):
+        self.user = user
+        self.bot = bot
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.sentiment = Sentiment.from_label(sentiment)
+
+    def to_dict(self) -> Dict[str, str]:
+        """Serializable form; ISO formatting only happens here"""
+        return {
+            'user': self.user,
+            'bot': self.bot,
+            'timestamp': datetime.fromtimestamp(self.timestamp).isoformat(),
+            'sentiment': self.sentiment.label
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, str]) -> 'Exchange':
+        """Inverse of ``to_dict``"""
+        timestamp = data.get('timestamp')
+        return cls(data['user'], data['bot'],
+                   datetime.fromisoformat(timestamp).timestamp() if timestamp else None,
+                   data.get('sentiment'))
+
+    def __getitem__(self, key: str):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        if key == 'timestamp':
+            return datetime.fromtimestamp(self.timestamp).isoformat()
+        if key == 'sentiment':
+            return self.sentiment.label
+        return getattr(self, key)
+
+    def __repr__(self) -> str:
+        return f"Exchange(user={self.user!r}, bot={self.bot!r}, sentiment={self.sentiment.label})"
+
+
+class ChatHistory:
+    """Fixed-capacity ring buffer of a session's most recent exchanges.
+
+    Appending past capacity overwrites the oldest slot in place, so nothing
+    is copied or reallocated as a conversation grows. ``total`` counts every
+    exchange ever appended, including the ones that have been overwritten.
+    """
+
+    __slots__ = ('_slots', '_start', '_size', 'total', '_owner', 'session_id')
+
+    def __init__(self, capacity: int, exchanges: Iterable[Exchange] = (),
+                 owner: Optional['SessionHistories'] = None, session_id: Optional[str] = None):
+        if capacity < 1:
+            raise ValueError("ChatHistory capacity must be at least 1")
+        self._slots: List[Optional[Exchange]] = [None] * capacity
+        self._start = 0
+        self._size = 0
+        self.total = 0
+        self._owner = owner
+        self.session_id = session_id
+        for exchange in exchanges:
+            self._append(exchange)
+
+    @property
+    def capacity(self) -> int:
+        return len(self._slots)
+
+    def append(self, exchange: Exchange):
+        if self._owner is not None:
+            self._owner._add(self, (exchange,))
+        else:
+            self._append(exchange)
+
+    def extend(self, exchanges: Iterable[Exchange]):
+        if self._owner is not None:
+            self._owner._add(self, tuple(exchanges))
+        else:
+            for exchange in exchanges:
+                self._append(exchange)
+
+    def _append(self, exchange: Exchange):
+        capacity = len(self._slots)
+        if self._size < capacity:
+            self._slots[(self._start + self._size) % capacity] = exchange
+            self._size += 1
+        else:
+            self._slots[self._start] = exchange
+            self._start = (self._start + 1) % capacity
+        self.total += 1
+
+    def clear(self):
+        self._slots = [None] * len(self._slots)
+        self._start = self._size = 0
+
+    def to_list(self) -> List[Dict[str, str]]:
+        """Exchanges as dicts, oldest first"""
+        return [exchange.to_dict() for exchange in self]
+
+    def __getitem__(self, index: int) -> Exchange:
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("ChatHistory index out of range")
+        return self._slots[(self._start + index) % len(self._slots)]
+
+    def __iter__(self) -> Iterator[Exchange]:
+        capacity = len(self._slots)
+        for offset in range(self._size):
+            yield self._slots[(self._start + offset) % capacity]
+
+    def __len__(self) -> int:
+        return self._size
+
+
+def _exchange_row(exchange: Exchange) -> list:
+    return [exchange.user, exchange.bot, exchange.timestamp, int(exchange.sentiment)]
+
+
+_SENTIMENTS = tuple(Sentiment)
+
+
+def _row_exchange(row: list) -> Exchange:
+    user, bot, timestamp, sentiment = row
+    exchange = Exchange(user, bot, timestamp)
+    exchange.sentiment = _SENTIMENTS[sentiment]
+    return exchange
+
+
+class SessionHistories(ShardedDict):
+    """Histories by session id, with a running total of exchanges across all
+    of them, so stats never have to sum over every session.
+
+    Request threads can share them: sessions are split over shards with a
+    lock each (see ``sharded_store``), ``history`` creates a session's
+    history exactly once, and ``append``/``extend`` on a history take its
+    shard's lock. The total is kept per shard, under the same locks.
+
+    ``open_journal`` makes them durable: every append (and ``load``) is then
+    recorded in a ``SessionJournal`` as ``{'s': session id, 'n': total after
+    the change, 'x': exchange rows}``, with ``'r'`` set when the rows replace
+    the history. ``n`` lets replay skip rows a snapshot already holds.
+    """
+
+    def __init__(self, shards: int = DEFAULT_SHARDS):
+        super().__init__(shards)
+        self._message_counts = [0] * shards
+        self.journal: Optional[SessionJournal] = None
+
+    @property
+    def total_messages(self) -> int:
+        return sum(self._message_counts)
+
+    def history(self, session_id: str, capacity: Optional[int] = None) -> ChatHistory:
+        """Return a session's history, creating it (``Config.MAX_CHAT_HISTORY`` slots) on first use"""
+        return self.get_or_create(session_id, lambda: ChatHistory(
+            capacity or Config.MAX_CHAT_HISTORY, owner=self, session_id=session_id))
+
+    def open_journal(self, directory: str, **options) -> Dict:
+        """Recover the histories kept in ``directory``, then journal every change
+        there; ``options`` go to ``SessionJournal``. Returns the recovery stats.
+        Call it before the histories are shared between threads."""
+        journal = SessionJournal(directory, self._capture, self._snapshot_entry, **options)
+        stats = journal.recover(self._apply, self._apply)
+        journal.start()
+        self.journal = journal
+        return stats
+
+    def close_journal(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def _add(self, history: ChatHistory, exchanges: Tuple[Exchange, ...]):
+        """Append to a history under its shard lock, journaling the exchanges.
+        The wait for the journal commit comes after the lock is released, so
+        the shard's other sessions are not held up by the fsync."""
+        index = self.shard_index(history.session_id)
+        journal, sequence = self.journal, None
+        with self._locks[index]:
+            if journal is not None:
+                def apply():
+                    for exchange in exchanges:
+                        history._append(exchange)
+                    return {'s': history.session_id, 'n': history.total,
+                            'x': [_exchange_row(e) for e in exchanges]}
+                sequence = journal.write(apply)
+            else:
+                for exchange in exchanges:
+                    history._append(exchange)
+            if self._maps[index].get(history.session_id) is history:
+                self._message_counts[index] += len(exchanges)
+        if sequence is not None:
+            journal.wait(sequence)
+
+    def _capture(self) -> Iterator[Tuple[str, int, List[Exchange]]]:
+        # A generator, so the journal lock is only held to create it: each
+        # shard is copied under its own lock while the snapshot is written.
+        # Appends made before a shard is copied are in the new journal
+        # generation as well, and replay skips what the snapshot holds
+        for shard, lock in zip(self._maps, self._locks):
+            with lock:
+                items = [(session_id, history.total, list(history)) for session_id, history in shard.items()]
+            yield from items
+
+    @staticmethod
+    def _snapshot_entry(item: Tuple[str, int, List[Exchange]]) -> Dict:
+        session_id, total, exchanges = item
+        return {'s': session_id, 'n': total, 'x': [_exchange_row(e) for e in exchanges], 'r': 1}
+
+    def _apply(self, entry: Dict):
+        """Restore a snapshot entry or replay a journal entry; the caller
+        holds the session's shard lock, or nothing else runs (recovery)"""
+        session_id, total, rows = entry['s'], entry['n'], entry['x']
+        index = self.shard_index(session_id)
+        shard = self._maps[index]
+        history = shard.get(session_id)
+        if entry.get('r') or history is None:
+            if history is not None:
+                self._message_counts[index] -= history.total
+            history = ChatHistory(Config.MAX_CHAT_HISTORY, map(_row_exchange, rows), owner=self,
+                                  session_id=session_id)
+            history.total = total
+            self._message_counts[index] += total
+            shard[session_id] = history
+            return
+        missing = rows[max(len(rows) - (total - history.total), 0):]
+        for row in missing:
+            history._append(_row_exchange(row))
+        self._message_counts[index] += len(missing)
+
+    def load(self, records: Iterable[Dict]):
+        """Replace or add histories from exported ``{'session_id', 'history'}`` records"""
+        for record in records:
+            session_id = record['session_id']
+            exchanges = [Exchange.from_dict(exchange) for exchange in record.get('history', ())]
+            entry = {'s': session_id, 'n': len(exchanges), 'x': [_exchange_row(e) for e in exchanges], 'r': 1}
+            journal, sequence = self.journal, None
+            with self.lock(session_id):
+                if journal is not None:
+                    sequence = journal.write(lambda: self._apply(entry) or entry)
+                else:
+                    self._apply(entry)
+            if sequence is not None:
+                journal.wait(sequence)
+
+    def __setitem__(self, session_id: str, history: ChatHistory):
+        index = self.shard_index(session_id)
+        with self._locks[index]:
+            previous = self._maps[index].get(session_id)
+            self._message_counts[index] += history.total - (previous.total if previous is not None else 0)
+            self._maps[index][session_id] = history
+
+    def __delitem__(self, session_id: str):
+        self.pop(session_id)
+
+    def pop(self, session_id: str, *default):
+        index = self.shard_index(session_id)
+        with self._locks[index]:
+            history = self._maps[index].pop(session_id, None)
+            if history is None:
+                if default:
+                    return default[0]
+                raise KeyError(session_id)
+            self._message_counts[index] -= history.total
+            return history
+
+    def clear(self):
+        for index, (shard, lock) in enumerate(zip(self._maps, self._locks)):
+            with lock:
+                shard.clear()
+                self._message_counts[index] = 0
+
+    def page(self, after: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE) -> List[Dict]:
+        """``{'session_id', 'history'}`` records for up to ``limit`` sessions
+        whose id sorts after ``after``, in id order"""
+        return self._records(page_ids(self, after, limit))
+
+    def export(self, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Dict]:
+        """Every session's record, as ``page`` makes them, in id order"""
+        return export_ids(self, self._records, batch_size)
+
+    def _records(self, session_ids: Iterable[str]) -> List[Dict]:
+        records = []
+        for session_id in session_ids:
+            history = self.get(session_id)
+            if history is not None:
+                records.append({'session_id': session_id, 'history': history.to_list()})
+        return records
+
+
+def session_history(sessions: Dict[str, ChatHistory], session_id: str,
+                    capacity: Optional[int] = None) -> ChatHistory:
+    """Return a session's history, creating it (``Config.MAX_CHAT_HISTORY`` slots) on first use"""
+    if isinstance(sessions, SessionHistories):
+        return sessions.history(session_id, capacity)
+    history = sessions.get(session_id)
+    if history is None:
+        history = sessions[session_id] = ChatHistory(capacity or Config.MAX_CHAT_HISTORY, session_id=session_id)
+    return history
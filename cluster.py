@@ -0,0 +1,902 @@
+#!/usr/bin/env python3
+"""
+Pre-fork cluster launcher for STAN Chatbot
+
+Runs a Flask app in several worker processes behind a dispatcher that sends
+every request for a session to the one worker that owns it, so each worker
+keeps its own partition of the in-memory sessions and nothing is shared:
+
+    python cluster.py --app app:app --workers 4
+    WEB_CONCURRENCY=4 python cluster.py
+
+The master imports the heavy shared modules and compiles the intent catalog
+once, freezes the garbage collector so collections in the workers never
+write to those objects (which would copy their pages into every worker), then
+forks the workers and the dispatchers. It serves nothing itself: a child
+that dies is forked again, SIGHUP restarts the workers one at a time and
+SIGTERM or SIGINT shuts the cluster down. A worker told to stop drains: it
+stops accepting connections and finishes the requests in progress, up to
+``--drain-timeout`` seconds. Each worker listens on a localhost socket the
+master binds and keeps open, so requests for a restarting worker wait in
+its accept queue instead of failing.
+
+Ownership comes from a consistent-hash ring over the worker ids, keyed on
+the session id in the JSON body, the ``session_id`` query argument or the
+``X-Session-ID`` header. Requests without one go round-robin, or to the
+worker named by an ``X-Worker`` header, which a request for a session cannot
+override; the ids a worker hands out for new sessions are drawn until they
+hash to that worker. ``/chat/batch`` and ``/data/import`` are split by
+owner; ``/data``, ``/data/export``, ``/stats`` and ``/health`` gather every
+worker's part, and so do ``/data/memory`` and its export unless the workers
+share one MongoDB store for them; ``/cluster`` shows the workers.
+"""
+
+import argparse
+import atexit
+import gc
+import heapq
+import importlib
+import itertools
+import json
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection, HTTPException
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing.sharedctypes import RawArray
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, parse_qsl, urlsplit
+
+from session_export import page_args
+from session_ids import RING_REPLICAS, worker_ring
+
+logger = logging.getLogger(__name__)
+
+# Imported by the master before it forks, so the workers share them copy-on-write
+PRELOAD_MODULES = ('flask', 'flask_cors', 'intent_engine', 'sentiment_engine', 'text_processing',
+                   'topic_taxonomy', 'slot_extraction', 'chat_history', 'session_export', 'session_import',
+                   'session_ids')
+# Seconds a worker or dispatcher gets to finish its requests after SIGTERM
+DRAIN_TIMEOUT = 30.0
+# Seconds a new worker gets to import the app and start serving
+READY_TIMEOUT = 60.0
+# Seconds a dispatcher waits on a worker's response
+UPSTREAM_TIMEOUT = 120.0
+# A worker that dies within MIN_UPTIME seconds of starting is forked again after RESPAWN_DELAY
+MIN_UPTIME = 5.0
+RESPAWN_DELAY = 1.0
+# Connections each socket queues, e.g. while its worker restarts
+BACKLOG = 1024
+# Bytes copied per read when relaying a response body
+COPY_SIZE = 64 * 1024
+
+# Worker states, as shown by /cluster
+STARTING, READY, DRAINING, STOPPED = range(4)
+STATE_NAMES = ('starting', 'ready', 'draining', 'stopped')
+
+# Headers the dispatcher sets itself instead of copying between client and worker
+_RELAY_SKIPPED = frozenset(('connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'te',
+                            'trailer', 'transfer-encoding', 'upgrade', 'content-length', 'server', 'date'))
+
+
+def session_key(body: Optional[bytes], query: str, headers: Mapping[str, str]) -> Optional[str]:
+    """The session a request belongs to: ``session_id`` from its JSON body,
+    its query string or its ``X-Session-ID`` header, in that order"""
+    if body and 'json' in headers.get('Content-Type', ''):
+        try:
+            data = json.loads(body)
+        except ValueError:
+            data = None
+        if isinstance(data, dict) and isinstance(data.get('session_id'), str) and data['session_id']:
+            return data['session_id']
+    return parse_qs(query).get('session_id', [None])[0] or headers.get('X-Session-ID') or None
+
+
+def split_batch(items: Sequence, owner: Callable[[Optional[str]], int]) -> Dict[int, List[int]]:
+    """Positions of a ``/chat/batch`` item list grouped by ``owner(session_id)``,
+    in list order, so every session's messages stay in order on its worker"""
+    groups: Dict[int, List[int]] = {}
+    for position, item in enumerate(items):
+        session_id = item.get('session_id') if isinstance(item, dict) else None
+        groups.setdefault(owner(session_id if isinstance(session_id, str) else None), []).append(position)
+    return groups
+
+
+def merge_batch(groups: Mapping[int, List[int]], results: Mapping[int, List[Dict]]) -> List[Dict]:
+    """Each worker's batch results put back at their items' positions"""
+    merged = [None] * sum(map(len, groups.values()))
+    for worker, positions in groups.items():
+        for position, result in zip(positions, results[worker]):
+            merged[position] = result
+    return merged
+
+
+def merge_pages(pages: Sequence[Dict], limit: int) -> Dict:
+    """One ``/data`` page from every worker's page for the same cursor.
+
+    Each worker returns its first ``limit`` session ids after the cursor, so
+    the first ``limit`` ids of their union are the cluster's page. Other
+    counts are summed and the remaining fields come from the first page.
+    """
+    sessions = {key: value for page in pages for key, value in page['sessions'].items()}
+    user_data = {key: value for page in pages for key, value in page.get('user_data', {}).items()}
+    ids = heapq.nsmallest(limit, sessions)
+    merged = merge_stats(pages)
+    merged.pop('workers')
+    merged['sessions'] = {session_id: sessions[session_id] for session_id in ids}
+    if 'user_data' in merged:
+        merged['user_data'] = {session_id: user_data[session_id] for session_id in ids if session_id in user_data}
+    merged['next_cursor'] = ids[-1] if len(ids) == limit else None
+    return merged
+
+
+def merge_record_pages(pages: Sequence[Dict], limit: int) -> Dict:
+    """One ``/data/memory`` page from every worker's page for the same cursor,
+    as ``merge_pages`` but for pages listing session records in id order.
+    A session on more than one page (a store the workers share) is kept once."""
+    merged = heapq.merge(*(page['sessions'] for page in pages), key=lambda record: record['session_id'])
+    unique = (next(group) for _, group in itertools.groupby(merged, key=lambda record: record['session_id']))
+    records = list(itertools.islice(unique, limit))
+    return {'sessions': records, 'next_cursor': records[-1]['session_id'] if len(records) == limit else None,
+            'storage_type': pages[0].get('storage_type')}
+
+
+def merge_stats(docs: Sequence[Dict]) -> Dict:
+    """Every worker's ``/stats`` or ``/health`` in one: top-level counts are
+    summed, other fields come from the first worker, and ``workers`` keeps
+    each worker's own document"""
+    merged = dict(docs[0])
+    for key, value in docs[0].items():
+        if all(type(doc.get(key)) is int for doc in docs):
+            merged[key] = sum(doc[key] for doc in docs)
+    merged['workers'] = list(docs)
+    return merged
+
+
+def merge_imports(docs: Sequence[Dict], elapsed: float) -> Dict:
+    """Every worker's ``/data/import`` stats as one import taking ``elapsed`` seconds"""
+    imported = sum(doc['imported'] for doc in docs)
+    return {
+        'imported': imported,
+        'chunks': sum(doc['chunks'] for doc in docs),
+        'elapsed_s': round(elapsed, 3),
+        'sessions_per_s': round(imported / elapsed, 1) if elapsed > 0 else 0.0,
+        'workers': len(docs)
+    }
+
+
+class InFlight:
+    """Requests in progress, so a process can let them finish before it exits"""
+
+    def __init__(self):
+        self.count = 0
+        self._changed = threading.Condition()
+
+    def __enter__(self):
+        with self._changed:
+            self.count += 1
+
+    def __exit__(self, *exc_info):
+        with self._changed:
+            self.count -= 1
+            if not self.count:
+                self._changed.notify_all()
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the count to reach zero; False if ``timeout`` ran out first"""
+        with self._changed:
+            return self._changed.wait_for(lambda: not self.count, timeout)
+
+    def wsgi(self, app):
+        """``app`` counted from the call until its response body is closed,
+        so streamed responses are drained too"""
+        from werkzeug.wsgi import ClosingIterator
+
+        def counted(environ, start_response):
+            self.__enter__()
+            try:
+                body = app(environ, start_response)
+            except BaseException:
+                self.__exit__()
+                raise
+            return ClosingIterator(body, self.__exit__)
+        return counted
+
+
+class ClusterStatus:
+    """Worker pids, states and restart counts, in memory shared with the children"""
+
+    def __init__(self, workers: int):
+        self.pids = RawArray('i', workers)
+        self.states = RawArray('i', workers)
+        self.restarts = RawArray('i', workers)
+
+    def to_list(self, ports: Sequence[int]) -> List[Dict]:
+        return [{'id': index, 'pid': self.pids[index], 'port': port, 'state': STATE_NAMES[self.states[index]],
+                 'restarts': self.restarts[index]} for index, port in enumerate(ports)]
+
+
+class Upstream:
+    """Keep-alive HTTP connections from a dispatcher to one worker"""
+
+    def __init__(self, port: int, timeout: float = UPSTREAM_TIMEOUT):
+        self.port = port
+        self.timeout = timeout
+        self._idle = deque()
+
+    def connect(self) -> HTTPConnection:
+        return HTTPConnection('127.0.0.1', self.port, timeout=self.timeout)
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None,
+                headers: Optional[Mapping[str, str]] = None):
+        """Send a request and return (connection, response); hand both to
+        ``release`` once the body is read. A pooled connection the worker
+        closed, as a restarted worker's are, is dropped and the request sent
+        again, since the worker never saw it."""
+        while True:
+            try:
+                connection, reused = self._idle.pop(), True
+            except IndexError:
+                connection, reused = self.connect(), False
+            try:
+                connection.request(method, path, body, dict(headers or {}))
+                return connection, connection.getresponse()
+            except (ConnectionError, HTTPException):
+                connection.close()
+                if not reused:
+                    raise
+            except BaseException:
+                connection.close()
+                raise
+
+    def release(self, connection: HTTPConnection, response):
+        if response.will_close or not response.isclosed():
+            connection.close()
+        else:
+            self._idle.append(connection)
+
+    def fetch(self, method: str, path: str, body: Optional[bytes] = None,
+              headers: Optional[Mapping[str, str]] = None) -> Tuple[int, bytes]:
+        """(status, body) of a request"""
+        connection, response = self.request(method, path, body, headers)
+        try:
+            return response.status, response.read()
+        finally:
+            self.release(connection, response)
+
+
+class Dispatcher(ThreadingHTTPServer):
+    """HTTP front end routing each request to the worker owning its session"""
+
+    daemon_threads = True
+
+    def __init__(self, sock: socket.socket, ports: Sequence[int], status: Optional[ClusterStatus] = None,
+                 timeout: float = UPSTREAM_TIMEOUT):
+        super().__init__(sock.getsockname()[:2], DispatchHandler, bind_and_activate=False)
+        self.socket.close()
+        self.socket = sock
+        self.ports = list(ports)
+        self.ring = worker_ring(len(self.ports))
+        self.upstreams = [Upstream(port, timeout) for port in self.ports]
+        self.status = status
+        self.in_flight = InFlight()
+        self.pool = ThreadPoolExecutor(max_workers=4 * len(self.ports), thread_name_prefix='gather')
+        self._turns = itertools.count()
+        self._memory_shared: Optional[bool] = None
+
+    def next_worker(self) -> int:
+        """Round-robin choice for requests that belong to no session"""
+        return next(self._turns) % len(self.upstreams)
+
+    def memory_shared(self) -> bool:
+        """Whether the workers' async memory is one store they share (MongoDB)
+        rather than a partition per worker, asked of a worker once"""
+        if self._memory_shared is None:
+            status, body = self.upstreams[self.next_worker()].fetch('GET', '/data/memory?limit=1')
+            if status != 200:
+                raise HTTPException(f"worker answered {status} to /data/memory")
+            self._memory_shared = json.loads(body).get('storage_type', 'In-Memory') != 'In-Memory'
+        return self._memory_shared
+
+    def owner(self, session_id: Optional[str]) -> int:
+        return self.ring.node_for(session_id) if session_id else self.next_worker()
+
+    def gather(self, method: str, path: str, bodies: Mapping[int, Optional[bytes]],
+               headers: Optional[Mapping[str, str]] = None) -> Dict[int, Tuple[int, bytes]]:
+        """Send a request to each worker in ``bodies`` at once; (status, body) by worker"""
+        futures = {worker: self.pool.submit(self.upstreams[worker].fetch, method, path, body, headers)
+                   for worker, body in bodies.items()}
+        return {worker: future.result() for worker, future in futures.items()}
+
+    def describe(self) -> Dict:
+        return {
+            'workers': self.status.to_list(self.ports) if self.status else
+            [{'id': index, 'port': port} for index, port in enumerate(self.ports)],
+            'dispatcher_pid': os.getpid(),
+            'ring_replicas': RING_REPLICAS
+        }
+
+
+class DispatchHandler(BaseHTTPRequestHandler):
+    """One client connection to a dispatcher"""
+
+    protocol_version = 'HTTP/1.1'
+    server: Dispatcher
+
+    def do_GET(self):
+        self._responded = False
+        with self.server.in_flight:
+            try:
+                if 'chunked' in self.headers.get('Transfer-Encoding', '').lower():
+                    self.reply_json(411, {'error': 'Content-Length is required'})
+                    return
+                url = urlsplit(self.path)
+                route = ROUTES.get((self.command, url.path))
+                if route:
+                    route(self, url)
+                else:
+                    body = self.read_body()
+                    self.forward(self.pick(body, url.query), body)
+            except (OSError, HTTPException) as e:
+                logger.error(f"Dispatch of {self.command} {self.path} failed: {e}")
+                self.close_connection = True
+                if not self._responded:
+                    try:
+                        self.reply_json(503, {'error': 'Worker unavailable'}, {'Retry-After': '1'})
+                    except OSError:
+                        pass
+
+    do_HEAD = do_POST = do_PUT = do_PATCH = do_DELETE = do_OPTIONS = do_GET
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def read_body(self) -> Optional[bytes]:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length or self.command in ('POST', 'PUT', 'PATCH') else None
+
+    def upstream_headers(self, **extra) -> Dict[str, str]:
+        headers = {name: value for name, value in self.headers.items() if name.lower() not in _RELAY_SKIPPED}
+        headers['X-Forwarded-For'] = self.client_address[0]
+        headers.update(extra)
+        return headers
+
+    def pick(self, body: Optional[bytes], query: str) -> int:
+        """The worker for this request: the session's owner, or for a request
+        without a session the one named by ``X-Worker``, if any. A session
+        always goes to its owner, whatever the client asks for, since no
+        other worker has it."""
+        session_id = session_key(body, query, self.headers)
+        forced = self.headers.get('X-Worker', '')
+        if not session_id and forced.isdigit() and int(forced) < len(self.server.upstreams):
+            return int(forced)
+        return self.server.owner(session_id)
+
+    def start(self, status: int, headers: Mapping[str, str], reason: Optional[str] = None):
+        self.send_response(status, reason)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self._responded = True
+
+    def reply(self, status: int, body: bytes, headers: Optional[Mapping[str, str]] = None):
+        self.start(status, {'Content-Type': 'application/json', 'Content-Length': str(len(body)), **(headers or {})})
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def reply_json(self, status: int, value, headers: Optional[Mapping[str, str]] = None):
+        self.reply(status, json.dumps(value).encode('utf-8'), headers)
+
+    def write_chunk(self, data: bytes):
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+
+    def forward(self, worker: int, body: Optional[bytes]):
+        """Relay the request to one worker and stream its response back"""
+        upstream = self.server.upstreams[worker]
+        connection, response = upstream.request(self.command, self.path, body, self.upstream_headers())
+        try:
+            headers = {name: value for name, value in response.getheaders() if name.lower() not in _RELAY_SKIPPED}
+            headers['X-Worker'] = str(worker)
+            length = response.getheader('Content-Length')
+            chunked = length is None and self.command != 'HEAD' and response.status not in (204, 304)
+            if length is not None:
+                headers['Content-Length'] = length
+            elif chunked:
+                headers['Transfer-Encoding'] = 'chunked'
+            self.start(response.status, headers, response.reason)
+            if self.command == 'HEAD':
+                return
+            while True:
+                data = response.read1(COPY_SIZE)
+                if not data:
+                    break
+                if chunked:
+                    self.write_chunk(data)
+                else:
+                    self.wfile.write(data)
+            if chunked:
+                self.write_chunk(b'')
+        finally:
+            upstream.release(connection, response)
+
+    def gather_json(self, bodies: Mapping[int, Optional[bytes]], **headers) -> Optional[Dict[int, object]]:
+        """Every worker's parsed JSON response, or None after relaying the
+        first error response to the client"""
+        replies = self.server.gather(self.command, self.path, bodies, self.upstream_headers(**headers))
+        for status, body in replies.values():
+            if status != 200:
+                self.reply(status, body)
+                return None
+        return {worker: json.loads(body) for worker, (_, body) in replies.items()}
+
+    def everyone(self) -> Dict[int, None]:
+        return dict.fromkeys(range(len(self.server.upstreams)))
+
+    def cluster_status(self, url):
+        self.reply_json(200, self.server.describe())
+
+    def gather_stats(self, url):
+        docs = self.gather_json(self.everyone())
+        if docs is not None:
+            self.reply_json(200, merge_stats([docs[worker] for worker in sorted(docs)]))
+
+    def gather_page(self, url, merge: Callable[[Sequence[Dict], int], Dict] = merge_pages):
+        try:
+            _, limit = page_args(dict(parse_qsl(url.query)))
+        except ValueError:
+            self.forward(self.server.next_worker(), None)  # the worker explains the bad limit
+            return
+        pages = self.gather_json(self.everyone())
+        if pages is not None:
+            self.reply_json(200, merge([pages[worker] for worker in sorted(pages)], limit))
+
+    def gather_record_page(self, url):
+        if self.server.memory_shared():
+            self.forward(self.server.next_worker(), None)  # every worker would answer the same
+        else:
+            self.gather_page(url, merge_record_pages)
+
+    def export_memory(self, url):
+        if self.server.memory_shared():
+            self.forward(self.server.next_worker(), None)
+        else:
+            self.export_sessions(url)
+
+    def chat_batch(self, url):
+        body = self.read_body()
+        try:
+            data = json.loads(body)
+        except ValueError:
+            data = None
+        items = data.get('items') if isinstance(data, dict) else data
+        if not isinstance(items, list) or not items:
+            self.forward(self.server.next_worker(), body)  # the worker explains what is wrong
+            return
+        groups = split_batch(items, self.server.owner)
+        replies = self.gather_json({worker: json.dumps({'items': [items[i] for i in positions]}).encode('utf-8')
+                                    for worker, positions in groups.items()},
+                                   **{'Content-Type': 'application/json'})
+        if replies is not None:
+            results = merge_batch(groups, {worker: reply['results'] for worker, reply in replies.items()})
+            self.reply_json(200, {'results': results, 'count': len(results)})
+
+    def export_sessions(self, url):
+        """Every worker's NDJSON export, one after the other, in one stream"""
+        self.start(200, {'Content-Type': 'application/x-ndjson', 'Transfer-Encoding': 'chunked',
+                         'Content-Disposition': 'attachment; filename=sessions.ndjson'})
+        for worker, upstream in enumerate(self.server.upstreams):
+            connection, response = upstream.request('GET', self.path, None, self.upstream_headers())
+            try:
+                if response.status != 200:
+                    raise HTTPException(f"worker {worker} answered {response.status}")
+                while True:
+                    data = response.read1(COPY_SIZE)
+                    if not data:
+                        break
+                    self.write_chunk(data)
+            finally:
+                upstream.release(connection, response)
+        self.write_chunk(b'')
+
+    def import_sessions(self, url):
+        """Split an NDJSON archive by owner, streaming each worker its sessions
+        as a chunked upload while the archive is read"""
+        started = time.perf_counter()
+        fallback = self.server.next_worker()  # gets lines without a session id, for the worker to reject
+        uploads: Dict[int, HTTPConnection] = {}
+        buffers: Dict[int, bytearray] = {}
+        broken = set()
+
+        def send(worker: int, data: bytes):
+            if worker not in uploads:
+                connection = uploads[worker] = self.server.upstreams[worker].connect()
+                connection.putrequest('POST', self.path, skip_accept_encoding=True)
+                connection.putheader('Content-Type', 'application/x-ndjson')
+                connection.putheader('Transfer-Encoding', 'chunked')
+                connection.endheaders()
+            if worker in broken:
+                return  # the worker answered early, most likely rejecting the archive
+            try:
+                uploads[worker].send(b'%x\r\n%s\r\n' % (len(data), data) if data else b'0\r\n\r\n')
+            except (BrokenPipeError, ConnectionResetError):
+                broken.add(worker)
+
+        try:
+            remaining = int(self.headers.get('Content-Length') or 0)
+            while remaining > 0:
+                line = self.rfile.readline(remaining)
+                if not line:
+                    break
+                remaining -= len(line)
+                if not line.strip():
+                    continue
+                try:
+                    session_id = json.loads(line).get('session_id')
+                except (ValueError, AttributeError):
+                    session_id = None
+                worker = self.server.ring.node_for(session_id) if isinstance(session_id, str) else fallback
+                buffer = buffers.setdefault(worker, bytearray())
+                buffer += line if line.endswith(b'\n') else line + b'\n'
+                if len(buffer) >= COPY_SIZE:
+                    send(worker, bytes(buffer))
+                    buffer.clear()
+            for worker, buffer in buffers.items():
+                if buffer:
+                    send(worker, bytes(buffer))
+            if not uploads:
+                send(fallback, b'')  # an empty archive, answered by one worker
+            else:
+                for worker in list(uploads):
+                    send(worker, b'')
+            replies = {}
+            for worker, connection in uploads.items():
+                response = connection.getresponse()
+                replies[worker] = (response.status, response.read())
+        finally:
+            for connection in uploads.values():
+                connection.close()
+        for status, body in replies.values():
+            if status != 200:
+                self.reply(status, body)
+                return
+        self.reply_json(200, merge_imports([json.loads(body) for _, body in replies.values()],
+                                           time.perf_counter() - started))
+
+
+# Requests a dispatcher answers itself or fans out, by (method, path)
+ROUTES = {
+    ('GET', '/cluster'): DispatchHandler.cluster_status,
+    ('GET', '/stats'): DispatchHandler.gather_stats,
+    ('GET', '/health'): DispatchHandler.gather_stats,
+    ('GET', '/data'): DispatchHandler.gather_page,
+    ('GET', '/data/export'): DispatchHandler.export_sessions,
+    ('GET', '/data/memory'): DispatchHandler.gather_record_page,
+    ('GET', '/data/memory/export'): DispatchHandler.export_memory,
+    ('POST', '/data/import'): DispatchHandler.import_sessions,
+    ('POST', '/chat/batch'): DispatchHandler.chat_batch,
+}
+
+
+def load_app(spec: str):
+    """The WSGI app named by ``module:attribute`` (the attribute defaults to ``app``)"""
+    module, _, attribute = spec.partition(':')
+    return getattr(importlib.import_module(module), attribute or 'app')
+
+
+def _shut_down_on_sigterm(server):
+    # serve_forever() runs on this (the main) thread, where signal handlers
+    # also run, and shutdown() waits for it to return
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+
+
+def make_worker_server(app, sock: socket.socket, in_flight: InFlight):
+    """A threaded WSGI server for ``app`` on the listening ``sock``.
+
+    Each request is counted in ``in_flight`` while the app runs, and the
+    first one on a connection from the moment the connection is accepted: a
+    connection accepted just before a SIGTERM is answered before the worker
+    exits, rather than closed unanswered with its request never run.
+    """
+    from werkzeug.serving import ThreadedWSGIServer, WSGIRequestHandler
+
+    class Handler(WSGIRequestHandler):
+        def handle_one_request(self):
+            try:
+                super().handle_one_request()
+            finally:
+                self.server.first_request_done(self.request)
+
+    class Server(ThreadedWSGIServer):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self._unanswered = set()
+
+        def process_request(self, request, client_address):
+            in_flight.__enter__()
+            self._unanswered.add(request)
+            super().process_request(request, client_address)
+
+        def first_request_done(self, request):
+            try:
+                self._unanswered.remove(request)
+            except KeyError:
+                return
+            in_flight.__exit__()
+
+        def shutdown_request(self, request):
+            self.first_request_done(request)  # closed before a request arrived
+            super().shutdown_request(request)
+
+    host, port = sock.getsockname()[:2]
+    return Server(host, port, in_flight.wsgi(app), Handler, fd=sock.fileno())
+
+
+def serve_worker(app, sock: socket.socket, ready_fd: Optional[int] = None,
+                 drain_timeout: float = DRAIN_TIMEOUT) -> int:
+    """Serve ``app`` on the listening ``sock`` until SIGTERM, then let the
+    requests in progress finish and run the exit handlers (the apps close
+    their session journals there)"""
+    in_flight = InFlight()
+    server = make_worker_server(app, sock, in_flight)
+    _shut_down_on_sigterm(server)
+    if ready_fd is not None:
+        os.write(ready_fd, b'1')
+        os.close(ready_fd)
+    server.serve_forever()
+    if not in_flight.wait_idle(drain_timeout):
+        logger.warning(f"Worker exiting with {in_flight.count} requests unfinished after {drain_timeout:.0f} s")
+    atexit._run_exitfuncs()
+    return 0
+
+
+def serve_dispatcher(sock: socket.socket, ports: Sequence[int], status: Optional[ClusterStatus] = None,
+                     drain_timeout: float = DRAIN_TIMEOUT) -> int:
+    """Dispatch requests arriving on ``sock`` to the workers on ``ports`` until SIGTERM"""
+    server = Dispatcher(sock, ports, status)
+    _shut_down_on_sigterm(server)
+    server.serve_forever()
+    server.in_flight.wait_idle(drain_timeout)
+    return 0
+
+
+class Cluster:
+    """The master process, which forks and supervises workers and dispatchers"""
+
+    def __init__(self, app: str = 'app:app', workers: int = 2, dispatchers: int = 1, host: str = '0.0.0.0',
+                 port: int = 5000, preload: Sequence[str] = PRELOAD_MODULES, drain_timeout: float = DRAIN_TIMEOUT):
+        if workers < 1 or dispatchers < 1:
+            raise ValueError("a cluster needs at least one worker and one dispatcher")
+        self.app = app
+        self.workers = workers
+        self.dispatchers = dispatchers
+        self.host = host
+        self.port = port
+        self.preload_modules = preload
+        self.drain_timeout = drain_timeout
+        self.status = ClusterStatus(workers)
+        self._children: Dict[int, Tuple[str, int]] = {}  # pid -> ('worker' or 'dispatcher', index)
+        self._started = [0.0] * workers
+        self._stopping = False
+        self._restarting = False
+        self._wake = threading.Event()
+
+    def preload(self):
+        """Import the shared modules and compile the intent catalog once, before forking"""
+        for name in self.preload_modules:
+            try:
+                importlib.import_module(name)
+            except ImportError as e:
+                logger.warning(f"Not preloading {name}: {e}")
+        if 'intent_engine' in sys.modules:
+            sys.modules['intent_engine'].get_catalog()
+
+    def bind(self):
+        self.listener = socket.create_server((self.host, self.port), backlog=BACKLOG)
+        self.sockets = [socket.create_server(('127.0.0.1', 0), backlog=BACKLOG) for _ in range(self.workers)]
+        self.ports = [sock.getsockname()[1] for sock in self.sockets]
+
+    def _fork(self, role: str, index: int, serve: Callable[[], int]) -> int:
+        # Objects allocated so far move to a generation the collector never
+        # scans, so the children do not write to (and copy) their pages
+        gc.freeze()
+        pid = os.fork()
+        if pid:
+            self._children[pid] = (role, index)
+            return pid
+        code = 1
+        try:
+            gc.enable()
+            for signum in (signal.SIGTERM, signal.SIGCHLD):
+                signal.signal(signum, signal.SIG_DFL)
+            for signum in (signal.SIGINT, signal.SIGHUP):
+                signal.signal(signum, signal.SIG_IGN)  # the master decides
+            code = serve()
+        except BaseException:
+            logger.exception(f"{role.title()} {index} failed")
+        finally:
+            os._exit(code)
+
+    def spawn_worker(self, index: int) -> int:
+        """Fork worker ``index`` and wait until it serves"""
+        ready_read, ready_write = os.pipe()
+
+        def serve():
+            os.close(ready_read)
+            self.listener.close()
+            for other, sock in enumerate(self.sockets):
+                if other != index:
+                    sock.close()
+            os.environ['STAN_WORKER_ID'], os.environ['STAN_WORKERS'] = str(index), str(self.workers)
+            if os.environ.get('SESSION_JOURNAL_DIR'):
+                # One journal per worker: each journals its own partition
+                os.environ['SESSION_JOURNAL_DIR'] = os.path.join(os.environ['SESSION_JOURNAL_DIR'], f"worker-{index}")
+            return serve_worker(load_app(self.app), self.sockets[index], ready_write, self.drain_timeout)
+
+        self.status.states[index] = STARTING
+        pid = self._fork('worker', index, serve)
+        os.close(ready_write)
+        self.status.pids[index] = pid
+        self._started[index] = time.monotonic()
+        try:
+            ready = bool(select.select([ready_read], [], [], READY_TIMEOUT)[0]) and os.read(ready_read, 1) == b'1'
+        finally:
+            os.close(ready_read)
+        if ready:
+            self.status.states[index] = READY
+            logger.info(f"Worker {index} (pid {pid}) serving on port {self.ports[index]}")
+        else:
+            logger.error(f"Worker {index} (pid {pid}) did not start serving")
+        return pid
+
+    def spawn_dispatcher(self, index: int) -> int:
+        def serve():
+            for sock in self.sockets:
+                sock.close()
+            return serve_dispatcher(self.listener, self.ports, self.status, self.drain_timeout)
+
+        return self._fork('dispatcher', index, serve)
+
+    def run(self) -> int:
+        gc.disable()  # no collections in the master: they leave holes in pages the workers share
+        self.preload()
+        self.bind()
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGHUP, self._restart)
+        signal.signal(signal.SIGCHLD, lambda signum, frame: self._wake.set())
+        for index in range(self.workers):
+            self.spawn_worker(index)
+        for index in range(self.dispatchers):
+            self.spawn_dispatcher(index)
+        logger.info(f"Cluster of {self.workers} workers serving {self.app} on {self.host}:{self.port} "
+                    f"(master pid {os.getpid()})")
+        while not self._stopping:
+            self._wake.wait(1.0)
+            self._wake.clear()
+            if self._restarting and not self._stopping:
+                self._restarting = False
+                self.restart_workers()
+            self.reap()
+        self.shutdown()
+        return 0
+
+    def _stop(self, signum, frame):
+        self._stopping = True
+        self._wake.set()
+
+    def _restart(self, signum, frame):
+        self._restarting = True
+        self._wake.set()
+
+    def reap(self):
+        """Collect children that exited and fork their replacements"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            if pid not in self._children:
+                continue
+            role, index = self._children.pop(pid)
+            logger.warning(f"{role.title()} {index} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}")
+            if self._stopping:
+                continue
+            if role == 'dispatcher':
+                self.spawn_dispatcher(index)
+                continue
+            self.status.states[index] = STOPPED
+            self.status.restarts[index] += 1
+            if time.monotonic() - self._started[index] < MIN_UPTIME:
+                time.sleep(RESPAWN_DELAY)
+            self.spawn_worker(index)
+
+    def restart_workers(self):
+        """Replace the workers one at a time, each once its requests are done.
+
+        A worker is only forked again after the old one exits, so the two
+        never share a partition (or its journal); meanwhile its requests wait
+        in its socket's accept queue and the other workers keep serving.
+        """
+        logger.info("Rolling restart of the workers")
+        for index in range(self.workers):
+            if self._stopping:
+                return
+            self.terminate([self.status.pids[index]])
+            self.status.restarts[index] += 1
+            self.spawn_worker(index)
+
+    def terminate(self, pids: Iterable[int]):
+        """SIGTERM ``pids`` and wait for them to drain and exit, killing those
+        still running a little after the drain timeout"""
+        remaining = set()
+        for pid in pids:
+            role, index = self._children.get(pid, (None, None))
+            if role == 'worker':
+                self.status.states[index] = DRAINING
+            try:
+                os.kill(pid, signal.SIGTERM)
+                remaining.add(pid)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.drain_timeout + 5.0
+        while remaining:
+            for pid in list(remaining):
+                try:
+                    done = os.waitpid(pid, os.WNOHANG)[0]
+                except ChildProcessError:
+                    done = pid
+                if done:
+                    remaining.discard(pid)
+                    role, index = self._children.pop(pid, (None, None))
+                    if role == 'worker':
+                        self.status.states[index] = STOPPED
+            if remaining and time.monotonic() > deadline:
+                for pid in remaining:
+                    logger.error(f"Killing pid {pid}, still running after the drain timeout")
+                    os.kill(pid, signal.SIGKILL)
+                deadline = float('inf')
+            time.sleep(0.05)
+
+    def shutdown(self):
+        """Stop the dispatchers, then the workers, letting each drain"""
+        logger.info("Shutting down the cluster")
+        for role in ('dispatcher', 'worker'):
+            self.terminate([pid for pid, (kind, _) in list(self._children.items()) if kind == role])
+        self.listener.close()
+        for sock in self.sockets:
+            sock.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Serve the chatbot from several worker processes, each owning a partition of the sessions")
+    parser.add_argument('--app', default='app:app', help="WSGI app as module:attribute (default: app:app)")
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY') or os.cpu_count() or 1),
+                        help="worker processes (default: $WEB_CONCURRENCY or one per CPU)")
+    parser.add_argument('--dispatchers', type=int, default=1, help="dispatcher processes (default: 1)")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)), help="default: $PORT or 5000")
+    parser.add_argument('--drain-timeout', type=float, default=DRAIN_TIMEOUT,
+                        help="seconds a stopping worker gets to finish its requests")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if not hasattr(os, 'fork'):
+        logger.warning("This platform cannot fork; serving from a single process")
+        load_app(args.app).run(host=args.host, port=args.port)
+        return 0
+    return Cluster(args.app, args.workers, args.dispatchers, args.host, args.port,
+                   drain_timeout=args.drain_timeout).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -21,6 +21,11 @@ class Config:
     HOST = os.environ.get('HOST', '0.0.0.0')
     PORT = int(os.environ.get('PORT', 5000))
     
+    # Session storage for EnhancedMemoryManager: memory, mongodb or sqlite
+    # (unset: MongoDB when it is given a URI, memory otherwise)
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND', '')
+    SQLITE_PATH = os.environ.get('SQLITE_PATH', 'stan_sessions.db')
+    
     # Logging
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
 
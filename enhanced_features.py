@@ -5,10 +5,21 @@ Enhanced Memory and Context Management for STAN Chatbot
 import json
 import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 import pymongo
 from pymongo import MongoClient
 import logging
+from config import Config
+from sentiment_engine import LEXICONS
+from text_processing import NormalizedText, preprocess
+from topic_taxonomy import get_taxonomy
+from expiry_scheduler import ExpiryScheduler
+from mongodb_config import MongoDBConfig, get_client, get_config
+from session_export import DEFAULT_PAGE_SIZE, EXPORT_BATCH_SIZE
+from session_import import IMPORT_CHUNK_SIZE, ImportStats, import_sessions
+from storage_backends import (MemoryBackend, MongoBackend, SessionBackend, create_backend, ensure_ttl_index,
+                              message_upsert, project_session, restored_session, session_projection,
+                              touch_upsert, utcnow, with_messages)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -17,80 +28,132 @@ logger = logging.getLogger(__name__)
 class EnhancedMemoryManager:
     """Advanced memory management with MongoDB storage for better contextual awareness"""
     
-    def __init__(self, max_sessions=1000, session_timeout_hours=24, mongodb_uri="mongodb://localhost:27017/"):
-        # MongoDB connection
-        try:
-            self.client = MongoClient(mongodb_uri)
-            self.db = self.client.stan_chatbot
-            self.sessions_collection = self.db.sessions
-            self.preferences_collection = self.db.user_preferences
-            
-            # Create indexes for better performance
-            self.sessions_collection.create_index("session_id", unique=True)
-            self.sessions_collection.create_index("last_active")
-            
-            logger.info("MongoDB connection established successfully")
-        except Exception as e:
-            logger.error(f"MongoDB connection failed: {e}")
-            logger.info("Falling back to in-memory storage")
-            # Fallback to in-memory storage
-            self.client = None
-            self.sessions = {}
-            self.user_preferences = {}
-        
+    # Messages kept per session history
+    HISTORY_LIMIT = 20
+    # Seconds a cached session's last_active may lag behind before it is rewritten
+    TOUCH_INTERVAL = 60
+    
+    def __init__(self, max_sessions=1000, session_timeout_hours=24, mongodb_uri="mongodb://localhost:27017/",
+                 database=None, cleanup_interval=60, cleanup_batch=1000, write_behind_ms=None,
+                 write_behind_ops=500, session_cache_size=0, session_cache_ttl=30,
+                 mongo_config: Optional[MongoDBConfig] = None, journal_dir: Optional[str] = None,
+                 backend: Optional[str] = None, sqlite_path: Optional[str] = None):
+        # Sessions live in a storage backend (see storage_backends) named by
+        # ``backend`` or ``Config.SESSION_BACKEND``: 'memory', 'mongodb' or
+        # 'sqlite'. Unset, MongoDB is used when ``database`` or
+        # ``mongodb_uri`` is given and memory otherwise; an unreachable
+        # MongoDB falls back to memory.
+        # MongoDB connection. ``database`` takes an already created database
+        # instead of a URI; ``mongodb_uri=None`` keeps everything in memory.
+        # The client comes from the process-wide registry in mongodb_config,
+        # with the pool and compression settings of ``mongo_config``.
+        # ``write_behind_ms`` (MongoDB only) buffers add_message writes and
+        # flushes them every that many milliseconds or ``write_behind_ops``
+        # messages, whichever comes first. ``session_cache_size`` (MongoDB
+        # only) keeps that many sessions cached for ``session_cache_ttl`` seconds.
+        # ``journal_dir`` (in-memory only) persists sessions in a local
+        # ``SessionJournal`` there and recovers them on start.
+        # ``sqlite_path`` (SQLite only) is the database file, by default
+        # ``Config.SQLITE_PATH``.
+        self.mongo_config = mongo_config or get_config()
+        self.mongodb_uri = mongodb_uri
+        self._client_options = self.mongo_config.get_connection_options()
+        self._database = database
         self.max_sessions = max_sessions
         self.session_timeout = timedelta(hours=session_timeout_hours)
+        backend = backend or Config.SESSION_BACKEND or (
+            'mongodb' if database is not None or mongodb_uri else 'memory')
+        common = dict(max_sessions=max_sessions, ttl=self.session_timeout, history_limit=self.HISTORY_LIMIT)
+        self.backend: SessionBackend = None
+        if backend == 'mongodb':
+            try:
+                self.backend = MongoBackend(
+                    lambda: self.sessions_collection, write_behind_ms=write_behind_ms,
+                    write_behind_ops=write_behind_ops, session_cache_size=session_cache_size,
+                    session_cache_ttl=session_cache_ttl, touch_interval=self.TOUCH_INTERVAL, **common)
+                logger.info("MongoDB connection established successfully")
+            except Exception as e:
+                logger.error(f"MongoDB connection failed: {e}")
+                logger.info("Falling back to in-memory storage")
+                backend = 'memory'
+        elif backend == 'sqlite':
+            self.backend = create_backend(backend, path=sqlite_path or Config.SQLITE_PATH, **common)
+            logger.info(f"Storing sessions in SQLite at {self.backend.path}")
+        if self.backend is None:
+            self.backend = create_backend(backend, journal_dir=journal_dir, **common)
+        self.user_preferences = {}
+        self.taxonomy = get_taxonomy()
+        
+        # Surplus sessions (and, outside MongoDB, expired ones) are purged in
+        # the background, in batches of at most ``cleanup_batch``, never on
+        # the request path
+        self.expiry = ExpiryScheduler(cleanup_interval or 0, cleanup_batch)
+        self.expiry.add_job('sessions', self._cleanup_old_sessions)
+        if cleanup_interval:
+            self.expiry.start()
+    
+    @property
+    def mongodb(self) -> bool:
+        """Whether sessions are stored in MongoDB"""
+        return isinstance(self.backend, MongoBackend)
+    
+    @property
+    def sessions(self):
+        """The in-memory ``SessionStore`` (memory backend only)"""
+        return self.backend.sessions
+    
+    @property
+    def journal(self):
+        return getattr(self.backend, 'journal', None)
+    
+    @property
+    def write_behind(self):
+        return getattr(self.backend, 'write_behind', None)
+    
+    @property
+    def session_cache(self):
+        return getattr(self.backend, 'session_cache', None)
+    
+    @property
+    def activity(self):
+        return self.backend.activity
+    
+    @property
+    def client(self) -> Optional[MongoClient]:
+        """This process's shared client; resolved on every use, so a manager
+        created before a pre-fork server forks gets a fresh client in each worker"""
+        if self._database is not None or not self.mongodb_uri:
+            return None
+        return get_client(self.mongodb_uri, self._client_options)
+    
+    @property
+    def db(self):
+        if self._database is not None:
+            return self._database
+        return self.client[self.mongo_config.DATABASE_NAME]
+    
+    @property
+    def sessions_collection(self):
+        return self.db.sessions
+    
+    @property
+    def preferences_collection(self):
+        return self.db.user_preferences
+        
+    def get_session(self, session_id: str, fields: Optional[Iterable[str]] = None,
+                    history: Optional[int] = None) -> Dict:
+        """Get or create a session with enhanced tracking.
         
-    def get_session(self, session_id: str) -> Dict:
-        """Get or create a session with enhanced tracking"""
-        if self.client:  # MongoDB mode
-            session = self.sessions_collection.find_one({"session_id": session_id})
-            
-            if not session:
-                # Create new session
-                session_data = {
-                    'session_id': session_id,
-                    'history': [],
-                    'created_at': datetime.now(),
-                    'last_active': datetime.now(),
-                    'message_count': 0,
-                    'user_info': {},
-                    'conversation_topics': [],
-                    'sentiment_history': []
-                }
-                self.sessions_collection.insert_one(session_data)
-                session = session_data
-            else:
-                # Update last_active timestamp
-                self.sessions_collection.update_one(
-                    {"session_id": session_id},
-                    {"$set": {"last_active": datetime.now()}}
-                )
-            
-            # Clean up old sessions
-            self._cleanup_old_sessions()
-            return session
-        else:  # Fallback to in-memory mode
-            if session_id not in self.sessions:
-                self.sessions[session_id] = {
-                    'history': [],
-                    'created_at': datetime.now(),
-                    'last_active': datetime.now(),
-                    'message_count': 0,
-                    'user_info': {},
-                    'conversation_topics': set(),
-                    'sentiment_history': []
-                }
-            else:
-                self.sessions[session_id]['last_active'] = datetime.now()
-            
-            # Clean up old sessions
-            self._cleanup_old_sessions()
-            return self.sessions[session_id]
+        ``fields`` limits the result to those fields and ``history`` to the
+        last that many messages. MongoDB and SQLite push them down into the
+        read; in memory the whole session is returned.
+        """
+        return self.backend.get(session_id, fields, history)
     
-    def add_message(self, session_id: str, user_message: str, bot_response: str, sentiment: str = None):
+    def add_message(self, session_id: str, user_message: Union[str, NormalizedText], bot_response: str, sentiment: str = None):
         """Add message with enhanced context tracking"""
-        session = self.get_session(session_id)
+        text = preprocess(user_message)
+        user_message = text.raw
         
         timestamp = datetime.now().isoformat()
         new_message = {
@@ -99,43 +162,15 @@ class EnhancedMemoryManager:
             'bot': bot_response,
             'sentiment': sentiment
         }
-        
-        if self.client:  # MongoDB mode
-            # Add message to history
-            self.sessions_collection.update_one(
-                {"session_id": session_id},
-                {
-                    "$push": {"history": new_message},
-                    "$inc": {"message_count": 1},
-                    "$set": {"last_active": datetime.now()}
-                }
-            )
-            
-            # Extract topics and keywords
-            self._extract_topics_mongodb(session_id, user_message)
-            
-            # Keep only recent history (last 20 messages)
-            session_data = self.sessions_collection.find_one({"session_id": session_id})
-            if len(session_data['history']) > 20:
-                trimmed_history = session_data['history'][-20:]
-                self.sessions_collection.update_one(
-                    {"session_id": session_id},
-                    {"$set": {"history": trimmed_history}}
-                )
-        else:  # Fallback to in-memory mode
-            session['history'].append(new_message)
-            session['message_count'] += 1
-            
-            # Extract topics and keywords
-            self._extract_topics(session, user_message)
-            
-            # Keep only recent history
-            if len(session['history']) > 20:
-                session['history'] = session['history'][-20:]
+        self.backend.append(session_id, new_message, self.taxonomy.extract(text))
+    
+    def trim_history(self, session_id: str, keep: int):
+        """Keep only the last ``keep`` messages of a session's history"""
+        self.backend.trim(session_id, keep)
     
     def get_context_summary(self, session_id: str) -> str:
         """Generate context summary for better responses"""
-        session = self.get_session(session_id)
+        session = self.get_session(session_id, fields=('conversation_topics',), history=5)
         
         if not session.get('history'):
             return ""
@@ -143,141 +178,85 @@ class EnhancedMemoryManager:
         # Recent conversation summary
         recent_messages = session['history'][-5:]
         
-        if self.client:  # MongoDB mode
-            topics = session.get('conversation_topics', [])[-3:]  # Recent topics (stored as list)
-        else:  # In-memory mode
-            topics = list(session.get('conversation_topics', set()))[-3:]  # Recent topics
+        # Recent topics (a list in MongoDB and SQLite, a set in memory)
+        topics = list(session.get('conversation_topics', ()))[-3:]
         
         context = f"Recent topics: {', '.join(topics) if topics else 'general conversation'}"
         
         return context
     
-    def _extract_topics(self, session: Dict, message: str):
+    def _extract_topics(self, session: Dict, message: Union[str, NormalizedText]):
         """Extract conversation topics for context (in-memory mode)"""
-        # Simple keyword extraction (can be enhanced with NLP)
-        topics = ['weather', 'time', 'jokes', 'help', 'technology', 'work', 'family']
-        
-        for topic in topics:
-            if topic in message.lower():
-                session['conversation_topics'].add(topic)
+        session['conversation_topics'].update(self.taxonomy.extract(message))
     
-    def _extract_topics_mongodb(self, session_id: str, message: str):
-        """Extract conversation topics for context (MongoDB mode)"""
-        # Simple keyword extraction (can be enhanced with NLP)
-        topics = ['weather', 'time', 'jokes', 'help', 'technology', 'work', 'family']
+    def _cleanup_old_sessions(self, budget: int = 1000) -> Tuple[int, int]:
+        """Remove up to ``budget`` expired or surplus sessions.
         
-        new_topics = []
-        for topic in topics:
-            if topic in message.lower():
-                new_topics.append(topic)
+        Runs on the expiry scheduler. Returns (sessions removed, sessions
+        still due), the backlog being counted up to one more batch.
+        """
+        return self.backend.expire(budget)
+    
+    def page_sessions(self, after: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE) -> List[Dict]:
+        """Up to ``limit`` sessions whose id sorts after ``after``, in id order.
         
-        if new_topics:
-            # Add unique topics to the conversation_topics array
-            self.sessions_collection.update_one(
-                {"session_id": session_id},
-                {"$addToSet": {"conversation_topics": {"$each": new_topics}}}
-            )
+        Reading a page does not mark its sessions active. In MongoDB and
+        SQLite the page is a range scan of the session_id index; see
+        ``session_export``.
+        """
+        return self.backend.page(after, limit)
     
-    def _cleanup_old_sessions(self):
-        """Remove expired sessions"""
-        current_time = datetime.now()
+    def export_sessions(self, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Dict]:
+        """Every stored session, one at a time, holding one batch in memory"""
+        return self.backend.export(batch_size)
+    
+    def import_sessions(self, records: Iterable[Dict], chunk_size: int = IMPORT_CHUNK_SIZE,
+                        progress: Optional[Callable[[ImportStats], None]] = None) -> ImportStats:
+        """Load exported sessions, replacing stored ones with the same id.
         
-        if self.client:  # MongoDB mode
-            # Remove expired sessions
-            cutoff_time = current_time - self.session_timeout
-            result = self.sessions_collection.delete_many({
-                "last_active": {"$lt": cutoff_time}
-            })
-            if result.deleted_count > 0:
-                logger.info(f"Cleaned up {result.deleted_count} expired sessions")
-            
-            # Also cleanup if too many sessions
-            total_sessions = self.sessions_collection.count_documents({})
-            if total_sessions > self.max_sessions:
-                # Remove oldest sessions
-                sessions_to_remove = total_sessions - self.max_sessions
-                oldest_sessions = self.sessions_collection.find().sort("last_active", 1).limit(sessions_to_remove)
-                
-                session_ids_to_remove = [session["session_id"] for session in oldest_sessions]
-                if session_ids_to_remove:
-                    result = self.sessions_collection.delete_many({
-                        "session_id": {"$in": session_ids_to_remove}
-                    })
-                    logger.info(f"Cleaned up {result.deleted_count} oldest sessions to maintain max limit")
-        else:  # Fallback to in-memory mode
-            expired_sessions = []
-            
-            for session_id, session_data in self.sessions.items():
-                if current_time - session_data['last_active'] > self.session_timeout:
-                    expired_sessions.append(session_id)
-            
-            for session_id in expired_sessions:
-                del self.sessions[session_id]
-            
-            # Also cleanup if too many sessions
-            if len(self.sessions) > self.max_sessions:
-                # Remove oldest sessions
-                sorted_sessions = sorted(
-                    self.sessions.items(),
-                    key=lambda x: x[1]['last_active']
-                )
-                
-                sessions_to_remove = len(self.sessions) - self.max_sessions
-                for i in range(sessions_to_remove):
-                    del self.sessions[sorted_sessions[i][0]]
+        Records are inserted ``chunk_size`` at a time: one unordered
+        ``bulk_write`` of upserting replacements per chunk in MongoDB mode, one
+        transaction in SQLite, one batch insert into the store in memory.
+        Imported sessions count as active from the import, so the TTL does
+        not reap a restore at once.
+        """
+        return import_sessions(records, self.backend.load, chunk_size, progress)
     
     def get_session_stats(self) -> Dict:
-        """Get statistics about stored sessions"""
-        if self.client:  # MongoDB mode
-            total_sessions = self.sessions_collection.count_documents({})
-            active_sessions = self.sessions_collection.count_documents({
-                "last_active": {"$gte": datetime.now() - timedelta(hours=1)}
-            })
-            return {
-                "total_sessions": total_sessions,
-                "active_sessions_last_hour": active_sessions,
-                "storage_type": "MongoDB"
-            }
-        else:  # In-memory mode
-            total_sessions = len(self.sessions)
-            active_sessions = sum(1 for session in self.sessions.values() 
-                                if datetime.now() - session['last_active'] < timedelta(hours=1))
-            return {
-                "total_sessions": total_sessions,
-                "active_sessions_last_hour": active_sessions,
-                "storage_type": "In-Memory"
-            }
+        """Get statistics about stored sessions.
+        
+        Both counts are O(1): the total comes from collection metadata, a
+        counter row or the store's size, and the active count from a sliding
+        window updated on every access. In MongoDB and SQLite that window
+        covers this process only.
+        """
+        return dict(self.backend.stats(), expiry=self.expiry.metrics())
     
     def close_connection(self):
-        """Close MongoDB connection"""
-        if self.client:
-            self.client.close()
-            logger.info("MongoDB connection closed")
+        """Stop background expiry, flush buffered writes and close the backend.
+        
+        The MongoDB client is shared by the whole process and stays open;
+        ``mongodb_config.close_clients()`` closes it at shutdown.
+        """
+        self.expiry.stop()
+        self.backend.close()
 
 class SentimentAnalyzer:
     """Simple sentiment analysis for empathetic responses"""
     
     def __init__(self):
-        self.positive_words = ['good', 'great', 'awesome', 'amazing', 'wonderful', 'fantastic', 'love', 'like', 'happy', 'excited']
-        self.negative_words = ['bad', 'terrible', 'awful', 'hate', 'sad', 'angry', 'frustrated', 'disappointed', 'upset']
-        self.question_words = ['what', 'how', 'why', 'when', 'where', 'who', 'which']
+        self.lexicon = LEXICONS['enhanced']
+        self.positive_words = self.lexicon.positive_words
+        self.negative_words = self.lexicon.negative_words
+        self.question_words = self.lexicon.question_words
     
-    def analyze(self, text: str) -> str:
+    def analyze(self, text: Union[str, NormalizedText]) -> str:
         """Analyze sentiment of user message"""
-        text_lower = text.lower()
-        
-        positive_count = sum(1 for word in self.positive_words if word in text_lower)
-        negative_count = sum(1 for word in self.negative_words if word in text_lower)
-        has_question = any(word in text_lower for word in self.question_words)
-        
-        if negative_count > positive_count:
-            return 'negative'
-        elif positive_count > negative_count:
-            return 'positive'
-        elif has_question:
-            return 'questioning'
-        else:
-            return 'neutral'
+        return self.lexicon.analyze(text)
+    
+    def analyze_batch(self, texts: List[str]):
+        """Analyze a batch of messages at once (vectorized with NumPy)"""
+        return self.lexicon.analyze_batch(texts)
 
 class EmpathyEngine:
     """Generate empathetic responses based on context and sentiment"""
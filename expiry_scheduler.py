@@ -0,0 +1,112 @@
+"""
+Background housekeeping scheduler for STAN Chatbot
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# A job gets its work budget for the tick and returns (items processed,
+# due items still waiting). Coroutine jobs run on the event loop they were
+# registered with.
+ExpiryJob = Callable[[int], Tuple[int, int]]
+
+
+class ExpiryScheduler:
+    """Runs expiry jobs on a daemon thread, off the request path.
+
+    Every ``interval`` seconds each job is called with a budget of at most
+    ``max_per_tick`` items, so a single tick does bounded work however large
+    the backlog grows. Tick durations and backlogs are kept as metrics.
+    """
+
+    def __init__(self, interval: float = 60.0, max_per_tick: int = 1000):
+        self.interval = interval
+        self.max_per_tick = max_per_tick
+        self._jobs: List[Tuple[str, Callable, Optional[asyncio.AbstractEventLoop]]] = []
+        self._metrics: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_job(self, name: str, job: Callable, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """Register a job; coroutine jobs need the ``loop`` that owns their I/O"""
+        with self._lock:
+            self._jobs.append((name, job, loop))
+            self._metrics[name] = {
+                'ticks': 0,
+                'processed_total': 0,
+                'backlog': 0,
+                'last_tick_ms': 0.0,
+                'max_tick_ms': 0.0,
+                'total_tick_ms': 0.0,
+                'errors': 0,
+            }
+
+    def tick(self) -> int:
+        """Run every job once; returns the number of items processed"""
+        processed_total = 0
+        for name, job, loop in list(self._jobs):
+            start = time.perf_counter()
+            try:
+                if loop is not None:
+                    processed, backlog = asyncio.run_coroutine_threadsafe(job(self.max_per_tick), loop).result()
+                else:
+                    processed, backlog = job(self.max_per_tick)
+                error = False
+            except Exception as e:
+                logger.error(f"Expiry job '{name}' failed: {e}")
+                processed, backlog, error = 0, 0, True
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            processed_total += processed
+            with self._lock:
+                metrics = self._metrics[name]
+                metrics['ticks'] += 1
+                metrics['processed_total'] += processed
+                metrics['backlog'] = backlog
+                metrics['last_tick_ms'] = elapsed_ms
+                metrics['max_tick_ms'] = max(metrics['max_tick_ms'], elapsed_ms)
+                metrics['total_tick_ms'] += elapsed_ms
+                metrics['errors'] += error
+        return processed_total
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.tick()
+
+    def start(self):
+        """Start the background thread (no-op when already running)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='stan-expiry', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def metrics(self) -> Dict:
+        """Per-job tick cost and backlog, plus the scheduler settings"""
+        with self._lock:
+            jobs = {}
+            for name, metrics in self._metrics.items():
+                jobs[name] = dict(metrics)
+                ticks = metrics['ticks']
+                jobs[name]['avg_tick_ms'] = metrics['total_tick_ms'] / ticks if ticks else 0.0
+                del jobs[name]['total_tick_ms']
+        return {
+            'running': self.running,
+            'interval_seconds': self.interval,
+            'max_per_tick': self.max_per_tick,
+            'jobs': jobs,
+        }
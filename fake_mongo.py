@@ -0,0 +1,319 @@
+"""
+In-process fake MongoDB collections for the tests and benchmarks
+
+``FakeCollection`` answers the pymongo commands the memory managers and
+storage backends use from a dict of documents, and ``FakeAsyncCollection``
+the motor-style coroutine versions, so no mongod is needed. Each command
+can simulate a fixed network round trip, and the collections count the
+commands, the bytes read and how many commands were in flight at once.
+"""
+
+import asyncio
+import copy
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+import bson
+from pymongo import ReplaceOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from async_memory import AsyncEnhancedMemoryManager
+from enhanced_features import EnhancedMemoryManager, utcnow
+
+
+def _project(document, projection):
+    if document is None or projection is None:
+        return document
+    included = [key for key, value in projection.items() if not isinstance(value, dict) and value]
+    result = {key: document[key] for key in included if key in document} if included else dict(document)
+    for key, value in projection.items():
+        if isinstance(value, dict) and '$slice' in value and key in document:
+            count = value['$slice']
+            result[key] = document[key][count:] if count < 0 else document[key][:count]
+    return result
+
+
+def _matches(document, query):
+    for key, condition in query.items():
+        value = document.get(key)
+        if isinstance(condition, dict):
+            if '$gt' in condition and not value > condition['$gt']:
+                return False
+            if '$lt' in condition and not value < condition['$lt']:
+                return False
+            if '$lte' in condition and not value <= condition['$lte']:
+                return False
+            if '$gte' in condition and not value >= condition['$gte']:
+                return False
+            if '$in' in condition and value not in condition['$in']:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _write_model(request):
+    """(filter, document or update, upsert) of a bulk_write request. pymongo
+    has no public accessors for them, so this is the one place the fakes
+    read its private attributes."""
+    return request._filter, request._doc, request._upsert
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self._documents = list(documents)
+
+    def sort(self, key, direction=1):
+        self._documents.sort(key=lambda d: d[key], reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self._documents = self._documents[:count]
+        return self
+
+    def __iter__(self):
+        return iter(self._documents)
+
+    async def __aiter__(self):
+        for document in self._documents:
+            yield document
+
+
+class FakeCollection:
+    """Blocking pymongo-style collection with a simulated round trip per command"""
+
+    name = 'sessions'
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.documents = {}
+        self.indexes = {}
+        self.commands = 0
+        self.bytes_read = 0
+        # Commands waiting on their round trip now, and the most there have been at once
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _start_command(self):
+        self.commands += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _round_trip(self):
+        self._start_command()
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+
+    def _find_one(self, query):
+        if set(query) == {'session_id'} and not isinstance(query['session_id'], dict):
+            return self.documents.get(query['session_id'])
+        return next((d for d in self.documents.values() if _matches(d, query)), None)
+
+    def _update_one(self, query, update, upsert=False):
+        document = self._find_one(query)
+        matched = document is not None
+        if document is None:
+            if not upsert:
+                return SimpleNamespace(matched_count=0, upserted_id=None)
+            document = self.documents[query['session_id']] = dict(query)
+            document.update(update.get('$setOnInsert', {}))
+        document.update(update.get('$set', {}))
+        for key, amount in update.get('$inc', {}).items():
+            document[key] = document.get(key, 0) + amount
+        for key, value in update.get('$push', {}).items():
+            values = document.setdefault(key, [])
+            if isinstance(value, dict) and '$each' in value:
+                values.extend(value['$each'])
+                if '$slice' in value:
+                    values[:] = values[value['$slice']:]
+            else:
+                values.append(value)
+        for key, values in update.get('$addToSet', {}).items():
+            current = document.setdefault(key, [])
+            current.extend(v for v in values['$each'] if v not in current)
+        return SimpleNamespace(matched_count=int(matched), upserted_id=None if matched else query['session_id'])
+
+    def _find_one_and_update(self, query, update, projection, upsert):
+        # Always returns the document after the update (ReturnDocument.AFTER)
+        self._update_one(query, update, upsert)
+        return self._read(_project(self._find_one(query), projection))
+
+    def _insert_one(self, document):
+        # session_id carries a unique index in every manager
+        if document['session_id'] in self.documents:
+            raise DuplicateKeyError(f"E11000 duplicate key error dup key: {{ session_id: \"{document['session_id']}\" }}",
+                                    code=11000)
+        self.documents[document['session_id']] = copy.deepcopy(document)
+
+    def _delete_many(self, query):
+        doomed = [key for key, d in self.documents.items() if _matches(d, query)]
+        for key in doomed:
+            del self.documents[key]
+        return SimpleNamespace(deleted_count=len(doomed))
+
+    def _create_index(self, key, **options):
+        name = f"{key}_1"
+        if name in self.indexes and self.indexes[name] != options:
+            raise OperationFailure(f"Index with name: {name} already exists with different options", code=85)
+        self.indexes[name] = options
+
+    def _command(self, command, value, **options):
+        # Only collMod changing an index's expireAfterSeconds (MongoDB 5.1+)
+        assert command == 'collMod' and value == self.name, command
+        name = '_'.join(f"{key}_{direction}" for key, direction in options['index']['keyPattern'].items())
+        if name not in self.indexes:
+            raise OperationFailure(f"cannot find index {name}", code=27)
+        self.indexes[name] = dict(self.indexes[name], expireAfterSeconds=options['index']['expireAfterSeconds'])
+        return {'ok': 1.0}
+
+    @property
+    def database(self):
+        return SimpleNamespace(command=self.command)
+
+    def command(self, command, value, **options):
+        self._round_trip()
+        return self._command(command, value, **options)
+
+    def run_ttl_monitor(self, now=None):
+        """Delete documents past their TTL index, as mongod's TTL monitor does every minute"""
+        now = now or utcnow()
+        for name, options in self.indexes.items():
+            if 'expireAfterSeconds' in options:
+                cutoff = now - timedelta(seconds=options['expireAfterSeconds'])
+                self._delete_many({name[:-2]: {'$lt': cutoff}})
+
+    def create_index(self, key, **options):
+        self._round_trip()
+        self._create_index(key, **options)
+
+    def _drop_index(self, name):
+        if name not in self.indexes:
+            raise OperationFailure(f"index not found with name [{name}]", code=27)
+        del self.indexes[name]
+
+    def drop_index(self, name):
+        self._round_trip()
+        self._drop_index(name)
+
+    def estimated_document_count(self):
+        self._round_trip()
+        return len(self.documents)
+
+    def _read(self, document):
+        if document is not None:
+            self.bytes_read += len(bson.encode(document))
+        return copy.deepcopy(document)
+
+    def find_one(self, query, projection=None):
+        self._round_trip()
+        return self._read(_project(self._find_one(query), projection))
+
+    def insert_one(self, document):
+        self._round_trip()
+        self._insert_one(document)
+
+    def update_one(self, query, update, upsert=False):
+        self._round_trip()
+        return self._update_one(query, update, upsert)
+
+    def delete_many(self, query):
+        self._round_trip()
+        return self._delete_many(query)
+
+    def find_one_and_update(self, query, update, projection=None, upsert=False, return_document=False):
+        self._round_trip()
+        return self._find_one_and_update(query, update, projection, upsert)
+
+    def bulk_write(self, requests, ordered=True):
+        self._round_trip()
+        for request in requests:
+            query, document, upsert = _write_model(request)
+            if isinstance(request, ReplaceOne):
+                if upsert or self._find_one(query) is not None:
+                    self.documents[query['session_id']] = copy.deepcopy(document)
+            else:
+                self._update_one(query, document, upsert)
+        return SimpleNamespace(modified_count=len(requests))
+
+    def count_documents(self, query, limit=0):
+        self._round_trip()
+        count = sum(1 for d in self.documents.values() if _matches(d, query))
+        return min(count, limit) if limit else count
+
+    def find(self, query=None, projection=None):
+        self.commands += 1
+        return FakeCursor(_project(copy.deepcopy(d), projection)
+                          for d in self.documents.values() if _matches(d, query or {}))
+
+
+class FakeAsyncCollection(FakeCollection):
+    """The same collection with motor-style coroutine commands"""
+
+    async def _round_trip(self):
+        self._start_command()
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+
+    async def create_index(self, key, **options):
+        await self._round_trip()
+        self._create_index(key, **options)
+
+    async def drop_index(self, name):
+        await self._round_trip()
+        self._drop_index(name)
+
+    async def command(self, command, value, **options):
+        await self._round_trip()
+        return self._command(command, value, **options)
+
+    async def estimated_document_count(self):
+        await self._round_trip()
+        return len(self.documents)
+
+    async def find_one(self, query, projection=None):
+        await self._round_trip()
+        return self._read(_project(self._find_one(query), projection))
+
+    async def insert_one(self, document):
+        await self._round_trip()
+        self._insert_one(document)
+
+    async def update_one(self, query, update, upsert=False):
+        await self._round_trip()
+        return self._update_one(query, update, upsert)
+
+    async def delete_many(self, query):
+        await self._round_trip()
+        return self._delete_many(query)
+
+    async def find_one_and_update(self, query, update, projection=None, upsert=False, return_document=False):
+        await self._round_trip()
+        return self._find_one_and_update(query, update, projection, upsert)
+
+    async def count_documents(self, query, limit=0):
+        await self._round_trip()
+        count = sum(1 for d in self.documents.values() if _matches(d, query))
+        return min(count, limit) if limit else count
+
+
+def fake_database(collection):
+    return SimpleNamespace(sessions=collection, user_preferences=None)
+
+
+def blocking_manager(collection, max_sessions=1000):
+    """EnhancedMemoryManager in MongoDB mode on top of a fake collection"""
+    return EnhancedMemoryManager(max_sessions=max_sessions, database=fake_database(collection),
+                                 cleanup_interval=None)
+
+
+def async_manager(collection, max_sessions=1000):
+    """AsyncEnhancedMemoryManager in MongoDB mode on top of a fake collection"""
+    return AsyncEnhancedMemoryManager(max_sessions=max_sessions, database=fake_database(collection),
+                                      cleanup_interval=None)
@@ -0,0 +1,287 @@
+"""
+Compiled intent matching for STAN Chatbot
+"""
+
+import json
+import logging
+import os
+import random
+import re
+import string
+import threading
+import time
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple, Union
+
+from slot_extraction import Slot, SlotExtractor
+from text_processing import NormalizedText, preprocess
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'intents.json')
+
+# Trailing/leading punctuation that normalization may strip from messages
+EDGE_PUNCTUATION = '!?.,;:~'
+
+# An intent rule is (intent_name, groups). Every group is a list of phrases and
+# the rule fires when each group has at least one phrase present in the text.
+IntentRule = Tuple[str, Sequence[Sequence[str]]]
+
+
+class PhraseMatcher:
+    """Find every phrase contained in a text with a single scan.
+
+    The phrases are compiled once into a trie-shaped regular expression, so each
+    position of the text is tried against the whole phrase set at once (the job
+    an Aho-Corasick automaton does). The semantics are plain substring
+    containment, exactly like ``phrase in text``. Found phrases are reported as
+    a bit mask, one bit per phrase.
+    """
+
+    def __init__(self, phrases: Iterable[str]):
+        self.phrases: List[str] = sorted({p for p in phrases if p})
+        self.bits: Dict[str, int] = {phrase: 1 << i for i, phrase in enumerate(self.phrases)}
+
+        trie: Dict = {}
+        for phrase in self.phrases:
+            node = trie
+            for char in phrase:
+                node = node.setdefault(char, {})
+            node[''] = True
+        self._pattern = re.compile(self._trie_to_regex(trie)) if trie else None
+
+        # The scan reports the longest phrase at each position and resumes after
+        # it, so every phrase that is a substring of a reported match is implied.
+        # Phrases that may start inside a match and run past its end are
+        # re-checked directly.
+        # Both are looked up through substrings of each phrase rather than by
+        # comparing every pair of phrases, so large phrase sets compile quickly.
+        self._implied: Dict[str, int] = {}
+        self._straddling: Dict[str, Tuple[str, ...]] = {}
+        by_prefix: Dict[str, List[str]] = {}
+        for phrase in self.phrases:
+            for end in range(1, len(phrase) + 1):
+                by_prefix.setdefault(phrase[:end], []).append(phrase)
+        for phrase in self.phrases:
+            mask = 0
+            for start in range(len(phrase)):
+                for end in range(start + 1, len(phrase) + 1):
+                    mask |= self.bits.get(phrase[start:end], 0)
+            straddling = set()
+            for start in range(1, len(phrase)):
+                straddling.update(by_prefix.get(phrase[start:], ()))
+            self._implied[phrase] = mask
+            self._straddling[phrase] = tuple(sorted(other for other in straddling
+                                                    if not mask & self.bits[other]))
+
+    @classmethod
+    def _trie_to_regex(cls, node: Dict) -> str:
+        terminal = '' in node
+        branches = [re.escape(char) + cls._trie_to_regex(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and not terminal:
+            return branches[0]
+        body = '(?:' + '|'.join(branches) + ')'
+        return body + '?' if terminal else body
+
+    def find_mask(self, text: str) -> int:
+        """Return the bit mask of phrases that occur anywhere in ``text``"""
+        if self._pattern is None:
+            return 0
+        mask = 0
+        for longest in self._pattern.findall(text):
+            mask |= self._implied[longest]
+            for other in self._straddling[longest]:
+                if other in text:
+                    mask |= self.bits[other]
+        return mask
+
+    def find(self, text: str) -> FrozenSet[str]:
+        """Return the set of phrases that occur anywhere in ``text``"""
+        mask = self.find_mask(text)
+        return frozenset(phrase for phrase in self.phrases if mask & self.bits[phrase])
+
+
+class IntentMatcher:
+    """Resolve the highest-priority intent for a message in one pass"""
+
+    # Upper bound on memoised phrase-mask -> intent resolutions
+    MAX_RESOLVED = 4096
+
+    def __init__(self, rules: Sequence[IntentRule]):
+        self.rules: List[IntentRule] = [(intent, [list(group) for group in groups])
+                                        for intent, groups in rules]
+        self.phrase_matcher = PhraseMatcher(
+            phrase for _, groups in self.rules for group in groups for phrase in group
+        )
+        bits = self.phrase_matcher.bits
+        self._compiled: List[Tuple[str, Tuple[int, ...]]] = []
+        for intent, groups in self.rules:
+            group_masks = []
+            for group in groups:
+                mask = 0
+                for phrase in group:
+                    mask |= bits.get(phrase, 0)
+                group_masks.append(mask)
+            self._compiled.append((intent, tuple(group_masks)))
+        self._resolved: Dict[int, Optional[str]] = {0: None}
+
+    def match(self, text: str) -> Optional[str]:
+        """Return the first intent (in rule order) matched by ``text``, or None"""
+        return self.resolve(self.phrase_matcher.find_mask(text))
+
+    def resolve(self, mask: int) -> Optional[str]:
+        """Apply the rule priority order to an already computed phrase mask"""
+        try:
+            return self._resolved[mask]
+        except KeyError:
+            pass
+        intent = None
+        for name, group_masks in self._compiled:
+            if all(mask & group_mask for group_mask in group_masks):
+                intent = name
+                break
+        if len(self._resolved) < self.MAX_RESOLVED:
+            self._resolved[mask] = intent
+        return intent
+
+
+class IntentEngine:
+    """A compiled catalog profile: intent matcher, fact slots and canned responses"""
+
+    def __init__(self, profile: Dict):
+        rules: List[IntentRule] = []
+        self.responses: Dict[str, List[str]] = {}
+        for entry in profile.get('intents', []):
+            name = entry['name']
+            groups = entry['all_of'] if 'all_of' in entry else [entry['phrases']]
+            rules.append((name, groups))
+            if entry.get('responses'):
+                self.responses.setdefault(name, []).extend(entry['responses'])
+        self.default_responses: List[str] = list(profile.get('default_responses', []))
+        self.matcher = IntentMatcher(rules)
+        self.slots = SlotExtractor([Slot.from_dict(slot) for slot in profile.get('slots', [])])
+
+        # Edge punctuation no phrase uses can be dropped without changing the
+        # match, so "Hi!" and "hi" normalize to the same text
+        used = set(''.join(self.matcher.phrase_matcher.phrases))
+        self._edge_chars = string.whitespace + ''.join(c for c in EDGE_PUNCTUATION if c not in used)
+
+    def normalize(self, text: Union[str, NormalizedText]) -> str:
+        """Lowercase a message and strip edge whitespace and punctuation"""
+        return preprocess(text).lower.strip(self._edge_chars)
+
+    def match(self, text: Union[str, NormalizedText]) -> Optional[str]:
+        """Return the intent for a preprocessed or already lowercased message, or None"""
+        if isinstance(text, NormalizedText):
+            text = text.text
+        return self.matcher.match(text)
+
+    def response_for(self, intent: Optional[str]) -> str:
+        """Pick a response for an intent, falling back to the default responses"""
+        return random.choice(self.responses.get(intent) or self.default_responses)
+
+    def respond(self, text: Union[str, NormalizedText]) -> str:
+        """Match and answer a preprocessed or already lowercased message"""
+        return self.response_for(self.match(text))
+
+
+class IntentCatalog:
+    """Intent catalog loaded from a JSON file and compiled once per process.
+
+    The file is checked for changes at most every ``check_interval`` seconds
+    by one watcher thread, woken by the request that finds the check due. A
+    file is only parsed when its mtime or size differs from the last one
+    seen, so a broken file is reported once rather than on every check. A
+    changed catalog is compiled on the watcher and swapped in with a single
+    reference assignment, so requests keep using the current engines and
+    never wait for a reload.
+    """
+
+    def __init__(self, path: str = DEFAULT_CATALOG_PATH, check_interval: float = 2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._reload_lock = threading.Lock()
+        self._engines: Dict[str, IntentEngine] = {}
+        self._signature = None
+        self._next_check = 0.0
+        self._wake = threading.Event()
+        self._checked = threading.Condition()
+        self._checks_started = 0
+        self._checks_done = 0
+        self.reload()
+        self._watcher = threading.Thread(target=self._watch, name='intent-catalog-watcher', daemon=True)
+        self._watcher.start()
+
+    def reload(self) -> bool:
+        """Recompile the catalog if the file changed; returns True on swap"""
+        if not self._reload_lock.acquire(blocking=False):
+            return False  # another thread is already reloading
+        try:
+            self._next_check = time.monotonic() + self.check_interval
+            stat = os.stat(self.path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if signature == self._signature:
+                return False
+            # Recorded before parsing, so a broken file is not parsed again
+            # until it is rewritten
+            self._signature = signature
+            with open(self.path, 'r', encoding='utf-8') as f:
+                catalog = json.load(f)
+            engines = {name: IntentEngine(profile)
+                       for name, profile in catalog.get('profiles', {}).items()}
+            self._engines = engines
+            logger.info(f"Intent catalog loaded: {', '.join(sorted(engines))}")
+            return True
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            if not self._engines:
+                raise
+            logger.error(f"Intent catalog reload failed, keeping previous version: {e}")
+            return False
+        finally:
+            self._reload_lock.release()
+
+    def _watch(self):
+        """Watcher thread body: check the file each time a request wakes it"""
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self._checked:
+                self._checks_started += 1
+            try:
+                self.reload()
+            except Exception:
+                logger.exception("Intent catalog check failed")
+            with self._checked:
+                self._checks_done += 1
+                self._checked.notify_all()
+
+    def engine(self, profile: str) -> IntentEngine:
+        """Return the current compiled engine for a catalog profile"""
+        if time.monotonic() >= self._next_check:
+            self._next_check = time.monotonic() + self.check_interval
+            self._wake.set()
+        return self._engines[profile]
+
+    def wait_for_reload(self, timeout: Optional[float] = None) -> bool:
+        """Have the watcher check the file now and wait for that check to
+        finish; False if it did not within ``timeout``"""
+        with self._checked:
+            target = self._checks_started + 1
+            self._wake.set()
+            return self._checked.wait_for(lambda: self._checks_done >= target, timeout)
+
+
+_catalog: Optional[IntentCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> IntentCatalog:
+    """Return the process-wide intent catalog, loading it on first use"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = IntentCatalog(os.environ.get('INTENT_CATALOG', DEFAULT_CATALOG_PATH))
+    return _catalog
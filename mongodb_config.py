@@ -3,7 +3,15 @@ MongoDB Configuration for STAN Chatbot
 """
 
 import os
-from typing import Optional
+import threading
+from typing import Dict, Optional, Tuple
+
+from pymongo import MongoClient
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
 
 class MongoDBConfig:
     """MongoDB configuration settings"""
@@ -19,16 +27,38 @@ class MongoDBConfig:
         self.CONNECTION_TIMEOUT = 5000  # 5 seconds
         self.SERVER_SELECTION_TIMEOUT = 5000  # 5 seconds
         
+        # Connection pool settings (None leaves the driver default)
+        self.MAX_POOL_SIZE = _env_int('MONGODB_MAX_POOL_SIZE')  # driver default 100
+        self.MIN_POOL_SIZE = _env_int('MONGODB_MIN_POOL_SIZE')  # driver default 0
+        self.MAX_IDLE_TIME_MS = _env_int('MONGODB_MAX_IDLE_TIME_MS')  # driver default: never closed
+        self.WAIT_QUEUE_TIMEOUT_MS = _env_int('MONGODB_WAIT_QUEUE_TIMEOUT_MS')  # driver default: wait forever
+        
+        # Wire compression, e.g. "zstd,snappy,zlib" (zstd and snappy need the
+        # zstandard / python-snappy packages); None disables it
+        self.COMPRESSORS = os.getenv('MONGODB_COMPRESSORS') or None
+        self.ZLIB_COMPRESSION_LEVEL = _env_int('MONGODB_ZLIB_COMPRESSION_LEVEL')
+        
     def get_connection_string(self) -> str:
         """Get the MongoDB connection string"""
         return self.MONGODB_URI
     
     def get_connection_options(self) -> dict:
         """Get MongoDB connection options"""
-        return {
+        options = {
             'connectTimeoutMS': self.CONNECTION_TIMEOUT,
             'serverSelectionTimeoutMS': self.SERVER_SELECTION_TIMEOUT,
+            'maxPoolSize': self.MAX_POOL_SIZE,
+            'minPoolSize': self.MIN_POOL_SIZE,
+            'maxIdleTimeMS': self.MAX_IDLE_TIME_MS,
+            'waitQueueTimeoutMS': self.WAIT_QUEUE_TIMEOUT_MS,
+            'compressors': self.COMPRESSORS,
+            'zlibCompressionLevel': self.ZLIB_COMPRESSION_LEVEL,
         }
+        return {name: value for name, value in options.items() if value is not None}
+    
+    def get_client(self) -> MongoClient:
+        """The process-wide client for this configuration"""
+        return get_client(self.get_connection_string(), self.get_connection_options())
 
 # Production/Cloud MongoDB configurations
 class MongoDBCloudConfig(MongoDBConfig):
@@ -56,3 +86,49 @@ MONGODB_CONFIGS = {
 def get_config(environment: str = 'local') -> MongoDBConfig:
     """Get MongoDB configuration for specified environment"""
     return MONGODB_CONFIGS.get(environment, MongoDBConfig())
+
+# Process-wide MongoClient registry. A MongoClient must not be used across
+# fork (its sockets and monitor threads belong to the parent), so clients are
+# created lazily and forgotten in a forked child, which then opens its own.
+_clients: Dict[Tuple, MongoClient] = {}
+_clients_pid = os.getpid()
+_clients_lock = threading.Lock()
+
+def _forget_clients():
+    """Drop the parent's clients without closing them; they are still the parent's"""
+    global _clients, _clients_pid, _clients_lock
+    _clients = {}
+    _clients_pid = os.getpid()
+    _clients_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_clients)
+
+def get_client(uri: Optional[str] = None, options: Optional[dict] = None) -> MongoClient:
+    """Shared MongoClient for ``uri`` and connection ``options``.
+    
+    Every caller in a process with the same settings gets the same client,
+    and so the same connection pool. Defaults come from ``get_config()``.
+    """
+    if uri is None or options is None:
+        config = get_config()
+        uri = uri or config.get_connection_string()
+        options = config.get_connection_options() if options is None else options
+    if _clients_pid != os.getpid():  # forked without the at-fork hook
+        _forget_clients()
+    key = (uri, tuple(sorted(options.items())))
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = MongoClient(uri, **options)
+    return client
+
+def close_clients():
+    """Close every shared client (at shutdown)"""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
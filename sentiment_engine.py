@@ -0,0 +1,218 @@
+"""
+Sentiment lexicons and a vectorized batch scorer for STAN Chatbot
+"""
+
+from enum import IntEnum
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from text_processing import NormalizedText
+
+try:
+    import numpy as np
+except ImportError:  # batch scoring falls back to the per-message loop
+    np = None
+
+
+class Sentiment(IntEnum):
+    """Compact sentiment code; values are indexes into ``SentimentLexicon.LABELS``"""
+
+    NEUTRAL = 0
+    POSITIVE = 1
+    NEGATIVE = 2
+    QUESTIONING = 3
+
+    @classmethod
+    def from_label(cls, label: Optional[str]) -> 'Sentiment':
+        return cls.NEUTRAL if label is None else cls[label.upper()]
+
+    @property
+    def label(self) -> str:
+        return self.name.lower()
+
+
+class SentimentLexicon:
+    """Word-list sentiment analysis, per message or vectorized over a batch.
+
+    A word counts once per message when it occurs anywhere in the lowercased
+    text (substring semantics). The label rules match the original
+    implementations: more positive than negative words is ``positive``, the
+    reverse is ``negative``, a tie with a question word present is
+    ``question_label`` (when configured), anything else is ``neutral``.
+    """
+
+    LABELS = ('neutral', 'positive', 'negative', 'questioning')
+
+    def __init__(self, positive_words: Sequence[str], negative_words: Sequence[str],
+                 question_words: Sequence[str] = (), question_label: Optional[str] = None):
+        self.positive_words = list(positive_words)
+        self.negative_words = list(negative_words)
+        self.question_words = list(question_words)
+        self.question_label = question_label
+        if question_label is not None and question_label not in self.LABELS:
+            raise ValueError(f"Unknown sentiment label: {question_label}")
+
+        # Lexicon ids: one column per distinct word, with a role per list
+        self.words: List[str] = []
+        index: Dict[str, int] = {}
+        for word in self.positive_words + self.negative_words + self.question_words:
+            if word not in index:
+                index[word] = len(self.words)
+                self.words.append(word)
+        self._positive_ids = [index[w] for w in self.positive_words]
+        self._negative_ids = [index[w] for w in self.negative_words]
+        self._question_ids = [index[w] for w in self.question_words]
+        self._vectorizable = all(w.isascii() and w.isalpha() and w.islower() and len(w) >= 2
+                                 for w in self.words)
+
+        # Words grouped by their first two letters, packed as a little-endian
+        # uint16, plus a lookup table flagging every bigram that starts a word
+        # or starts with the NUL message separator
+        self._bigram_groups: Dict[int, List[int]] = {}
+        for word_id, word in enumerate(self.words):
+            self._bigram_groups.setdefault(ord(word[0]) | (ord(word[1]) << 8), []).append(word_id)
+        self._bigram_table = None
+        if np is not None:
+            self._bigram_table = np.zeros(1 << 16, dtype=bool)
+            self._bigram_table[list(self._bigram_groups)] = True
+            self._bigram_table[np.arange(256) << 8] = True
+
+    def analyze(self, text: Union[str, NormalizedText]) -> str:
+        """Label a single message"""
+        text_lower = text.lower if isinstance(text, NormalizedText) else text.lower()
+        positive_count = sum(1 for word in self.positive_words if word in text_lower)
+        negative_count = sum(1 for word in self.negative_words if word in text_lower)
+        return self._label(positive_count, negative_count,
+                           self.question_label is not None and any(word in text_lower for word in self.question_words))
+
+    def _label(self, positive_count: int, negative_count: int, has_question: bool) -> str:
+        if positive_count > negative_count:
+            return 'positive'
+        elif negative_count > positive_count:
+            return 'negative'
+        elif has_question:
+            return self.question_label
+        return 'neutral'
+
+    def presence_matrix(self, messages: Sequence[str]):
+        """Boolean (messages x lexicon words) matrix of word occurrences.
+
+        All messages are lowercased and joined into one byte buffer. Candidate
+        positions come from a single lookup of every byte pair in a bigram
+        table, are confirmed byte by byte for each lexicon word, and are mapped
+        back to message rows by counting the separators before them.
+        """
+        if np is None:
+            raise ImportError("numpy is required for vectorized sentiment scoring")
+        if not self._vectorizable:
+            raise ValueError("Vectorized scoring needs lowercase ASCII letter-only lexicon words")
+
+        count = len(messages)
+        presence = np.zeros((count, len(self.words)), dtype=bool)
+        if count == 0 or not self.words:
+            return presence
+
+        joined = '\x00'.join(messages)
+        if joined.isascii():
+            data = joined.encode('ascii').lower()
+        else:
+            # str.lower can turn some non-ASCII letters into ASCII ones and
+            # change lengths, so lowercase per message before encoding
+            messages = [message.lower() for message in messages]
+            data = '\x00'.join(messages).encode('ascii', 'replace')
+        size = len(data)
+        if size < 2:
+            return presence
+
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        # Unaligned little-endian view: bigrams[i] == buffer[i] | buffer[i + 1] << 8
+        bigrams = np.ndarray(shape=(size - 1,), dtype='<u2', buffer=data, strides=(1,))
+        candidates = np.flatnonzero(self._bigram_table[bigrams])
+        if not candidates.size:
+            return presence
+        candidate_bigrams = bigrams[candidates]
+
+        # Separators are candidates too; counting them gives each candidate's row
+        is_separator = (candidate_bigrams & 0xFF) == 0
+        rows = np.cumsum(is_separator)
+        if int(rows[-1]) + (data[-1] == 0) != count - 1:  # NUL bytes inside messages
+            lengths = np.fromiter(map(len, messages), dtype=np.int64, count=count)
+            rows = np.searchsorted(np.cumsum(lengths + 1) - 1, candidates)
+
+        for first_two, word_ids in self._bigram_groups.items():
+            group = np.flatnonzero(candidate_bigrams == first_two)
+            for word_id in word_ids:
+                word = self.words[word_id].encode('ascii')
+                hits = group[candidates[group] + len(word) <= size]
+                for offset in range(2, len(word)):
+                    if hits.size == 0:
+                        break
+                    hits = hits[buffer[candidates[hits] + offset] == word[offset]]
+                if hits.size:
+                    presence[rows[hits], word_id] = True
+        return presence
+
+    def score_counts(self, messages: Sequence[str]) -> Tuple:
+        """Per-message positive, negative and question word counts as arrays"""
+        presence = self.presence_matrix(messages)
+        positive = presence[:, self._positive_ids].sum(axis=1)
+        negative = presence[:, self._negative_ids].sum(axis=1)
+        question = presence[:, self._question_ids].any(axis=1)
+        return positive, negative, question
+
+    def label_codes(self, messages: Sequence[str]):
+        """Vectorized labels as indexes into ``LABELS``.
+
+        Stored history repeats itself a lot ("hi", "thanks"), so each distinct
+        text is scored once and the codes are broadcast back.
+        """
+        if self._mostly_repeated(messages):
+            unique = dict.fromkeys(messages)
+            row = dict(zip(unique, range(len(unique))))
+            inverse = np.fromiter(map(row.__getitem__, messages), dtype=np.intp, count=len(messages))
+            return self._label_codes(list(unique))[inverse]
+        return self._label_codes(messages)
+
+    @staticmethod
+    def _mostly_repeated(messages: Sequence[str], sample_size: int = 1000) -> bool:
+        """Whether deduplicating first is worth it, judged on a sample"""
+        if len(messages) < 2 * sample_size:
+            return False
+        step = len(messages) // sample_size
+        sample = messages[::step][:sample_size]
+        return len(set(sample)) <= sample_size // 2
+
+    def _label_codes(self, messages: Sequence[str]):
+        positive, negative, question = self.score_counts(messages)
+        codes = np.zeros(len(messages), dtype=np.int8)
+        if self.question_label is not None:
+            codes[question] = self.LABELS.index(self.question_label)
+        codes[negative > positive] = 2
+        codes[positive > negative] = 1
+        return codes
+
+    def analyze_batch(self, messages: Sequence[str]):
+        """Label a whole batch; returns an array of label strings"""
+        if np is None or not self._vectorizable:
+            labels = [self.analyze(message) for message in messages]
+            return np.array(labels, dtype=object) if np is not None else labels
+        return np.array(self.LABELS, dtype=object)[self.label_codes(messages)]
+
+
+# Lexicons of the existing implementations, kept under the same profile names
+# as the intent catalog
+LEXICONS = {
+    'full': SentimentLexicon(
+        positive_words=['happy', 'good', 'great', 'awesome', 'love', 'like', 'wonderful'],
+        negative_words=['sad', 'bad', 'awful', 'hate', 'dislike', 'terrible', 'upset'],
+    ),
+    'lightweight': SentimentLexicon(
+        positive_words=['good', 'great', 'excellent', 'happy', 'love', 'wonderful', 'amazing'],
+        negative_words=['bad', 'terrible', 'sad', 'hate', 'awful', 'horrible', 'angry'],
+    ),
+    'enhanced': SentimentLexicon(
+        positive_words=['good', 'great', 'awesome', 'amazing', 'wonderful', 'fantastic', 'love', 'like', 'happy', 'excited'],
+        negative_words=['bad', 'terrible', 'awful', 'hate', 'sad', 'angry', 'frustrated', 'disappointed', 'upset'],
+        question_words=['what', 'how', 'why', 'when', 'where', 'who', 'which'],
+        question_label='questioning',
+    ),
+}
@@ -0,0 +1,121 @@
+"""
+Read-through session cache for STAN Chatbot's MongoDB storage
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+
+class CachedSession:
+    __slots__ = ('document', 'version', 'fetched_at', 'touched_at')
+
+    def __init__(self, document: Dict, now: float):
+        self.document = document
+        self.version = document.get('version', 0)
+        self.fetched_at = now
+        self.touched_at = now
+
+
+class SessionCache:
+    """Bounded, process-local cache of session documents in front of MongoDB.
+
+    Entries are kept in LRU order and served for at most ``ttl`` seconds,
+    which bounds how stale a session can get when another process writes it.
+    Local writes are applied to the cached document through ``update``; each
+    write passes the ``version`` the database returned, and an entry whose
+    stamp does not follow on from it was changed elsewhere and is dropped.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: 'OrderedDict[str, CachedSession]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0}
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        """The cached session, or None (a miss) when absent or expired"""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and self.clock() - entry.fetched_at > self.ttl:
+                del self._entries[session_id]
+                self._metrics['stale'] += 1
+                entry = None
+            if entry is None:
+                self._metrics['misses'] += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self._metrics['hits'] += 1
+            return entry.document
+
+    def put(self, session_id: str, document: Dict) -> Dict:
+        """Cache a document just read from (or written to) the database"""
+        with self._lock:
+            self._entries[session_id] = CachedSession(document, self.clock())
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._metrics['evictions'] += 1
+        return document
+
+    def update(self, session_id: str, change: Callable[[Dict], Dict], version: Optional[int] = None):
+        """Apply a local write to the cached document, if there is one.
+
+        With ``version`` (the stamp after the write), an entry that is not
+        exactly one write behind missed a write from elsewhere and is dropped.
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return
+            if version is not None and version != entry.version + 1:
+                del self._entries[session_id]
+                self._metrics['stale'] += 1
+                return
+            entry.document = change(entry.document)
+            if version is not None:
+                entry.version = entry.document['version'] = version
+            entry.touched_at = self.clock()
+
+    def needs_touch(self, session_id: str, interval: float) -> bool:
+        """Whether last_active was last written more than ``interval`` seconds ago;
+        if so, the caller is expected to write it now"""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return False
+            now = self.clock()
+            if now - entry.touched_at <= interval:
+                return False
+            entry.touched_at = now
+            return True
+
+    def invalidate(self, session_id: str):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def metrics(self) -> Dict:
+        """Hit ratio and MongoDB reads (one per miss) since startup"""
+        with self._lock:
+            lookups = self._metrics['hits'] + self._metrics['misses']
+            return dict(
+                self._metrics,
+                mongo_reads=self._metrics['misses'],
+                hit_ratio=self._metrics['hits'] / lookups if lookups else 0.0,
+                entries=len(self._entries),
+                max_entries=self.max_entries,
+                ttl_seconds=self.ttl,
+            )
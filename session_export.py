@@ -0,0 +1,106 @@
+"""
+Cursor pagination and streaming NDJSON export of sessions for STAN Chatbot
+
+Pages are keyset-paginated on the session id: a page holds the first
+``limit`` sessions whose id sorts after the cursor, and the cursor for the
+next page is the last id on this one. That is the order MongoDB serves from
+the unique ``session_id`` index, and it stays stable while sessions are
+added, touched or expired between requests. Exports walk the same pages, so
+they hold one page in memory however many sessions there are. In-memory
+stores pick each page from their unsorted ids with ``page_ids``, which
+rescans all of them per page: constant memory, at the cost of a pass over
+the ids for every ``batch_size`` sessions exported.
+"""
+
+import heapq
+import json
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+# Sessions per page when the client does not ask for a size, and the most it may ask for
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Sessions fetched per round trip by an export
+EXPORT_BATCH_SIZE = 500
+
+
+def page_ids(sessions: Mapping[str, object], after: Optional[str] = None,
+             limit: int = DEFAULT_PAGE_SIZE) -> List[str]:
+    """The first ``limit`` ids of an in-memory mapping that sort after ``after``.
+
+    Selects with a bounded heap, so a page costs one pass over the ids and
+    O(limit) memory. A mapping resized by another thread mid-pass is rescanned.
+    """
+    while True:
+        try:
+            return heapq.nsmallest(limit, sessions if after is None else filter(after.__lt__, sessions))
+        except RuntimeError:  # changed size during iteration
+            continue
+
+
+def export_ids(sessions: Mapping[str, object], fetch: Callable[[List[str]], List[Dict]],
+               batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Dict]:
+    """Yield every record of an in-memory store, one at a time, from
+    ``fetch(ids)`` on each page of ``batch_size`` ids that ``page_ids`` picks.
+
+    Holds one page of ids in memory; each page is a pass over all the ids.
+    As with ``export_pages``, sessions added during the export are included
+    if their id sorts after the current position, and ``fetch`` skips the
+    ones removed since their page was picked.
+    """
+    after = None
+    while True:
+        ids = page_ids(sessions, after, batch_size)
+        yield from fetch(ids)
+        if len(ids) < batch_size:
+            return
+        after = ids[-1]
+
+
+def export_pages(fetch_page: Callable[[Optional[str], int], List[Dict]],
+                 batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Dict]:
+    """Yield every record, one at a time, from ``fetch_page(after, limit)``.
+
+    ``fetch_page`` returns records carrying a ``session_id``, sorted by it,
+    as the memory managers' ``page_sessions`` do. Sessions added during the
+    export are included if their id sorts after the current position.
+    """
+    after = None
+    while True:
+        records = fetch_page(after, batch_size)
+        yield from records
+        if len(records) < batch_size:
+            return
+        after = records[-1]['session_id']
+
+
+def next_cursor(records: List[Dict], limit: int) -> Optional[str]:
+    """Cursor for the page after ``records``, or None on the last page"""
+    return records[-1]['session_id'] if len(records) == limit else None
+
+
+def page_args(args: Mapping[str, str]) -> Tuple[Optional[str], int]:
+    """(cursor, limit) from request arguments; raises ValueError on a bad limit"""
+    limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    return args.get('cursor') or None, min(limit, MAX_PAGE_SIZE)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return str(value)
+
+
+def dumps(value) -> str:
+    """JSON for session documents: datetimes as ISO strings, sets as sorted lists"""
+    return json.dumps(value, default=_json_default)
+
+
+def to_ndjson(records: Iterable[Dict]) -> Iterator[str]:
+    """One JSON document per line, encoded as records arrive"""
+    for record in records:
+        yield dumps(record) + "\n"
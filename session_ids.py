@@ -0,0 +1,70 @@
+"""
+Session ids and the cluster workers that own them for STAN Chatbot
+
+A pre-fork cluster (``cluster.py``) keeps every session on one worker,
+chosen by a consistent-hash ring over the worker ids. The apps draw the ids
+of new sessions here so that, inside a cluster worker, each id belongs to
+the worker that made it; outside a cluster any random id will do.
+"""
+
+import hashlib
+import os
+import uuid
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple
+
+# Points per worker on the hash ring; more points spread sessions more evenly
+RING_REPLICAS = 160
+
+
+def stable_hash(key: str) -> int:
+    """64-bit hash of ``key`` that is the same in every process, unlike hash()"""
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent hashing of keys onto nodes.
+
+    Every node owns ``replicas`` points on a ring of 64-bit hashes and a key
+    belongs to the node of the first point at or after the key's hash. Adding
+    or removing a node only moves the keys on the arcs it gains or loses,
+    about 1/N of them, so most sessions keep their worker when the cluster
+    is resized.
+    """
+
+    def __init__(self, nodes: Iterable[int], replicas: int = RING_REPLICAS):
+        points = sorted((stable_hash(f"worker-{node}-{replica}"), node)
+                        for node in set(nodes) for replica in range(replicas))
+        if not points:
+            raise ValueError("a hash ring needs at least one node")
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+        self.nodes = sorted(set(self._owners))
+
+    def node_for(self, key: str) -> int:
+        index = bisect_left(self._hashes, stable_hash(key))
+        return self._owners[index if index < len(self._owners) else 0]
+
+
+@lru_cache(maxsize=None)
+def worker_ring(workers: int) -> HashRing:
+    """The ring every process of a ``workers``-worker cluster routes with"""
+    return HashRing(range(workers))
+
+
+def worker_identity() -> Optional[Tuple[int, int]]:
+    """(worker id, worker count) inside a cluster worker, None elsewhere"""
+    if 'STAN_WORKER_ID' not in os.environ:
+        return None
+    return int(os.environ['STAN_WORKER_ID']), int(os.environ['STAN_WORKERS'])
+
+
+def new_session_id() -> str:
+    """A random id for a new session; in a cluster worker, one the ring
+    assigns to this worker, so the client's next request comes back here"""
+    identity = worker_identity()
+    while True:
+        session_id = str(uuid.uuid4())
+        if identity is None or worker_ring(identity[1]).node_for(session_id) == identity[0]:
+            return session_id
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Bulk NDJSON import of archived sessions for STAN Chatbot
+
+Reads archives written by the ``/data/export`` endpoints (or the memory
+managers' ``export_sessions``) one line at a time and hands them to a store
+in chunks, so memory use depends on the chunk size, never on the archive.
+
+As a command, loads an archive into the MongoDB ``sessions`` collection or
+posts it to a running app's ``/data/import`` (which fills ``chat_sessions``):
+
+    python session_import.py sessions.ndjson --mongodb-uri mongodb://localhost:27017/
+    python session_import.py sessions.ndjson --url http://localhost:5000/data/import
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.request
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+# Sessions handed to the store per bulk insert
+IMPORT_CHUNK_SIZE = 1000
+
+
+class ImportStats:
+    """Running totals of an import, updated after every chunk"""
+
+    __slots__ = ('imported', 'chunks', 'elapsed', '_started')
+
+    def __init__(self):
+        self.imported = 0
+        self.chunks = 0
+        self.elapsed = 0.0
+        self._started = time.perf_counter()
+
+    def add_chunk(self, size: int):
+        self.imported += size
+        self.chunks += 1
+        self.elapsed = time.perf_counter() - self._started
+
+    @property
+    def rate(self) -> float:
+        """Sessions imported per second"""
+        return self.imported / self.elapsed if self.elapsed > 0 else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            'imported': self.imported,
+            'chunks': self.chunks,
+            'elapsed_s': round(self.elapsed, 3),
+            'sessions_per_s': round(self.rate, 1)
+        }
+
+    def __str__(self) -> str:
+        return f"{self.imported:,} sessions in {self.chunks:,} chunks ({self.rate:,.0f}/s)"
+
+
+def read_ndjson(lines: Iterable) -> Iterator[Dict]:
+    """Parse NDJSON lines (str or bytes) lazily, skipping blank ones.
+
+    Raises ValueError naming the line number of a malformed record.
+    """
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"line {number}: {e}") from None
+        if not isinstance(record, dict) or not record.get('session_id'):
+            raise ValueError(f"line {number}: expected an object with a session_id")
+        yield record
+
+
+def chunked(records: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    """Lists of up to ``size`` consecutive records"""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def parse_datetime(value) -> Optional[datetime]:
+    """A datetime from an exported ISO string (datetimes pass through)"""
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def import_sessions(records: Iterable[Dict], insert_chunk: Callable[[List[Dict]], object],
+                    chunk_size: int = IMPORT_CHUNK_SIZE,
+                    progress: Optional[Callable[[ImportStats], None]] = None) -> ImportStats:
+    """Feed ``records`` to ``insert_chunk`` ``chunk_size`` at a time.
+
+    ``progress`` is called with the running ``ImportStats`` after each chunk.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    stats = ImportStats()
+    for chunk in chunked(records, chunk_size):
+        insert_chunk(chunk)
+        stats.add_chunk(len(chunk))
+        if progress:
+            progress(stats)
+    return stats
+
+
+def _post_archive(path: str, url: str, chunk_size: int) -> Dict:
+    """Stream the archive file as the body of a POST to a running app"""
+    with open(path, 'rb') as archive:
+        request = urllib.request.Request(
+            f"{url}?chunk_size={chunk_size}", data=archive, method='POST',
+            headers={'Content-Type': 'application/x-ndjson', 'Content-Length': str(os.path.getsize(path))})
+        with urllib.request.urlopen(request) as response:
+            return json.load(response)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Import an NDJSON session archive")
+    parser.add_argument('archive', help="NDJSON file written by /data/export")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--mongodb-uri', default=os.environ.get('MONGODB_URI'),
+                        help="load into this MongoDB (default: $MONGODB_URI)")
+    target.add_argument('--url', help="post to a running app's /data/import instead")
+    parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, help="sessions per bulk insert")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        print(f"📤 Posting {args.archive} to {args.url}")
+        result = _post_archive(args.archive, args.url, args.chunk_size)
+        print(f"✅ Imported {result['imported']:,} sessions ({result['sessions_per_s']:,.0f}/s)")
+        return 0
+    if not args.mongodb_uri:
+        parser.error("set --mongodb-uri (or MONGODB_URI) or --url")
+
+    from enhanced_features import EnhancedMemoryManager
+    memory = EnhancedMemoryManager(mongodb_uri=args.mongodb_uri, cleanup_interval=None)
+    if not memory.mongodb:
+        print("❌ MongoDB is not reachable")
+        return 1
+    print(f"📥 Importing {args.archive} into MongoDB")
+    with open(args.archive, encoding='utf-8') as archive:
+        stats = memory.import_sessions(read_ndjson(archive), args.chunk_size,
+                                       progress=lambda stats: print(f"   {stats}", end='\r'))
+    print(f"\n✅ Imported {stats}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
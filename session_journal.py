@@ -0,0 +1,293 @@
+"""
+Append-only journal with compact snapshots, for persisting in-memory sessions
+"""
+
+import json
+import logging
+import mmap
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_FILE_NAME = re.compile(r'^(journal|snapshot)-(\d{8})\.ndjson$')
+_decode = json.JSONDecoder().decode
+
+
+def _encode(entry: Dict) -> bytes:
+    return json.dumps(entry, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+class SessionJournal:
+    """Durability for in-memory sessions without a database.
+
+    Every change is applied and written as one JSON line to the current
+    journal file under one lock (``record``). A background committer flushes
+    and fsyncs the file, covering every line written since the last fsync
+    with a single fsync (group commit): with ``sync_commit`` each ``record``
+    returns once its line is durable and wakes the committer to get it there;
+    otherwise lines are committed every ``commit_interval_ms``.
+
+    After ``snapshot_every`` records a snapshot is taken on a separate
+    thread. ``capture`` runs under the journal lock at the same moment a new
+    journal generation is started, so it must only copy references, or
+    return a generator that reads the state as the snapshot is written (the
+    records after the new generation starts are replayed over it; ``lock``
+    lets it copy a batch at a time without a change half applied); the
+    captured items are then written with ``encode``, one JSON line each, to
+    ``snapshot-<generation>.ndjson`` (through a temporary file and a rename),
+    and the files it supersedes are deleted. Recovery memory-maps the newest
+    snapshot and replays only the journal generations written after it.
+
+    Records must be idempotent against a snapshot taken just after them.
+    A directory belongs to one process at a time.
+    """
+
+    def __init__(self, directory: str, capture: Callable[[], Iterable[Any]],
+                 encode: Callable[[Any], Dict] = lambda item: item, commit_interval_ms: int = 10,
+                 snapshot_every: int = 100_000, sync_commit: bool = True):
+        self.directory = directory
+        self.capture = capture
+        self.encode = encode
+        self.commit_interval_ms = commit_interval_ms
+        self.snapshot_every = snapshot_every
+        self.sync_commit = sync_commit
+        self.generation = 0
+        self._file = None
+        self._written = 0
+        self._synced = 0
+        self._since_snapshot = 0
+        self._lock = threading.Lock()
+        self._commit_lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._durable = threading.Condition()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._snapshotter: Optional[threading.Thread] = None
+        self._metrics = {
+            'records': 0,
+            'commits': 0,
+            'last_commit_ms': 0.0,
+            'max_commit_ms': 0.0,
+            'snapshots': 0,
+            'last_snapshot_ms': 0.0,
+            'recovery': {},
+        }
+
+    def _path(self, kind: str, generation: int) -> str:
+        return os.path.join(self.directory, f"{kind}-{generation:08d}.ndjson")
+
+    def _generations(self, kind: str) -> List[int]:
+        generations = []
+        for name in os.listdir(self.directory):
+            match = _FILE_NAME.match(name)
+            if match and match.group(1) == kind:
+                generations.append(int(match.group(2)))
+        return sorted(generations)
+
+    def _sync_directory(self):
+        descriptor = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+    def _open_generation(self, generation: int):
+        self.generation = generation
+        self._file = open(self._path('journal', generation), 'ab', buffering=1 << 16)
+        self._sync_directory()
+
+    def _remove_before(self, generation: int):
+        for kind in ('journal', 'snapshot'):
+            for older in self._generations(kind):
+                if older < generation:
+                    os.remove(self._path(kind, older))
+
+    def recover(self, restore: Callable[[Dict], None], replay: Callable[[Dict], None]) -> Dict:
+        """Restore the newest snapshot, replay the journal after it and open
+        a new generation; returns what was loaded and how long it took"""
+        os.makedirs(self.directory, exist_ok=True)
+        start = time.perf_counter()
+        snapshots = self._generations('snapshot')
+        base = snapshots[-1] if snapshots else 0
+        restored = replayed = 0
+        if snapshots:
+            with open(self._path('snapshot', base), 'rb') as snapshot:
+                if os.fstat(snapshot.fileno()).st_size:
+                    with mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                        for line in iter(view.readline, b''):
+                            restore(_decode(line.decode('utf-8')))
+                            restored += 1
+        journals = [generation for generation in self._generations('journal') if generation >= base]
+        for generation in journals:
+            with open(self._path('journal', generation), 'rb') as journal:
+                for line in journal:
+                    try:
+                        entry = _decode(line.decode('utf-8'))
+                    except ValueError:
+                        # The tail of a write cut short by a crash
+                        logger.warning(f"Ignoring a torn record at the end of journal generation {generation}")
+                        break
+                    replay(entry)
+                    replayed += 1
+        self._open_generation(max(journals + [base - 1]) + 1)
+        self._remove_before(base)
+        for name in os.listdir(self.directory):
+            if name.endswith('.ndjson.tmp'):  # a snapshot that never completed
+                os.remove(os.path.join(self.directory, name))
+        self._since_snapshot = replayed
+        stats = {
+            'snapshot_records': restored,
+            'replayed_records': replayed,
+            'recovery_ms': (time.perf_counter() - start) * 1000,
+        }
+        self._metrics['recovery'] = stats
+        return stats
+
+    def record(self, apply: Callable[[], Dict]):
+        """Apply a change and journal the entry ``apply`` returns, as one step
+        with respect to snapshots; with ``sync_commit``, wait for it to be durable"""
+        self.wait(self.write(apply))
+
+    def write(self, apply: Callable[[], Dict]) -> int:
+        """``record`` without the wait: returns the entry's sequence number,
+        to hand to ``wait`` once the caller has released its own locks.
+        ``apply`` may return None when the change needs no entry."""
+        with self._lock:
+            entry = apply()
+            if entry is None:
+                return self._written
+            self._file.write(_encode(entry))
+            self._written += 1
+            sequence = self._written
+            self._since_snapshot += 1
+            self._metrics['records'] += 1
+        if self._since_snapshot >= self.snapshot_every:
+            self._wake.set()
+        return sequence
+
+    def wait(self, sequence: int):
+        """With ``sync_commit``, return once record ``sequence`` is durable"""
+        if self.sync_commit:
+            self._wait_durable(sequence)
+
+    def _wait_durable(self, sequence: int):
+        if not self.running:
+            self.commit()
+            return
+        self._wake.set()
+        with self._durable:
+            while self._synced < sequence and self.running:
+                self._durable.wait(self.commit_interval_ms / 1000)
+        if self._synced < sequence:  # closed while waiting
+            self.commit()
+
+    def commit(self) -> int:
+        """Flush and fsync everything written so far; returns how many records that covered"""
+        with self._commit_lock:
+            with self._lock:
+                target = self._written
+                if target == self._synced or self._file is None:
+                    return 0
+                self._file.flush()
+            start = time.perf_counter()
+            os.fsync(self._file.fileno())
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._durable:
+                committed, self._synced = target - self._synced, target
+                self._durable.notify_all()
+            self._metrics['commits'] += 1
+            self._metrics['last_commit_ms'] = elapsed_ms
+            self._metrics['max_commit_ms'] = max(self._metrics['max_commit_ms'], elapsed_ms)
+            return committed
+
+    def snapshot(self) -> int:
+        """Write a snapshot of the current state and drop the files it supersedes;
+        returns the number of items written"""
+        with self._snapshot_lock:
+            start = time.perf_counter()
+            with self._commit_lock:
+                with self._lock:
+                    items = self.capture()
+                    self._since_snapshot = 0
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                    self._file.close()
+                    written = self._written
+                    self._open_generation(self.generation + 1)
+                    generation = self.generation
+                with self._durable:
+                    self._synced = written
+                    self._durable.notify_all()
+            path = self._path('snapshot', generation)
+            count = 0
+            with open(path + '.tmp', 'wb', buffering=1 << 20) as snapshot:
+                for item in items:
+                    snapshot.write(_encode(self.encode(item)))
+                    count += 1
+                snapshot.flush()
+                os.fsync(snapshot.fileno())
+            os.replace(path + '.tmp', path)
+            self._sync_directory()
+            self._remove_before(generation)
+            self._metrics['snapshots'] += 1
+            self._metrics['last_snapshot_ms'] = (time.perf_counter() - start) * 1000
+            return count
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.commit_interval_ms / 1000)
+            self._wake.clear()
+            self.commit()
+            if not self._stop.is_set() and self._since_snapshot >= self.snapshot_every and not (
+                    self._snapshotter is not None and self._snapshotter.is_alive()):
+                self._snapshotter = threading.Thread(target=self.snapshot, name='stan-journal-snapshot',
+                                                     daemon=True)
+                self._snapshotter.start()
+
+    def start(self):
+        """Start the background committer (no-op when already running)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='stan-journal', daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """Stop the committer, make everything written durable and close the journal"""
+        self._stop.set()
+        self._wake.set()
+        # The committer may start a snapshot until it stops, so join it first
+        for attribute in ('_thread', '_snapshotter'):
+            thread = getattr(self, attribute)
+            if thread is not None and thread is not threading.current_thread():
+                thread.join()
+            setattr(self, attribute, None)
+        self.commit()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    @property
+    def lock(self) -> threading.Lock:
+        """The lock changes are applied and written under"""
+        return self._lock
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def metrics(self) -> Dict:
+        """Records, commits and snapshots so far, and the last recovery"""
+        return dict(
+            self._metrics,
+            running=self.running,
+            generation=self.generation,
+            sync_commit=self.sync_commit,
+            uncommitted_records=self._written - self._synced,
+            records_since_snapshot=self._since_snapshot,
+        )
@@ -0,0 +1,195 @@
+"""
+Recency-ordered in-memory session store for STAN Chatbot
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class ActivityWindow:
+    """Sessions active within a sliding ``window``, counted in amortized O(1).
+
+    Sessions are kept in order of their latest activity; counting first drops
+    the ones whose activity fell out of the window from the front, so each
+    session costs O(1) per touch and is dropped at most once per touch.
+    """
+
+    def __init__(self, window: timedelta = timedelta(hours=1), clock: Callable[[], datetime] = datetime.now):
+        self.window = window
+        self.clock = clock
+        self._last_seen: 'OrderedDict[str, datetime]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def touch(self, session_id: str, now: Optional[datetime] = None):
+        with self._lock:
+            self._last_seen[session_id] = now or self.clock()
+            self._last_seen.move_to_end(session_id)
+
+    def discard(self, session_id: str):
+        with self._lock:
+            self._last_seen.pop(session_id, None)
+
+    def count(self, now: Optional[datetime] = None) -> int:
+        """Sessions active after ``now - window``"""
+        since = (now or self.clock()) - self.window
+        with self._lock:
+            while self._last_seen:
+                session_id, seen = next(iter(self._last_seen.items()))
+                if seen > since:
+                    break
+                del self._last_seen[session_id]
+            return len(self._last_seen)
+
+    def clear(self):
+        with self._lock:
+            self._last_seen.clear()
+
+    def __len__(self) -> int:
+        return len(self._last_seen)
+
+
+class SessionStore:
+    """Sessions kept in least- to most-recently-active order.
+
+    Every touch moves a session to the back, so the front always holds the
+    session that has been idle longest. That makes each operation O(1):
+    touching is a move, LRU eviction pops the front, and TTL expiry pops from
+    the front until it reaches a session that is still live (amortized O(1),
+    each session is expired at most once).
+
+    Sessions are plain dicts carrying a ``last_active`` datetime, as the
+    memory managers have always stored them. Mutations take a lock, so expiry
+    can run on a background thread. ``activity`` counts the sessions active
+    within the last ``activity_window`` (an hour by default).
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl: timedelta = timedelta(hours=24),
+                 clock: Callable[[], datetime] = datetime.now,
+                 activity_window: timedelta = timedelta(hours=1)):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.clock = clock
+        self.activity = ActivityWindow(activity_window, clock)
+        self._sessions: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        """Look up a session without marking it active"""
+        return self._sessions.get(session_id)
+
+    def touch(self, session_id: str) -> Optional[Dict]:
+        """Mark a session as just active and return it, or None if unknown"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session['last_active'] = self.clock()
+                self._sessions.move_to_end(session_id)
+                self.activity.touch(session_id, session['last_active'])
+            return session
+
+    def add(self, session_id: str, session: Dict, evicted: Optional[List[str]] = None) -> Dict:
+        """Store a new (most recent) session, evicting the LRU one when full;
+        the ids of evicted sessions are appended to ``evicted``"""
+        session.setdefault('last_active', self.clock())
+        with self._lock:
+            self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            self.activity.touch(session_id, session['last_active'])
+            self._evict(evicted)
+        return session
+
+    def add_many(self, sessions: Iterable[Tuple[str, Dict]], evicted: Optional[List[str]] = None):
+        """Store a batch of sessions under one lock, in order, as ``add`` would"""
+        with self._lock:
+            for session_id, session in sessions:
+                session.setdefault('last_active', self.clock())
+                self._sessions[session_id] = session
+                self._sessions.move_to_end(session_id)
+                self.activity.touch(session_id, session['last_active'])
+            self._evict(evicted)
+
+    def _evict(self, evicted: Optional[List[str]]):
+        # The caller holds the lock
+        while len(self._sessions) > self.max_sessions:
+            session_id, _ = self._sessions.popitem(last=False)
+            self.activity.discard(session_id)
+            if evicted is not None:
+                evicted.append(session_id)
+
+    def remove(self, session_id: str) -> Optional[Dict]:
+        with self._lock:
+            self.activity.discard(session_id)
+            return self._sessions.pop(session_id, None)
+
+    def expire(self, now: Optional[datetime] = None, limit: Optional[int] = None,
+               expired_ids: Optional[List[str]] = None) -> int:
+        """Drop up to ``limit`` sessions idle for longer than the TTL; returns
+        how many, and appends their ids to ``expired_ids``"""
+        cutoff = (now or self.clock()) - self.ttl
+        expired = 0
+        with self._lock:
+            while self._sessions and (limit is None or expired < limit):
+                session_id, session = next(iter(self._sessions.items()))
+                if session['last_active'] >= cutoff:
+                    break
+                del self._sessions[session_id]
+                self.activity.discard(session_id)
+                expired += 1
+                if expired_ids is not None:
+                    expired_ids.append(session_id)
+        return expired
+
+    def count_expired(self, now: Optional[datetime] = None, limit: Optional[int] = None) -> int:
+        """Sessions past the TTL but not yet expired, counting at most ``limit``"""
+        cutoff = (now or self.clock()) - self.ttl
+        count = 0
+        with self._lock:
+            for session in self._sessions.values():
+                if session['last_active'] >= cutoff or (limit is not None and count >= limit):
+                    break
+                count += 1
+        return count
+
+    def count_active(self, since: datetime) -> int:
+        """Sessions active after ``since``, walking back from the newest"""
+        active = 0
+        with self._lock:
+            for session_id in reversed(self._sessions):
+                if self._sessions[session_id]['last_active'] <= since:
+                    break
+                active += 1
+        return active
+
+    def oldest(self) -> Optional[Tuple[str, Dict]]:
+        """The least recently active session"""
+        return next(iter(self._sessions.items()), None)
+
+    def items(self):
+        return self._sessions.items()
+
+    def copy_items(self) -> List[Tuple[str, Dict]]:
+        """(session id, session) pairs, least recently active first, taken under the lock"""
+        with self._lock:
+            return list(self._sessions.items())
+
+    def values(self):
+        return self._sessions.values()
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+            self.activity.clear()
+
+    def __getitem__(self, session_id: str) -> Dict:
+        return self._sessions[session_id]
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._sessions)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
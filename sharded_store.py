@@ -0,0 +1,121 @@
+"""
+Lock-striped sharded mapping for state shared by request threads
+"""
+
+import threading
+from itertools import chain
+from typing import Callable, Dict, Hashable, Iterator, List, Optional, Tuple, TypeVar
+
+V = TypeVar('V')
+
+# Shards per store; a power of two, comfortably above the thread count of
+# a threaded WSGI server, so two requests rarely wait on the same lock
+DEFAULT_SHARDS = 64
+
+
+class ShardedDict:
+    """A dict split into ``shards`` dicts, each guarded by its own lock.
+
+    A key lives in shard ``hash(key) & (shards - 1)``, so operations on
+    different keys almost always take different locks and threads serving
+    different sessions do not wait on each other. Reads are single dict
+    lookups and take no lock; every change to a shard takes its lock, and
+    ``get_or_create`` and ``compute`` are atomic per key, replacing
+    check-then-set sequences that race. ``lock(key)`` makes longer
+    compound operations on one key atomic.
+
+    Iteration and ``items`` work on a per-shard snapshot, so they never
+    fail while other threads add or remove keys, but are not one
+    consistent view of the whole store. ``None`` is not a storable value.
+    """
+
+    def __init__(self, shards: int = DEFAULT_SHARDS):
+        if shards < 1 or shards & (shards - 1):
+            raise ValueError("shards must be a power of two")
+        self._mask = shards - 1
+        self._maps: List[Dict] = [{} for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+
+    @property
+    def shards(self) -> int:
+        return len(self._maps)
+
+    def shard_index(self, key: Hashable) -> int:
+        return hash(key) & self._mask
+
+    def lock(self, key: Hashable) -> threading.Lock:
+        """The lock guarding ``key``'s shard"""
+        return self._locks[hash(key) & self._mask]
+
+    def get(self, key: Hashable, default=None):
+        return self._maps[hash(key) & self._mask].get(key, default)
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], V]) -> V:
+        """The value for ``key``, stored from ``factory()`` by exactly one
+        thread when missing"""
+        index = hash(key) & self._mask
+        shard = self._maps[index]
+        value = shard.get(key)
+        if value is None:
+            with self._locks[index]:
+                value = shard.get(key)
+                if value is None:
+                    value = shard[key] = factory()
+        return value
+
+    def compute(self, key: Hashable, change: Callable[[Optional[V]], Optional[V]]) -> Optional[V]:
+        """Atomically replace ``key``'s value (None when missing) with
+        ``change(value)``; a None result removes the key"""
+        index = hash(key) & self._mask
+        shard = self._maps[index]
+        with self._locks[index]:
+            value = change(shard.get(key))
+            if value is None:
+                shard.pop(key, None)
+            else:
+                shard[key] = value
+            return value
+
+    def pop(self, key: Hashable, *default):
+        index = hash(key) & self._mask
+        with self._locks[index]:
+            return self._maps[index].pop(key, *default)
+
+    def clear(self):
+        for shard, lock in zip(self._maps, self._locks):
+            with lock:
+                shard.clear()
+
+    def keys(self) -> List:
+        return list(self)
+
+    def values(self) -> List:
+        return [value for _, value in self.items()]
+
+    def items(self) -> List[Tuple]:
+        return list(chain.from_iterable(list(shard.items()) for shard in self._maps))
+
+    def __getitem__(self, key: Hashable):
+        return self._maps[hash(key) & self._mask][key]
+
+    def __setitem__(self, key: Hashable, value):
+        index = hash(key) & self._mask
+        with self._locks[index]:
+            self._maps[index][key] = value
+
+    def __delitem__(self, key: Hashable):
+        index = hash(key) & self._mask
+        with self._locks[index]:
+            del self._maps[index][key]
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._maps[hash(key) & self._mask]
+
+    def __iter__(self) -> Iterator:
+        return chain.from_iterable(list(shard) for shard in self._maps)
+
+    def __len__(self) -> int:
+        return sum(map(len, self._maps))
+
+    def __bool__(self) -> bool:
+        return any(self._maps)
@@ -0,0 +1,125 @@
+"""
+Slot extraction and per-session fact storage for STAN Chatbot
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sharded_store import ShardedDict
+
+# Placeholder for the captured value inside a slot pattern
+VALUE_PLACEHOLDER = '{value}'
+
+
+class Slot:
+    """A fact the bot remembers, e.g. ``my name is {value}``"""
+
+    def __init__(self, key: str, pattern: str, transform: Optional[str] = None,
+                 response: Optional[str] = None, recall_keywords: Iterable[str] = (),
+                 recall_response: Optional[str] = None):
+        if pattern.count(VALUE_PLACEHOLDER) != 1:
+            raise ValueError(f"Slot '{key}' pattern needs exactly one {VALUE_PLACEHOLDER} placeholder")
+        if '(?P<' in pattern:
+            raise ValueError(f"Slot '{key}' pattern must not define named groups")
+        if transform not in (None, 'title', 'upper', 'lower'):
+            raise ValueError(f"Unknown transform for slot '{key}': {transform}")
+        self.key = key
+        self.pattern = pattern
+        self.transform = transform
+        self.response = response or "Got it! I'll remember that."
+        self.recall_keywords = list(recall_keywords)
+        self.recall_response = recall_response
+
+    def value(self, raw: str) -> str:
+        """The value to store for a captured string"""
+        return getattr(raw, self.transform)() if self.transform else raw
+
+    def confirm(self, value: str) -> str:
+        """Response acknowledging a newly stored value"""
+        return self.response.format(value=value, value_title=value.title())
+
+    def recall(self, value: str) -> str:
+        """Response when the user asks what they said about this slot"""
+        return self.recall_response.format(value=value, value_title=value.title())
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Slot':
+        return cls(data['key'], data['pattern'], data.get('transform'), data.get('response'),
+                   data.get('recall_keywords', ()), data.get('recall_response'))
+
+
+class SlotExtractor:
+    """All slot patterns compiled into one regex with a named group per slot.
+
+    A single ``finditer`` pass over the message finds every slot it mentions,
+    so the per-message cost does not grow with the number of slots.
+    """
+
+    def __init__(self, slots: Sequence[Slot]):
+        self.slots = list(slots)
+        self._by_group: Dict[str, Tuple[int, Slot]] = {}
+        alternatives = []
+        for index, slot in enumerate(self.slots):
+            group = f"slot{index}"
+            self._by_group[group] = (index, slot)
+            alternatives.append('(?:' + slot.pattern.replace(VALUE_PLACEHOLDER, f'(?P<{group}>\\w+)') + ')')
+        self._pattern = re.compile('|'.join(alternatives)) if alternatives else None
+
+    def extract(self, text: str) -> List[Tuple[Slot, str]]:
+        """Return (slot, value) for every slot found, in slot priority order"""
+        if self._pattern is None:
+            return []
+        found = {}
+        for match in self._pattern.finditer(text):
+            index, slot = self._by_group[match.lastgroup]
+            if index not in found:
+                found[index] = (slot, slot.value(match.group(match.lastgroup)))
+        return [found[index] for index in sorted(found)]
+
+    def recall(self, text: str, facts: Dict[str, str]) -> Optional[str]:
+        """Answer "what did I say ..." from stored facts, or None"""
+        for slot in self.slots:
+            if slot.recall_response and slot.key in facts and any(word in text for word in slot.recall_keywords):
+                return slot.recall(facts[slot.key])
+        return None
+
+
+class FactStore:
+    """Thread-safe per-session store of remembered facts.
+
+    Sessions are sharded with a lock per shard (see ``sharded_store``), so
+    requests for different sessions do not wait on one global lock. A
+    session's facts are replaced, never changed in place, so reads need no
+    lock.
+    """
+
+    def __init__(self):
+        self._facts = ShardedDict()
+
+    def get(self, session_id: str, key: str, default: Optional[str] = None) -> Optional[str]:
+        """Look up one fact for a session"""
+        return self._facts.get(session_id, {}).get(key, default)
+
+    def facts(self, session_id: str) -> Dict[str, str]:
+        """All facts of a session (a copy)"""
+        return dict(self._facts.get(session_id, {}))
+
+    def update(self, session_id: str, facts: Dict[str, str]):
+        """Store or overwrite facts for a session"""
+        self._facts.compute(session_id, lambda known: {**(known or {}), **facts})
+
+    def forget(self, session_id: str):
+        self._facts.pop(session_id, None)
+
+    def clear(self):
+        self._facts.clear()
+
+    def to_dict(self) -> Dict[str, Dict[str, str]]:
+        """Snapshot of every session's facts, for serialization"""
+        return {session_id: dict(facts) for session_id, facts in self._facts.items()}
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._facts
+
+    def __len__(self) -> int:
+        return len(self._facts)
@@ -0,0 +1,1148 @@
+"""
+Pluggable session storage backends for STAN Chatbot
+
+``EnhancedMemoryManager`` keeps sessions in one of three backends, picked by
+name (``SESSION_BACKEND``, see ``create_backend``):
+
+    memory   a recency-ordered ``SessionStore``, optionally journaled to disk
+    mongodb  the ``sessions`` collection, with write-behind and a session cache
+    sqlite   an embedded SQLite database in WAL mode
+
+All three implement ``SessionBackend``; test_storage_backends.py is the
+conformance suite they share and benchmark_storage_backends.py compares them.
+``AsyncEnhancedMemoryManager`` uses the coroutine counterparts
+``AsyncMemoryBackend`` and ``AsyncMongoBackend`` (motor) of the first two.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pymongo import ReplaceOne, ReturnDocument
+from pymongo.errors import OperationFailure
+
+from session_cache import SessionCache
+from session_export import EXPORT_BATCH_SIZE, export_ids, export_pages, page_ids
+from session_import import parse_datetime
+from session_journal import SessionJournal
+from session_store import ActivityWindow, SessionStore
+from write_behind import PendingSession, WriteBehindBuffer
+
+logger = logging.getLogger(__name__)
+
+# Names accepted by create_backend
+SESSION_BACKENDS = ('memory', 'mongodb', 'sqlite')
+# Most SQLite connections a backend keeps open; more threads wait for one
+SQLITE_POOL_SIZE = 8
+# Sessions a journal snapshot copies per hold of the journal lock
+SNAPSHOT_COPY_BATCH = 1000
+# Tries at creating or changing the TTL index while other workers race on it
+TTL_INDEX_ATTEMPTS = 3
+# MongoDB error codes
+INDEX_NOT_FOUND = 27
+INVALID_OPTIONS = 72
+INDEX_OPTIONS_CONFLICT = 85
+INDEX_KEY_SPECS_CONFLICT = 86
+
+
+def utcnow() -> datetime:
+    """Current time for MongoDB timestamps; TTL indexes compare dates in UTC"""
+    return datetime.now(timezone.utc)
+
+
+def _ttl_coll_mod(expire_after_seconds: int) -> Dict:
+    return {"keyPattern": {"last_active": 1}, "expireAfterSeconds": expire_after_seconds}
+
+
+def ensure_ttl_index(collection, expire_after_seconds: int):
+    """Index last_active as a TTL index, so MongoDB deletes idle sessions itself.
+
+    A plain or differently timed index on last_active (left by an older
+    version or another timeout setting) is changed in place with collMod, so
+    workers starting together never find it missing. One that races another
+    worker changing or dropping it tries again; only a server too old to make
+    a plain index a TTL index in place (before 5.1) has it dropped and recreated.
+    """
+    for _ in range(TTL_INDEX_ATTEMPTS):
+        try:
+            collection.create_index("last_active", expireAfterSeconds=expire_after_seconds)
+            return
+        except OperationFailure as e:
+            if e.code not in (INDEX_OPTIONS_CONFLICT, INDEX_KEY_SPECS_CONFLICT):
+                raise
+            conflict = e.code
+        try:
+            if conflict == INDEX_OPTIONS_CONFLICT:
+                collection.database.command("collMod", collection.name, index=_ttl_coll_mod(expire_after_seconds))
+                return
+            collection.drop_index("last_active_1")
+        except OperationFailure as e:
+            if e.code == INVALID_OPTIONS:
+                _drop_ttl_index(collection)
+            elif e.code != INDEX_NOT_FOUND:  # dropped by another worker: create it again
+                raise
+    collection.create_index("last_active", expireAfterSeconds=expire_after_seconds)
+
+
+def _drop_ttl_index(collection):
+    try:
+        collection.drop_index("last_active_1")
+    except OperationFailure as e:
+        if e.code != INDEX_NOT_FOUND:
+            raise
+
+
+async def ensure_ttl_index_async(collection, expire_after_seconds: int):
+    """``ensure_ttl_index`` for a motor collection"""
+    for _ in range(TTL_INDEX_ATTEMPTS):
+        try:
+            await collection.create_index("last_active", expireAfterSeconds=expire_after_seconds)
+            return
+        except OperationFailure as e:
+            if e.code not in (INDEX_OPTIONS_CONFLICT, INDEX_KEY_SPECS_CONFLICT):
+                raise
+            conflict = e.code
+        try:
+            if conflict == INDEX_OPTIONS_CONFLICT:
+                await collection.database.command("collMod", collection.name,
+                                                  index=_ttl_coll_mod(expire_after_seconds))
+                return
+            await collection.drop_index("last_active_1")
+        except OperationFailure as e:
+            if e.code == INVALID_OPTIONS:
+                await _drop_ttl_index_async(collection)
+            elif e.code != INDEX_NOT_FOUND:
+                raise
+    await collection.create_index("last_active", expireAfterSeconds=expire_after_seconds)
+
+
+async def _drop_ttl_index_async(collection):
+    try:
+        await collection.drop_index("last_active_1")
+    except OperationFailure as e:
+        if e.code != INDEX_NOT_FOUND:
+            raise
+
+
+def touch_upsert() -> Dict:
+    """Update document that marks a session active, creating it empty when
+    unknown (MongoDB mode); as an upsert it is safe against concurrent creates"""
+    now = utcnow()
+    return {
+        "$set": {"last_active": now},
+        "$setOnInsert": {"history": [], "created_at": now, "message_count": 0, "user_info": {},
+                         "conversation_topics": [], "sentiment_history": [], "version": 0}
+    }
+
+
+def message_upsert(new_messages: List[Dict], topics: List[str], history_limit: int) -> Dict:
+    """Update document that creates or touches a session, appends messages,
+    trims the history to ``history_limit`` and records topics (MongoDB mode).
+    Every such write bumps the session's ``version`` stamp by one."""
+    now = utcnow()
+    update = {
+        "$push": {"history": {"$each": new_messages, "$slice": -history_limit}},
+        "$inc": {"message_count": len(new_messages), "version": 1},
+        "$set": {"last_active": now},
+        "$setOnInsert": {"created_at": now, "user_info": {}, "sentiment_history": []}
+    }
+    if topics:
+        update["$addToSet"] = {"conversation_topics": {"$each": topics}}
+    else:
+        update["$setOnInsert"]["conversation_topics"] = []
+    return update
+
+
+def with_messages(session: Dict, new_messages: List[Dict], topics: List[str], history_limit: int) -> Dict:
+    """Copy of a MongoDB session document with ``message_upsert`` applied locally"""
+    known_topics = session.get('conversation_topics', [])
+    return dict(
+        session,
+        history=(session.get('history', []) + new_messages)[-history_limit:],
+        message_count=session.get('message_count', 0) + len(new_messages),
+        conversation_topics=known_topics + [topic for topic in topics if topic not in known_topics]
+    )
+
+
+def session_projection(fields: Optional[Iterable[str]] = None, history: Optional[int] = None) -> Optional[Dict]:
+    """MongoDB projection for a session read: only ``fields`` (all when None)
+    and only the last ``history`` messages, sliced by the server"""
+    if fields is None and history is None:
+        return None
+    projection = {}
+    if fields is not None:
+        projection = {field: 1 for field in fields}
+        projection['session_id'] = 1
+    if history is not None:
+        projection['history'] = {'$slice': -history}
+    return projection
+
+
+def page_query(after: Optional[str]) -> Dict:
+    """Filter for the sessions whose id sorts after ``after`` (MongoDB mode)"""
+    return {"session_id": {"$gt": after}} if after is not None else {}
+
+
+def cap_filter(oldest_sessions: List[Dict]) -> Dict:
+    """Filter deleting the given oldest sessions to enforce the cap (MongoDB
+    mode); last_active is re-checked so a session touched meanwhile survives"""
+    return {
+        "session_id": {"$in": [session["session_id"] for session in oldest_sessions]},
+        "last_active": {"$lte": oldest_sessions[-1]["last_active"]}
+    }
+
+
+def project_session(session: Dict, fields: Optional[Iterable[str]] = None, history: Optional[int] = None) -> Dict:
+    """``session_projection`` applied to a session document held locally"""
+    if fields is not None:
+        wanted = set(fields) | {'_id', 'session_id'} | ({'history'} if history is not None else set())
+        session = {key: value for key, value in session.items() if key in wanted}
+    if history is not None and 'history' in session:
+        session = dict(session, history=session['history'][-history:] if history else [])
+    return session
+
+
+def restored_session(record: Dict, last_active: datetime) -> Dict:
+    """A session document rebuilt from an exported record, active as of ``last_active``"""
+    session = dict(record)
+    session.pop('_id', None)
+    session['history'] = session.get('history', [])
+    session['created_at'] = parse_datetime(session.get('created_at')) or last_active
+    session['last_active'] = last_active
+    session.setdefault('message_count', len(session['history']))
+    session.setdefault('user_info', {})
+    session['conversation_topics'] = list(session.get('conversation_topics', []))
+    session.setdefault('sentiment_history', [])
+    session.setdefault('version', 0)
+    return session
+
+
+class SessionBackend:
+    """Where a memory manager keeps its sessions.
+
+    A session is a dict with ``history`` (the last ``history_limit``
+    messages, oldest first), ``created_at``, ``last_active``,
+    ``message_count``, ``user_info``, ``conversation_topics`` and
+    ``sentiment_history``. ``get`` and ``append`` mark a session active and
+    create it when unknown; reading pages does not.
+    """
+
+    # Reported as ``storage_type`` by stats()
+    storage_type = None
+
+    def __init__(self, max_sessions: int = 1000, ttl: timedelta = timedelta(hours=24), history_limit: int = 20):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.history_limit = history_limit
+
+    def get(self, session_id: str, fields: Optional[Iterable[str]] = None,
+            history: Optional[int] = None) -> Dict:
+        """Get or create a session. ``fields`` and ``history`` (the last that
+        many messages) say what the caller needs; a backend may return more"""
+        raise NotImplementedError
+
+    def append(self, session_id: str, message: Dict, topics: List[str]):
+        """Add a message and its topics, trimming the history to ``history_limit``"""
+        raise NotImplementedError
+
+    def trim(self, session_id: str, keep: int):
+        """Drop all but the last ``keep`` messages of a session's history"""
+        raise NotImplementedError
+
+    def expire(self, budget: int = 1000) -> Tuple[int, int]:
+        """Remove up to ``budget`` expired or surplus sessions; returns
+        (sessions removed, sessions still due, counted up to one more batch)"""
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        """``total_sessions``, ``active_sessions_last_hour`` and ``storage_type``, in O(1)"""
+        raise NotImplementedError
+
+    def page(self, after: Optional[str], limit: int) -> List[Dict]:
+        """Up to ``limit`` sessions (with their ``session_id``) whose id sorts after ``after``"""
+        raise NotImplementedError
+
+    def export(self, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Dict]:
+        """Every session, in id order, fetched ``batch_size`` at a time"""
+        return export_pages(self.page, batch_size)
+
+    def load(self, records: List[Dict]):
+        """Store exported sessions as one batch, replacing any with the same id"""
+        raise NotImplementedError
+
+    def close(self):
+        """Flush what is buffered and release the backend's resources"""
+
+
+class MemoryBackend(SessionBackend):
+    """Sessions in a ``SessionStore``, the least recently active evicted first.
+
+    With ``journal_dir`` every message and imported session is also written to
+    a ``SessionJournal`` there, as are the sessions expiry and eviction remove,
+    and the sessions it holds are recovered on start.
+    """
+
+    storage_type = "In-Memory"
+
+    def __init__(self, max_sessions: int = 1000, ttl: timedelta = timedelta(hours=24), history_limit: int = 20,
+                 journal_dir: Optional[str] = None):
+        super().__init__(max_sessions, ttl, history_limit)
+        self.sessions = SessionStore(max_sessions, ttl)
+        self.activity = self.sessions.activity
+        self.journal = None
+        if journal_dir:
+            journal = SessionJournal(journal_dir, self._capture_sessions, self._snapshot_entry)
+            recovery = journal.recover(self._restore_session, self._replay)
+            journal.start()
+            self.journal = journal
+            logger.info(f"Recovered {len(self.sessions)} sessions from {journal_dir} "
+                        f"in {recovery['recovery_ms']:.0f} ms")
+
+    def get(self, session_id: str, fields: Optional[Iterable[str]] = None,
+            history: Optional[int] = None) -> Dict:
+        # Sessions are held in place, so the whole session is returned
+        session = self.sessions.touch(session_id)
+        if session is None:
+            session = {
+                'history': [],
+                'created_at': datetime.now(),
+                'last_active': datetime.now(),
+                'message_count': 0,
+                'user_info': {},
+                'conversation_topics': set(),
+                'sentiment_history': []
+            }
+            if self.journal is not None:
+                self.journal.write(lambda: self._add_session(session_id, session))
+            else:
+                self.sessions.add(session_id, session)
+        return session
+
+    def _add_session(self, session_id: str, session: Dict) -> Optional[Dict]:
+        """Store a new session; returns a journal entry for the sessions it evicted, if any"""
+        evicted = []
+        self.sessions.add(session_id, session, evicted)
+        return {'d': evicted} if evicted else None
+
+    def append(self, session_id: str, message: Dict, topics: List[str]):
+        session = self.get(session_id)
+        if self.journal is not None:
+            self.journal.record(lambda: self._append_message(session_id, session, message, topics))
+        else:
+            self._append_message(session_id, session, message, topics)
+
+    def _append_message(self, session_id: str, session: Dict, message: Dict, topics: List[str]) -> Dict:
+        """Add a message to a session; returns its journal entry"""
+        session['history'].append(message)
+        session['message_count'] += 1
+        session['conversation_topics'].update(topics)
+
+        # Keep only recent history
+        if len(session['history']) > self.history_limit:
+            session['history'] = session['history'][-self.history_limit:]
+        return {'s': session_id, 'n': session['message_count'], 'm': message, 'k': topics}
+
+    def trim(self, session_id: str, keep: int):
+        session = self.sessions.get(session_id)
+        if session is None:
+            return
+        if self.journal is not None:
+            self.journal.record(lambda: self._trim_history(session_id, session, keep))
+        else:
+            self._trim_history(session_id, session, keep)
+
+    @staticmethod
+    def _trim_history(session_id: str, session: Dict, keep: int) -> Dict:
+        session['history'] = session['history'][-keep:] if keep else []
+        return {'s': session_id, 't': keep, 'n': session['message_count']}
+
+    def _replay(self, entry: Dict):
+        """Apply a journal entry unless the restored session already holds it"""
+        if 'r' in entry:
+            self._restore_session(entry['r'])
+        elif 't' in entry:
+            session = self.sessions.get(entry['s'])
+            # A session copied after messages that followed the trim already holds it
+            if session is not None and session['message_count'] <= entry.get('n', session['message_count']):
+                self._trim_history(entry['s'], session, entry['t'])
+        elif 'm' in entry:
+            self._replay_message(entry)
+        for session_id in entry.get('d', ()):
+            self.sessions.remove(session_id)
+
+    def _replay_message(self, entry: Dict):
+        session = self.sessions.get(entry['s'])
+        if session is None:
+            timestamp = datetime.fromisoformat(entry['m']['timestamp'])
+            session = self.sessions.add(entry['s'], {
+                'history': [],
+                'created_at': timestamp,
+                'last_active': timestamp,
+                'message_count': entry['n'] - 1,
+                'user_info': {},
+                'conversation_topics': set(),
+                'sentiment_history': []
+            })
+        if entry['n'] > session['message_count']:
+            self._append_message(entry['s'], session, entry['m'], entry['k'])
+            session['message_count'] = entry['n']
+
+    def _capture_sessions(self) -> Iterator[Tuple[str, Dict]]:
+        # Runs under the journal lock, so only references are taken here; the
+        # sessions are copied as the snapshot is written, a batch per hold of
+        # the journal lock that every change to them is applied under.
+        # Changes after the snapshot began replay over it: message numbers
+        # skip what a copy already holds, and deletes drop sessions removed
+        # since their reference was taken
+        items = self.sessions.copy_items()
+
+        def copies():
+            for start in range(0, len(items), SNAPSHOT_COPY_BATCH):
+                with self.journal.lock:
+                    batch = [(session_id, dict(session, history=list(session['history']),
+                                               conversation_topics=set(session['conversation_topics'])))
+                             for session_id, session in items[start:start + SNAPSHOT_COPY_BATCH]]
+                yield from batch
+
+        return copies()
+
+    @staticmethod
+    def _snapshot_entry(item: Tuple[str, Dict]) -> Dict:
+        session_id, session = item
+        return dict(session, session_id=session_id, created_at=session['created_at'].isoformat(),
+                    last_active=session['last_active'].isoformat(),
+                    conversation_topics=sorted(session['conversation_topics']))
+
+    def _restore_session(self, entry: Dict):
+        session = dict(entry)
+        session_id = session.pop('session_id')
+        session['created_at'] = datetime.fromisoformat(session['created_at'])
+        session['last_active'] = datetime.fromisoformat(session['last_active'])
+        session['conversation_topics'] = set(session['conversation_topics'])
+        self.sessions.add(session_id, session)
+
+    def expire(self, budget: int = 1000) -> Tuple[int, int]:
+        # The store evicts least recently used sessions itself when full
+        current_time = datetime.now()
+        if self.journal is not None:
+            expired = []
+
+            def expire():
+                self.sessions.expire(current_time, budget, expired)
+                return {'d': expired} if expired else None
+
+            self.journal.write(expire)
+            removed = len(expired)
+        else:
+            removed = self.sessions.expire(current_time, budget)
+        return removed, self.sessions.count_expired(current_time, budget)
+
+    def stats(self) -> Dict:
+        stats = {
+            "total_sessions": len(self.sessions),
+            "active_sessions_last_hour": self.sessions.activity.count(),
+            "storage_type": self.storage_type
+        }
+        if self.journal is not None:
+            stats["journal"] = self.journal.metrics()
+        return stats
+
+    def page(self, after: Optional[str], limit: int) -> List[Dict]:
+        # Picking a page walks every id; see session_export.page_ids
+        return self._records(page_ids(self.sessions, after, limit))
+
+    def export(self, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Dict]:
+        return export_ids(self.sessions, self._records, batch_size)
+
+    def _records(self, session_ids: Iterable[str]) -> List[Dict]:
+        sessions = []
+        for session_id in session_ids:
+            session = self.sessions.get(session_id)
+            if session is not None:  # expired since the ids were picked
+                sessions.append(dict(session, session_id=session_id))
+        return sessions
+
+    def load(self, records: List[Dict]):
+        now = datetime.now()
+        sessions = []
+        for record in records:
+            session = restored_session(record, now)
+            session.pop('version')
+            session['conversation_topics'] = set(session['conversation_topics'])
+            sessions.append((session.pop('session_id'), session))
+        if self.journal is None:
+            self.sessions.add_many(sessions)
+            return
+        # One replace entry per imported session, so a restart keeps them
+        sequence = 0
+        for session_id, session in sessions:
+            sequence = self.journal.write(lambda: self._replace_session(session_id, session))
+        self.journal.wait(sequence)
+
+    def _replace_session(self, session_id: str, session: Dict) -> Dict:
+        """Store a session whole, over any with the same id; returns its journal entry"""
+        evicted = []
+        self.sessions.add(session_id, session, evicted)
+        entry = {'s': session_id, 'r': self._snapshot_entry((session_id, session))}
+        if evicted:
+            entry['d'] = evicted
+        return entry
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+
+
+class MongoBackend(SessionBackend):
+    """Sessions as documents of a MongoDB collection, one per session.
+
+    ``get_collection`` is called on every use, so a backend created before
+    a pre-fork server forks uses each worker's own client. Creating the
+    backend builds the indexes, so it raises when MongoDB is unreachable.
+    ``write_behind_ms`` buffers appends and flushes them every that many
+    milliseconds or ``write_behind_ops`` messages, whichever comes first;
+    ``session_cache_size`` keeps that many sessions cached for
+    ``session_cache_ttl`` seconds, their last_active rewritten at most once
+    per ``touch_interval`` seconds.
+    """
+
+    storage_type = "MongoDB"
+
+    def __init__(self, get_collection: Callable, max_sessions: int = 1000, ttl: timedelta = timedelta(hours=24),
+                 history_limit: int = 20, write_behind_ms: Optional[int] = None, write_behind_ops: int = 500,
+                 session_cache_size: int = 0, session_cache_ttl: float = 30, touch_interval: float = 60):
+        super().__init__(max_sessions, ttl, history_limit)
+        self.get_collection = get_collection
+        self.touch_interval = touch_interval
+        # Create indexes for better performance; the TTL index on
+        # last_active lets MongoDB expire idle sessions itself
+        self.collection.create_index("session_id", unique=True)
+        ensure_ttl_index(self.collection, int(ttl.total_seconds()))
+        # Sessions this process saw active in the last hour, so stats need
+        # no time-range scan
+        self.activity = ActivityWindow(timedelta(hours=1))
+        self.write_behind = None
+        if write_behind_ms:
+            self.write_behind = WriteBehindBuffer(
+                get_collection, lambda messages, topics: message_upsert(messages, topics, self.history_limit),
+                write_behind_ms, write_behind_ops)
+            self.write_behind.start()
+        self.session_cache = None
+        if session_cache_size:
+            self.session_cache = SessionCache(session_cache_size, session_cache_ttl)
+
+    @property
+    def collection(self):
+        return self.get_collection()
+
+    def get(self, session_id: str, fields: Optional[Iterable[str]] = None,
+            history: Optional[int] = None) -> Dict:
+        # ``fields`` and ``history`` are pushed down as a projection with $slice
+        self.activity.touch(session_id)
+        projection = session_projection(fields, history)
+        if self.session_cache is not None:
+            session = self.session_cache.get(session_id)
+            if session is not None:
+                # TTL expiry is hours away, so last_active is rewritten
+                # at most once per touch_interval
+                if self.session_cache.needs_touch(session_id, self.touch_interval):
+                    self.collection.update_one(
+                        {"session_id": session_id},
+                        {"$set": {"last_active": utcnow()}}
+                    )
+                return session if projection is None else project_session(session, fields, history)
+
+        def read():
+            # One upsert touches the session, or creates it when two
+            # requests (or a write-behind flush) race to be its first
+            return self.collection.find_one_and_update(
+                {"session_id": session_id}, touch_upsert(), upsert=True,
+                projection=projection if self.session_cache is None else None,
+                return_document=ReturnDocument.AFTER)
+
+        pending = {}
+        if self.write_behind:
+            session, pending = self.write_behind.read(read, lambda session: [session_id])
+        else:
+            session = read()
+        if session_id in pending:
+            session = self._with_pending_writes(session, pending[session_id])
+        if self.session_cache is not None:
+            # Cached documents are whole; projections are applied locally
+            self.session_cache.put(session_id, session)
+        return session if projection is None else project_session(session, fields, history)
+
+    def append(self, session_id: str, message: Dict, topics: List[str]):
+        self.activity.touch(session_id)
+        version = None
+        if self.write_behind:
+            self.write_behind.add(session_id, message, topics)
+        else:
+            # One upsert creates or touches the session, appends the message,
+            # trims the history and records the topics
+            update = message_upsert([message], topics, self.history_limit)
+            if self.session_cache is not None and session_id in self.session_cache:
+                # Same round trip, also returning the version stamp
+                version = self.collection.find_one_and_update(
+                    {"session_id": session_id}, update, projection={"version": 1},
+                    upsert=True, return_document=ReturnDocument.AFTER)["version"]
+            else:
+                self.collection.update_one({"session_id": session_id}, update, upsert=True)
+        if self.session_cache is not None:
+            self.session_cache.update(
+                session_id, lambda session: with_messages(session, [message], topics, self.history_limit),
+                version)
+
+    def trim(self, session_id: str, keep: int):
+        if self.write_behind:
+            self.write_behind.flush()
+        self.collection.update_one(
+            {"session_id": session_id},
+            {"$push": {"history": {"$each": [], "$slice": -keep}}, "$inc": {"version": 1}})
+        if self.session_cache is not None:
+            self.session_cache.invalidate(session_id)
+
+    def _with_pending_writes(self, session: Dict, pending: PendingSession) -> Dict:
+        """The stored session with its buffered, not yet flushed messages applied"""
+        return with_messages(session, pending.messages, pending.topics, self.history_limit)
+
+    def expire(self, budget: int = 1000) -> Tuple[int, int]:
+        # The TTL index expires idle sessions; only the cap is enforced
+        # here, sized from collection metadata instead of a count scan
+        excess = self.collection.estimated_document_count() - self.max_sessions
+        if excess <= 0:
+            return 0, 0
+        oldest_sessions = list(self.collection.find(
+            {}, {"session_id": 1, "last_active": 1}
+        ).sort("last_active", 1).limit(min(excess, budget)))
+        if not oldest_sessions:
+            return 0, 0
+        removed = self.collection.delete_many(cap_filter(oldest_sessions)).deleted_count
+        for session_id in (session["session_id"] for session in oldest_sessions):
+            self.activity.discard(session_id)
+            if self.session_cache is not None:
+                self.session_cache.invalidate(session_id)
+        logger.info(f"Cleaned up {removed} oldest sessions to maintain max limit")
+        return removed, max(excess - removed, 0)
+
+    def stats(self) -> Dict:
+        # The total comes from collection metadata; the active count covers
+        # this process only
+        stats = {
+            "total_sessions": self.collection.estimated_document_count(),
+            "active_sessions_last_hour": self.activity.count(),
+            "storage_type": self.storage_type
+        }
+        if self.write_behind:
+            stats["write_behind"] = self.write_behind.metrics()
+        if self.session_cache is not None:
+            stats["session_cache"] = self.session_cache.metrics()
+        return stats
+
+    def page(self, after: Optional[str], limit: int) -> List[Dict]:
+        # A range scan of the session_id index
+        def read():
+            return list(self.collection.find(page_query(after), {"_id": 0}).sort("session_id", 1).limit(limit))
+
+        if not self.write_behind:
+            return read()
+        sessions, pending = self.write_behind.read(read, lambda sessions: [s["session_id"] for s in sessions])
+        return [self._with_pending_writes(session, pending[session["session_id"]])
+                if session["session_id"] in pending else session for session in sessions]
+
+    def load(self, records: List[Dict]):
+        # One unordered bulk_write of upserting replacements
+        now = utcnow()
+        sessions = [restored_session(record, now) for record in records]
+        self.collection.bulk_write(
+            [ReplaceOne({"session_id": session["session_id"]}, session, upsert=True) for session in sessions],
+            ordered=False)
+        if self.session_cache is not None:
+            for session in sessions:
+                self.session_cache.invalidate(session["session_id"])
+
+    def close(self):
+        # The client is shared by the whole process and stays open;
+        # mongodb_config.close_clients() closes it at shutdown
+        if self.write_behind:
+            self.write_behind.close()
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    last_active REAL NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    user_info TEXT NOT NULL DEFAULT '{}',
+    sentiment_history TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS sessions_last_active ON sessions (last_active);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL REFERENCES sessions (session_id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    message TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS topics (
+    session_id TEXT NOT NULL REFERENCES sessions (session_id) ON DELETE CASCADE,
+    topic TEXT NOT NULL,
+    UNIQUE (session_id, topic)
+);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO counters VALUES ('sessions', (SELECT count(*) FROM sessions));
+CREATE TRIGGER IF NOT EXISTS sessions_inserted AFTER INSERT ON sessions
+    BEGIN UPDATE counters SET value = value + 1 WHERE name = 'sessions'; END;
+CREATE TRIGGER IF NOT EXISTS sessions_deleted AFTER DELETE ON sessions
+    BEGIN UPDATE counters SET value = value - 1 WHERE name = 'sessions'; END;
+"""
+
+# Statements are kept as constants: sqlite3 caches each connection's
+# prepared statements by their text, so every call after the first reuses one
+_TOUCH_SESSION = ("UPDATE sessions SET last_active = ? WHERE session_id = ? "
+                  "RETURNING created_at, last_active, message_count, user_info, sentiment_history")
+_CREATE_SESSION = ("INSERT INTO sessions (session_id, created_at, last_active) VALUES (?, ?, ?) "
+                   "ON CONFLICT (session_id) DO UPDATE SET last_active = excluded.last_active "
+                   "RETURNING created_at, last_active, message_count, user_info, sentiment_history")
+_APPEND_SESSION = ("INSERT INTO sessions (session_id, created_at, last_active, message_count) VALUES (?, ?, ?, 1) "
+                   "ON CONFLICT (session_id) DO UPDATE SET last_active = excluded.last_active, "
+                   "message_count = message_count + 1 RETURNING message_count")
+_INSERT_MESSAGE = "INSERT INTO messages (session_id, seq, message) VALUES (?, ?, ?)"
+_INSERT_TOPIC = "INSERT OR IGNORE INTO topics (session_id, topic) VALUES (?, ?)"
+_TRIM_MESSAGES = "DELETE FROM messages WHERE session_id = ? AND seq <= ?"
+_TRIM_TO = ("DELETE FROM messages WHERE session_id = ?1 AND seq <= "
+            "(SELECT message_count FROM sessions WHERE session_id = ?1) - ?2")
+_RECENT_MESSAGES = "SELECT message FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?"
+_SESSION_TOPICS = "SELECT topic FROM topics WHERE session_id = ? ORDER BY rowid"
+_EXPIRE_IDLE = ("DELETE FROM sessions WHERE session_id IN (SELECT session_id FROM sessions "
+                "WHERE last_active < ? ORDER BY last_active LIMIT ?) RETURNING session_id")
+_EVICT_OLDEST = ("DELETE FROM sessions WHERE session_id IN (SELECT session_id FROM sessions "
+                 "ORDER BY last_active LIMIT ?) RETURNING session_id")
+_COUNT_IDLE = "SELECT count(*) FROM (SELECT 1 FROM sessions WHERE last_active < ? LIMIT ?)"
+_SESSION_COUNT = "SELECT value FROM counters WHERE name = 'sessions'"
+_PAGE_SESSIONS = ("SELECT session_id, created_at, last_active, message_count, user_info, sentiment_history "
+                  "FROM sessions WHERE session_id > ? ORDER BY session_id LIMIT ?")
+_PAGE_MESSAGES = "SELECT session_id, message FROM messages WHERE session_id BETWEEN ? AND ? ORDER BY session_id, seq"
+_PAGE_TOPICS = "SELECT session_id, topic FROM topics WHERE session_id BETWEEN ? AND ? ORDER BY rowid"
+_LOAD_SESSION = ("INSERT INTO sessions (session_id, created_at, last_active, message_count, user_info, "
+                 "sentiment_history) VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (session_id) DO UPDATE SET "
+                 "created_at = excluded.created_at, last_active = excluded.last_active, "
+                 "message_count = excluded.message_count, user_info = excluded.user_info, "
+                 "sentiment_history = excluded.sentiment_history")
+_CLEAR_MESSAGES = "DELETE FROM messages WHERE session_id = ?"
+_CLEAR_TOPICS = "DELETE FROM topics WHERE session_id = ?"
+
+
+def _timestamp(value: float) -> datetime:
+    return datetime.fromtimestamp(value, timezone.utc)
+
+
+class SQLiteBackend(SessionBackend):
+    """Sessions in an embedded SQLite database at ``path``, in WAL mode.
+
+    Write-ahead logging lets readers run alongside the single writer, and
+    with ``synchronous=NORMAL`` a commit appends to the log without an
+    fsync (the log is synced at checkpoints): a power failure may lose the
+    last commits but never corrupts the database. Every operation is one transaction of
+    prepared statements: an append writes the session, its message, the
+    trim and its topics together, and imports and expiry write a whole
+    batch with ``executemany``. Threads borrow connections from a pool of
+    at most ``pool_size``, so the open files stay bounded however many
+    threads come and go.
+
+    Idle sessions are deleted by ``expire`` along with the surplus over
+    ``max_sessions``; the session count is kept in a table by triggers, so
+    stats never scan. Like MongoDB mode, the active count covers this
+    process only. Timestamps are stored as Unix times and read back in UTC.
+    """
+
+    storage_type = "SQLite"
+
+    def __init__(self, path: str, max_sessions: int = 1000, ttl: timedelta = timedelta(hours=24),
+                 history_limit: int = 20, busy_timeout: float = 5.0, pool_size: int = SQLITE_POOL_SIZE):
+        super().__init__(max_sessions, ttl, history_limit)
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.pool_size = pool_size
+        self.activity = ActivityWindow(timedelta(hours=1))
+        self._idle: List[sqlite3.Connection] = []
+        self._opened = 0
+        self._returned = threading.Condition()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as connection:
+            self.journal_mode = connection.execute("PRAGMA journal_mode = WAL").fetchall()[0][0]
+            if self.journal_mode != 'wal':
+                logger.warning(f"SQLite could not enable WAL for {path}; using {self.journal_mode} journaling")
+            connection.executescript(f"BEGIN IMMEDIATE;{_SQLITE_SCHEMA}COMMIT;")
+
+    @contextmanager
+    def _connection(self):
+        """Borrow a pooled connection, opening one while fewer than
+        ``pool_size`` are open and otherwise waiting for one to come back"""
+        with self._returned:
+            while not self._idle and self._opened >= self.pool_size:
+                self._returned.wait()
+            connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                self._opened += 1
+        if connection is None:
+            try:
+                # Transactions are begun explicitly (see _transaction)
+                connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                                             check_same_thread=False)
+                connection.execute("PRAGMA foreign_keys = ON")
+                connection.execute("PRAGMA synchronous = NORMAL")
+            except BaseException:
+                with self._returned:
+                    self._opened -= 1
+                    self._returned.notify()
+                raise
+        try:
+            yield connection
+        finally:
+            with self._returned:
+                self._idle.append(connection)
+                self._returned.notify()
+
+    @contextmanager
+    def _transaction(self, read_only: bool = False):
+        """One transaction on a pooled connection, yielding its cursor.
+
+        Writes take the write lock up front (``BEGIN IMMEDIATE``), so they
+        wait their turn for up to ``busy_timeout`` instead of failing when a
+        read turns into a write. Statements are read with ``fetchall`` so
+        none stays open and holds back WAL checkpoints.
+        """
+        with self._connection() as connection:
+            connection.execute("BEGIN" if read_only else "BEGIN IMMEDIATE")
+            try:
+                yield connection.cursor()
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def _session(self, session_id: str, row: Tuple, fields: Optional[Iterable[str]],
+                 history: Optional[int], cursor) -> Dict:
+        created_at, last_active, message_count, user_info, sentiment_history = row
+        session = {
+            'session_id': session_id,
+            'created_at': _timestamp(created_at),
+            'last_active': _timestamp(last_active),
+            'message_count': message_count,
+            'user_info': json.loads(user_info),
+            'sentiment_history': json.loads(sentiment_history)
+        }
+        wanted = None if fields is None else set(fields)
+        if wanted is not None:
+            session = {key: value for key, value in session.items() if key in wanted or key == 'session_id'}
+        if wanted is None or 'history' in wanted or history is not None:
+            count = self.history_limit if history is None else min(history, self.history_limit)
+            rows = cursor.execute(_RECENT_MESSAGES, (session_id, count)).fetchall() if count else []
+            session['history'] = [json.loads(message) for message, in reversed(rows)]
+        if wanted is None or 'conversation_topics' in wanted:
+            session['conversation_topics'] = [topic for topic, in
+                                              cursor.execute(_SESSION_TOPICS, (session_id,)).fetchall()]
+        return session
+
+    def get(self, session_id: str, fields: Optional[Iterable[str]] = None,
+            history: Optional[int] = None) -> Dict:
+        # ``fields`` and ``history`` narrow what is read: the history is the
+        # newest rows of the (session_id, seq) primary key
+        self.activity.touch(session_id)
+        now = time.time()
+        with self._transaction() as cursor:
+            rows = (cursor.execute(_TOUCH_SESSION, (now, session_id)).fetchall()
+                    or cursor.execute(_CREATE_SESSION, (session_id, now, now)).fetchall())
+            return self._session(session_id, rows[0], fields, history, cursor)
+
+    def append(self, session_id: str, message: Dict, topics: List[str]):
+        self.activity.touch(session_id)
+        now = time.time()
+        with self._transaction() as cursor:
+            count = cursor.execute(_APPEND_SESSION, (session_id, now, now)).fetchall()[0][0]
+            cursor.execute(_INSERT_MESSAGE, (session_id, count, json.dumps(message)))
+            if count > self.history_limit:
+                cursor.execute(_TRIM_MESSAGES, (session_id, count - self.history_limit))
+            if topics:
+                cursor.executemany(_INSERT_TOPIC, [(session_id, topic) for topic in topics])
+
+    def trim(self, session_id: str, keep: int):
+        with self._transaction() as cursor:
+            cursor.execute(_TRIM_TO, (session_id, keep))
+
+    def expire(self, budget: int = 1000) -> Tuple[int, int]:
+        cutoff = time.time() - self.ttl.total_seconds()
+        with self._transaction() as cursor:
+            removed = [session_id for session_id, in cursor.execute(_EXPIRE_IDLE, (cutoff, budget)).fetchall()]
+            excess = cursor.execute(_SESSION_COUNT).fetchall()[0][0] - self.max_sessions
+            if excess > 0 and len(removed) < budget:
+                removed += [session_id for session_id, in
+                            cursor.execute(_EVICT_OLDEST, (min(excess, budget - len(removed)),)).fetchall()]
+            excess = cursor.execute(_SESSION_COUNT).fetchall()[0][0] - self.max_sessions
+            idle = cursor.execute(_COUNT_IDLE, (cutoff, budget)).fetchall()[0][0]
+        for session_id in removed:
+            self.activity.discard(session_id)
+        return len(removed), min(max(idle, excess, 0), budget)
+
+    def stats(self) -> Dict:
+        with self._connection() as connection:
+            total_sessions = connection.execute(_SESSION_COUNT).fetchall()[0][0]
+        return {
+            "total_sessions": total_sessions,
+            "active_sessions_last_hour": self.activity.count(),
+            "storage_type": self.storage_type,
+            "sqlite": {"path": self.path, "journal_mode": self.journal_mode}
+        }
+
+    def page(self, after: Optional[str], limit: int) -> List[Dict]:
+        # A page is a contiguous run of session ids, so its messages and
+        # topics are one range scan each, in the same read transaction
+        with self._transaction(read_only=True) as cursor:
+            rows = cursor.execute(_PAGE_SESSIONS, ('' if after is None else after, limit)).fetchall()
+            if not rows:
+                return []
+            sessions = {}
+            for session_id, created_at, last_active, message_count, user_info, sentiment_history in rows:
+                sessions[session_id] = {
+                    'session_id': session_id,
+                    'history': [],
+                    'created_at': _timestamp(created_at),
+                    'last_active': _timestamp(last_active),
+                    'message_count': message_count,
+                    'user_info': json.loads(user_info),
+                    'conversation_topics': [],
+                    'sentiment_history': json.loads(sentiment_history)
+                }
+            first, last = rows[0][0], rows[-1][0]
+            for session_id, message in cursor.execute(_PAGE_MESSAGES, (first, last)).fetchall():
+                sessions[session_id]['history'].append(json.loads(message))
+            for session_id, topic in cursor.execute(_PAGE_TOPICS, (first, last)).fetchall():
+                sessions[session_id]['conversation_topics'].append(topic)
+        return list(sessions.values())
+
+    def load(self, records: List[Dict]):
+        now = time.time()
+        sessions, messages, topics = [], [], []
+        for record in records:
+            session = restored_session(record, datetime.now(timezone.utc))
+            session_id = session['session_id']
+            history = session['history'][-self.history_limit:]
+            count = max(session['message_count'], len(history))
+            sessions.append((session_id, session['created_at'].timestamp(), now, count,
+                             json.dumps(session['user_info']), json.dumps(session['sentiment_history'])))
+            first = count - len(history) + 1
+            messages.extend((session_id, first + i, json.dumps(message)) for i, message in enumerate(history))
+            topics.extend((session_id, topic) for topic in session['conversation_topics'])
+        ids = [(session[0],) for session in sessions]
+        with self._transaction() as cursor:
+            cursor.executemany(_LOAD_SESSION, sessions)
+            cursor.executemany(_CLEAR_MESSAGES, ids)
+            cursor.executemany(_CLEAR_TOPICS, ids)
+            cursor.executemany(_INSERT_MESSAGE, messages)
+            cursor.executemany(_INSERT_TOPIC, topics)
+        for session_id, in ids:
+            self.activity.touch(session_id)
+
+    def close(self):
+        with self._returned:
+            for connection in self._idle:
+                connection.close()
+            self._opened -= len(self._idle)
+            self._idle.clear()
+
+
+class AsyncSessionBackend:
+    """Coroutine counterpart of ``SessionBackend``, for ``AsyncEnhancedMemoryManager``"""
+
+    storage_type = None
+
+    def __init__(self, max_sessions: int = 1000, ttl: timedelta = timedelta(hours=24), history_limit: int = 20):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.history_limit = history_limit
+
+    async def connect(self):
+        """Prepare the storage (indexes); raises when it is unreachable"""
+
+    async def get(self, session_id: str, fields: Optional[Iterable[str]] = None,
+                  history: Optional[int] = None) -> Dict:
+        """As ``SessionBackend.get``"""
+        raise NotImplementedError
+
+    async def append(self, session_id: str, message: Dict, topics: List[str]):
+        """As ``SessionBackend.append``"""
+        raise NotImplementedError
+
+    async def expire(self, budget: int = 1000) -> Tuple[int, int]:
+        """As ``SessionBackend.expire``"""
+        raise NotImplementedError
+
+    async def stats(self) -> Dict:
+        """As ``SessionBackend.stats``"""
+        raise NotImplementedError
+
+    async def page(self, after: Optional[str], limit: int) -> List[Dict]:
+        """As ``SessionBackend.page``"""
+        raise NotImplementedError
+
+    async def export(self, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[Dict]:
+        """Every session, in id order, fetched ``batch_size`` at a time"""
+        after = None
+        while True:
+            sessions = await self.page(after, batch_size)
+            for session in sessions:
+                yield session
+            if len(sessions) < batch_size:
+                return
+            after = sessions[-1]["session_id"]
+
+    async def close(self):
+        """Release the backend's resources"""
+
+
+class AsyncMemoryBackend(AsyncSessionBackend):
+    """A ``MemoryBackend`` behind coroutines; nothing in it waits on I/O"""
+
+    storage_type = MemoryBackend.storage_type
+
+    def __init__(self, max_sessions: int = 1000, ttl: timedelta = timedelta(hours=24), history_limit: int = 20):
+        super().__init__(max_sessions, ttl, history_limit)
+        self.backend = MemoryBackend(max_sessions, ttl, history_limit)
+        self.sessions = self.backend.sessions
+        self.activity = self.backend.activity
+
+    async def get(self, session_id: str, fields: Optional[Iterable[str]] = None,
+                  history: Optional[int] = None) -> Dict:
+        return self.backend.get(session_id, fields, history)
+
+    async def append(self, session_id: str, message: Dict, topics: List[str]):
+        self.backend.append(session_id, message, topics)
+
+    async def expire(self, budget: int = 1000) -> Tuple[int, int]:
+        return self.backend.expire(budget)
+
+    async def stats(self) -> Dict:
+        return self.backend.stats()
+
+    async def page(self, after: Optional[str], limit: int) -> List[Dict]:
+        return self.backend.page(after, limit)
+
+    async def export(self, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[Dict]:
+        for session in self.backend.export(batch_size):
+            yield session
+
+    async def close(self):
+        self.backend.close()
+
+
+class AsyncMongoBackend(AsyncSessionBackend):
+    """``MongoBackend`` on a motor collection, every command awaited.
+
+    Nothing is sent to the server before ``connect`` builds the indexes.
+    There is no write-behind buffer: waiting requests already share the
+    loop. ``session_cache_size``, ``session_cache_ttl`` and
+    ``touch_interval`` are as in ``MongoBackend``.
+    """
+
+    storage_type = MongoBackend.storage_type
+
+    def __init__(self, collection, max_sessions: int = 1000, ttl: timedelta = timedelta(hours=24),
+                 history_limit: int = 20, session_cache_size: int = 0, session_cache_ttl: float = 30,
+                 touch_interval: float = 60):
+        super().__init__(max_sessions, ttl, history_limit)
+        self.collection = collection
+        self.touch_interval = touch_interval
+        self.activity = ActivityWindow(timedelta(hours=1))
+        self.session_cache = None
+        if session_cache_size:
+            self.session_cache = SessionCache(session_cache_size, session_cache_ttl)
+
+    async def connect(self):
+        await self.collection.create_index("session_id", unique=True)
+        await ensure_ttl_index_async(self.collection, int(self.ttl.total_seconds()))
+
+    async def get(self, session_id: str, fields: Optional[Iterable[str]] = None,
+                  history: Optional[int] = None) -> Dict:
+        self.activity.touch(session_id)
+        projection = session_projection(fields, history)
+        if self.session_cache is not None:
+            session = self.session_cache.get(session_id)
+            if session is not None:
+                if self.session_cache.needs_touch(session_id, self.touch_interval):
+                    await self.collection.update_one(
+                        {"session_id": session_id},
+                        {"$set": {"last_active": utcnow()}}
+                    )
+                return session if projection is None else project_session(session, fields, history)
+
+        # One upsert touches or creates the session, so concurrent first requests don't collide
+        session = await self.collection.find_one_and_update(
+            {"session_id": session_id}, touch_upsert(), upsert=True,
+            projection=projection if self.session_cache is None else None,
+            return_document=ReturnDocument.AFTER)
+        if self.session_cache is not None:
+            # Cached documents are whole; projections are applied locally
+            self.session_cache.put(session_id, session)
+        return session if projection is None else project_session(session, fields, history)
+
+    async def append(self, session_id: str, message: Dict, topics: List[str]):
+        self.activity.touch(session_id)
+        update = message_upsert([message], topics, self.history_limit)
+        if self.session_cache is not None and session_id in self.session_cache:
+            version = (await self.collection.find_one_and_update(
+                {"session_id": session_id}, update, projection={"version": 1},
+                upsert=True, return_document=ReturnDocument.AFTER))["version"]
+            self.session_cache.update(
+                session_id, lambda session: with_messages(session, [message], topics, self.history_limit),
+                version)
+        else:
+            await self.collection.update_one({"session_id": session_id}, update, upsert=True)
+
+    async def expire(self, budget: int = 1000) -> Tuple[int, int]:
+        # The TTL index expires idle sessions; only the cap is enforced here
+        excess = await self.collection.estimated_document_count() - self.max_sessions
+        if excess <= 0:
+            return 0, 0
+        cursor = self.collection.find(
+            {}, {"session_id": 1, "last_active": 1}
+        ).sort("last_active", 1).limit(min(excess, budget))
+        oldest_sessions = [session async for session in cursor]
+        if not oldest_sessions:
+            return 0, 0
+        removed = (await self.collection.delete_many(cap_filter(oldest_sessions))).deleted_count
+        for session_id in (session["session_id"] for session in oldest_sessions):
+            self.activity.discard(session_id)
+            if self.session_cache is not None:
+                self.session_cache.invalidate(session_id)
+        logger.info(f"Cleaned up {removed} oldest sessions to maintain max limit")
+        return removed, max(excess - removed, 0)
+
+    async def stats(self) -> Dict:
+        stats = {
+            "total_sessions": await self.collection.estimated_document_count(),
+            "active_sessions_last_hour": self.activity.count(),
+            "storage_type": self.storage_type
+        }
+        if self.session_cache is not None:
+            stats["session_cache"] = self.session_cache.metrics()
+        return stats
+
+    async def page(self, after: Optional[str], limit: int) -> List[Dict]:
+        cursor = self.collection.find(page_query(after), {"_id": 0}).sort("session_id", 1).limit(limit)
+        return [session async for session in cursor]
+
+
+def create_backend(name: str, **options) -> SessionBackend:
+    """The backend called ``name`` (one of ``SESSION_BACKENDS``), built with ``options``"""
+    backends = {'memory': MemoryBackend, 'mongodb': MongoBackend, 'sqlite': SQLiteBackend}
+    if name not in backends:
+        raise ValueError(f"Unknown session backend {name!r}; expected one of {', '.join(SESSION_BACKENDS)}")
+    return backends[name](**options)
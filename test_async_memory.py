@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test the asyncio memory manager and the /chat/async route
+"""
+
+import sys
+import os
+import asyncio
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from async_memory import AsyncEnhancedMemoryManager, BackgroundLoop
+from benchmark_async_memory import run_async
+from fake_mongo import FakeAsyncCollection, FakeCollection, async_manager, blocking_manager
+
+
+def exchanges():
+    return [("s1", "Hi there"), ("s2", "I love my family"), ("s1", "what's the weather like?"),
+            ("s2", "work is busy")] + [("s3", f"message {i}") for i in range(25)]
+
+
+def test_async_manager_matches_blocking_manager():
+    blocking = blocking_manager(FakeCollection())
+    concurrent = async_manager(FakeAsyncCollection())
+
+    async def replay():
+        await concurrent.connect()
+        for session_id, message in exchanges():
+            await concurrent.add_message(session_id, message, "ok", 'neutral')
+        return {session_id: await concurrent.get_context_summary(session_id) for session_id in ('s1', 's2', 's3')}
+
+    for session_id, message in exchanges():
+        blocking.add_message(session_id, message, "ok", 'neutral')
+    summaries = asyncio.run(replay())
+
+    for session_id in ('s1', 's2', 's3'):
+        expected = blocking.sessions_collection.documents[session_id]
+        actual = concurrent.sessions_collection.documents[session_id]
+        assert [m['user'] for m in actual['history']] == [m['user'] for m in expected['history']]
+        assert actual['message_count'] == expected['message_count']
+        assert actual['conversation_topics'] == expected['conversation_topics']
+        assert summaries[session_id] == blocking.get_context_summary(session_id)
+    assert len(concurrent.sessions_collection.documents['s3']['history']) == 20
+
+
+def test_in_memory_mode_and_stats():
+    memory = AsyncEnhancedMemoryManager(max_sessions=2, cleanup_interval=None)
+
+    async def scenario():
+        await memory.connect()
+        for session_id in ('a', 'b', 'c'):
+            await memory.add_message(session_id, "tell me a joke", "Why not?", 'neutral')
+        return await memory.get_session_stats(), await memory.get_context_summary('c')
+
+    stats, summary = asyncio.run(scenario())
+    assert not memory.mongodb
+    assert (stats['total_sessions'], stats['active_sessions_last_hour']) == (2, 2)
+    assert stats['storage_type'] == 'In-Memory'
+    assert summary == "Recent topics: jokes"
+
+
+def test_unreachable_database_falls_back_to_memory():
+    class Unreachable(FakeAsyncCollection):
+        async def create_index(self, *args, **kwargs):
+            raise ConnectionError("no server")
+
+    memory = async_manager(Unreachable())
+    asyncio.run(memory.connect())
+    assert not memory.mongodb
+    asyncio.run(memory.add_message('x', 'hello', 'hi'))
+    assert memory.sessions['x']['message_count'] == 1
+
+
+def test_concurrent_sessions_overlap_database_round_trips():
+    _, memory = run_async(sessions=20, messages=3, latency=0.002)
+    assert len(memory.sessions_collection.documents) == 20
+    # Every session's first command was waiting on the database at the same time
+    assert memory.sessions_collection.max_in_flight == 20
+
+
+def test_concurrent_first_requests_create_a_session_once():
+    collection = FakeAsyncCollection(latency=0.01)
+    memory = async_manager(collection)
+
+    async def first_requests():
+        return await asyncio.gather(memory.get_session('new'), memory.get_session('new'))
+
+    sessions = asyncio.run(first_requests())
+    assert [s['message_count'] for s in sessions] == [0, 0]
+    assert sessions[0]['created_at'] == sessions[1]['created_at']
+    assert list(collection.documents) == ['new']
+
+
+def test_background_loop_serves_other_loops():
+    loop = BackgroundLoop()
+    memory = AsyncEnhancedMemoryManager(cleanup_interval=None)
+    try:
+        async def from_another_loop():
+            await loop.run(memory.add_message('bg', 'hello', 'hi'))
+            return await loop.run(memory.get_session_stats())
+
+        assert asyncio.run(from_another_loop())['total_sessions'] == 1
+        assert loop.call(memory.get_session_stats())['total_sessions'] == 1
+    finally:
+        loop.stop()
+
+
+def test_async_chat_route():
+    pytest.importorskip("asgiref")
+    from app import app
+
+    client = app.test_client()
+    body = client.post('/chat/async', json={'message': 'Hello! How is the weather?', 'session_id': 'async-1'}).get_json()
+    assert body['session_id'] == 'async-1'
+    assert body['context'] == "Recent topics: weather"
+    assert client.post('/chat/async', json={}).status_code == 400
+    assert client.get('/stats').get_json()['async_memory']['total_sessions'] >= 1
+
+
+if __name__ == "__main__":
+    test_async_manager_matches_blocking_manager()
+    test_in_memory_mode_and_stats()
+    test_unreachable_database_falls_back_to_memory()
+    test_concurrent_sessions_overlap_database_round_trips()
+    test_concurrent_first_requests_create_a_session_once()
+    test_background_loop_serves_other_loops()
+    test_async_chat_route()
+    print("✅ Async memory tests passed")
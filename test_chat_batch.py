@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Test the batch chat API (chat_batch and POST /chat/batch)
+"""
+
+import sys
+import os
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+from app import app, chat_batch, chat_sessions, fact_store
+
+
+def _reset():
+    chat_sessions.clear()
+    fact_store.clear()
+
+
+def test_chat_batch_preserves_per_session_order():
+    _reset()
+    results = chat_batch([
+        {'session_id': 'a', 'message': 'my name is alice'},
+        {'session_id': 'b', 'message': 'hello'},
+        {'session_id': 'a', 'message': 'what did i say my name was?'},
+        {'session_id': 'b', 'message': 'I feel sad'},
+    ])
+
+    assert [r['session_id'] for r in results] == ['a', 'b', 'a', 'b']
+    assert results[2]['response'] == "You told me your name is Alice!"
+    assert results[3]['sentiment'] == 'negative'
+    assert results[2]['context'] == "Conversation has 2 exchanges"
+    assert [e['user'] for e in chat_sessions['a']] == ['my name is alice', 'what did i say my name was?']
+    assert [e['user'] for e in chat_sessions['b']] == ['hello', 'I feel sad']
+
+
+def test_chat_batch_reports_item_errors_in_place():
+    _reset()
+    results = chat_batch([
+        {'session_id': 'a', 'message': 'hi'},
+        {'session_id': 'a'},
+        'not an item',
+        {'session_id': 'a', 'message': 'thanks'},
+    ])
+
+    assert 'response' in results[0]
+    assert results[1] == {'error': 'Message is required'}
+    assert results[2] == {'error': 'Message is required'}
+    assert results[3]['context'] == "Conversation has 2 exchanges"
+    assert len(chat_sessions['a']) == 2
+
+
+def test_chat_batch_scores_sentiment_once_per_batch():
+    _reset()
+    lexicon = app_module.LEXICONS['full']
+    batches = []
+
+    def analyze_batch(messages):
+        batches.append(list(messages))
+        return type(lexicon).analyze_batch(lexicon, messages)
+
+    def analyze(message):
+        raise AssertionError("messages of a batch are not scored one by one")
+
+    lexicon.analyze_batch, lexicon.analyze = analyze_batch, analyze
+    try:
+        results = chat_batch([
+            {'session_id': 'a', 'message': 'I love this'},
+            {'session_id': 'a'},
+            {'session_id': 'b', 'message': 'this is awful'},
+            {'session_id': 'b', 'message': 'how are you?'},
+        ])
+    finally:
+        del lexicon.analyze_batch, lexicon.analyze
+    assert batches == [['I love this', 'this is awful', 'how are you?']]
+    assert [r.get('sentiment') for r in results] == ['positive', None, 'negative', 'neutral']
+
+
+def test_batch_endpoint():
+    _reset()
+    client = app.test_client()
+
+    response = client.post('/chat/batch', json={'items': [
+        {'session_id': 's1', 'message': 'hello'},
+        {'session_id': 's2', 'message': 'tell me a joke'},
+    ]})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['count'] == 2
+    assert body['results'][0]['session_id'] == 's1'
+
+    # A bare list is accepted too
+    response = client.post('/chat/batch', json=[{'session_id': 's1', 'message': 'bye'}])
+    assert response.get_json()['results'][0]['context'] == "Conversation has 2 exchanges"
+
+    assert client.post('/chat/batch', json={'items': 'nope'}).status_code == 400
+
+    limit = app_module.MAX_BATCH_SIZE
+    app_module.MAX_BATCH_SIZE = 1
+    try:
+        response = client.post('/chat/batch', json=[{'message': 'a'}, {'message': 'b'}])
+        assert response.status_code == 400
+    finally:
+        app_module.MAX_BATCH_SIZE = limit
+
+
+if __name__ == "__main__":
+    test_chat_batch_preserves_per_session_order()
+    test_chat_batch_reports_item_errors_in_place()
+    test_chat_batch_scores_sentiment_once_per_batch()
+    test_batch_endpoint()
+    print("✅ Batch chat tests passed")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Test compact exchange records and the ring-buffer chat history
+"""
+
+import sys
+import os
+from datetime import datetime
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from chat_history import ChatHistory, Exchange, SessionHistories, session_history
+from config import Config
+from sentiment_engine import Sentiment, SentimentLexicon
+
+
+def test_sentiment_codes_follow_lexicon_labels():
+    assert [code.label for code in Sentiment] == list(SentimentLexicon.LABELS)
+    assert Sentiment.from_label('questioning') is Sentiment.QUESTIONING
+    assert Sentiment.from_label(None) is Sentiment.NEUTRAL
+
+
+def test_exchange_serializes_like_the_old_dicts():
+    moment = datetime(2024, 5, 1, 12, 30, 15, 250000)
+    exchange = Exchange("hi", "Hello!", moment.timestamp(), 'positive')
+    assert not hasattr(exchange, '__dict__')
+    assert exchange.sentiment == Sentiment.POSITIVE
+    assert exchange.to_dict() == {'user': 'hi', 'bot': 'Hello!', 'timestamp': moment.isoformat(),
+                                  'sentiment': 'positive'}
+    assert exchange['user'] == 'hi' and exchange['sentiment'] == 'positive'
+    with pytest.raises(KeyError):
+        exchange['missing']
+
+
+def test_ring_buffer_keeps_most_recent_in_order():
+    history = ChatHistory(3)
+    for i in range(7):
+        history.append(Exchange(f"m{i}", "ok"))
+    assert [e.user for e in history] == ['m4', 'm5', 'm6']
+    assert history[0].user == 'm4' and history[-1].user == 'm6'
+    assert len(history) == 3 and history.total == 7 and history.capacity == 3
+    with pytest.raises(IndexError):
+        history[3]
+    history.clear()
+    assert len(history) == 0 and list(history) == []
+    with pytest.raises(ValueError):
+        ChatHistory(0)
+
+
+def test_session_history_uses_configured_capacity():
+    sessions = {}
+    history = session_history(sessions, 'a')
+    assert history is session_history(sessions, 'a')
+    assert history.capacity == Config.MAX_CHAT_HISTORY
+
+
+def test_session_histories_keep_a_running_total():
+    sessions = SessionHistories()
+    session_history(sessions, 'a', capacity=2).extend(Exchange(f"m{i}", "ok") for i in range(5))
+    session_history(sessions, 'b').append(Exchange("hi", "hello"))
+    assert sessions.total_messages == 6 == sum(history.total for history in sessions.values())
+    del sessions['a']
+    assert sessions.total_messages == 1
+    sessions.clear()
+    assert sessions.total_messages == 0
+
+
+def test_stats_report_the_running_total():
+    import app
+
+    app.chat_sessions.clear()
+    client = app.app.test_client()
+    for i in range(3):
+        client.post('/chat', json={'message': f'hello {i}', 'session_id': f's{i % 2}'})
+    client.post('/chat/batch', json={'items': [{'message': 'hi', 'session_id': 's2'}]})
+    stats = client.get('/stats').get_json()
+    assert (stats['total_sessions'], stats['total_messages']) == (3, 4)
+
+
+def test_apps_cap_history_and_serialize_it():
+    import app
+    import app_backend_only
+
+    for module in (app, app_backend_only):
+        module.chat_sessions.clear()
+        client = module.app.test_client()
+        for i in range(Config.MAX_CHAT_HISTORY + 5):
+            client.post('/chat', json={'message': f'hello {i}', 'session_id': 'ring'})
+        history = module.chat_sessions['ring']
+        assert len(history) == Config.MAX_CHAT_HISTORY
+        assert history[0].user == 'hello 5'
+        data = client.get('/data').get_json()
+        stored = data['sessions']['ring']
+        assert len(stored) == Config.MAX_CHAT_HISTORY
+        assert datetime.fromisoformat(stored[-1]['timestamp'])
+        assert stored[-1]['sentiment'] == 'neutral'
+    # app.py still reports the full conversation length
+    assert app.app.test_client().post('/chat', json={'message': 'hi', 'session_id': 'ring'}).get_json()[
+        'context'] == f"Conversation has {Config.MAX_CHAT_HISTORY + 6} exchanges"
+
+
+if __name__ == "__main__":
+    test_sentiment_codes_follow_lexicon_labels()
+    test_exchange_serializes_like_the_old_dicts()
+    test_ring_buffer_keeps_most_recent_in_order()
+    test_session_history_uses_configured_capacity()
+    test_session_histories_keep_a_running_total()
+    test_stats_report_the_running_total()
+    test_apps_cap_history_and_serialize_it()
+    print("✅ Chat history tests passed")
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Test the pre-fork cluster: the consistent-hash ring, request splitting and
+merging, and a running cluster of app_lightweight workers
+"""
+
+import sys
+import os
+import json
+import signal
+import socket
+import tempfile
+import threading
+import urllib.request
+from collections import Counter
+from http.client import HTTPConnection
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from async_memory import BackgroundLoop
+from benchmark_cluster import call, cluster_workers, start_cluster, wait_for
+from cluster import (Dispatcher, InFlight, make_worker_server, merge_batch, merge_pages, merge_record_pages,
+                     session_key, split_batch)
+from fake_mongo import FakeAsyncCollection, async_manager
+from session_export import dumps, next_cursor, page_args, to_ndjson
+from session_ids import HashRing, new_session_id, worker_ring
+
+
+def test_ring_spreads_sessions_evenly_and_agrees_across_instances():
+    ring = HashRing(range(4))
+    keys = [f"session-{i}" for i in range(20_000)]
+    counts = Counter(map(ring.node_for, keys))
+    assert sorted(counts) == [0, 1, 2, 3]
+    assert all(4000 < count < 6000 for count in counts.values()), counts
+    assert all(HashRing(range(4)).node_for(key) == ring.node_for(key) for key in keys[:500])
+
+
+def test_adding_a_worker_only_moves_the_sessions_it_takes_over():
+    before, after = HashRing(range(4)), HashRing(range(5))
+    keys = [f"session-{i}" for i in range(20_000)]
+    moved = [key for key in keys if before.node_for(key) != after.node_for(key)]
+    assert all(after.node_for(key) == 4 for key in moved)
+    assert 0.1 < len(moved) / len(keys) < 0.3
+
+
+def test_new_session_ids_belong_to_the_worker_that_made_them():
+    assert worker_ring(3) is worker_ring(3)
+    try:
+        for worker in range(3):
+            os.environ['STAN_WORKER_ID'], os.environ['STAN_WORKERS'] = str(worker), '3'
+            assert all(worker_ring(3).node_for(new_session_id()) == worker for _ in range(50))
+    finally:
+        del os.environ['STAN_WORKER_ID'], os.environ['STAN_WORKERS']
+    assert len({new_session_id() for _ in range(100)}) == 100
+
+
+def test_session_key_comes_from_body_query_or_header():
+    json_headers = {'Content-Type': 'application/json'}
+    assert session_key(b'{"session_id": "a", "message": "hi"}', '', json_headers) == 'a'
+    assert session_key(b'{"message": "hi"}', 'session_id=b', json_headers) == 'b'
+    assert session_key(None, '', {'X-Session-ID': 'c'}) == 'c'
+    assert session_key(b'not json', '', json_headers) is None
+    assert session_key(b'{"session_id": "a"}', '', {}) is None  # only JSON bodies are read
+
+
+def test_batches_split_by_owner_and_merge_back_in_order():
+    items = [{'session_id': 'a', 'message': '1'}, {'message': '2'}, {'session_id': 'b', 'message': '3'},
+             {'session_id': 'a', 'message': '4'}, 'bogus']
+    owners = {'a': 0, 'b': 1, None: 2}
+    groups = split_batch(items, owners.get)
+    assert groups == {0: [0, 3], 1: [2], 2: [1, 4]}
+    results = {worker: [{'reply': items[i]['message'] if isinstance(items[i], dict) else 'error'}
+                        for i in positions] for worker, positions in groups.items()}
+    assert [result['reply'] for result in merge_batch(groups, results)] == ['1', '2', '3', '4', 'error']
+
+
+def test_pages_merge_into_the_first_ids_of_every_worker():
+    pages = [{'sessions': {'a': [1], 'd': [4]}, 'user_data': {'d': {'name': 'Dee'}}, 'next_cursor': 'd',
+              'total_sessions': 5, 'storage_type': 'In-Memory'},
+             {'sessions': {'b': [2], 'c': [3]}, 'user_data': {}, 'next_cursor': 'c', 'total_sessions': 2,
+              'storage_type': 'In-Memory'}]
+    page = merge_pages(pages, 3)
+    assert list(page['sessions']) == ['a', 'b', 'c'] and page['next_cursor'] == 'c'
+    assert page['user_data'] == {} and page['total_sessions'] == 7 and page['storage_type'] == 'In-Memory'
+    assert merge_pages(pages, 5)['next_cursor'] is None
+
+
+def test_record_pages_merge_into_the_first_records_of_every_worker():
+    pages = [{'sessions': [{'session_id': 'a'}, {'session_id': 'd'}], 'next_cursor': 'd'},
+             {'sessions': [{'session_id': 'b'}, {'session_id': 'c'}], 'next_cursor': 'c'}]
+    page = merge_record_pages(pages, 3)
+    assert [record['session_id'] for record in page['sessions']] == ['a', 'b', 'c'] and page['next_cursor'] == 'c'
+    assert merge_record_pages(pages, 5) == {'sessions': sorted(sum((page['sessions'] for page in pages), []),
+                                                                key=lambda record: record['session_id']),
+                                            'next_cursor': None, 'storage_type': None}
+    # The same session from two workers is kept once
+    assert [record['session_id'] for record in merge_record_pages(pages + pages, 3)['sessions']] == ['a', 'b', 'c']
+
+
+def memory_worker(memory, loop):
+    """A worker serving ``/data/memory`` and its export from ``memory``, as app.py does"""
+    from flask import Flask, Response, request
+    from werkzeug.serving import make_server
+
+    app = Flask(__name__)
+
+    @app.route('/data/memory')
+    def view_memory():
+        cursor, limit = page_args(request.args)
+        records = loop.call(memory.page_sessions(cursor, limit))
+        return Response(dumps({'sessions': records, 'next_cursor': next_cursor(records, limit),
+                               'storage_type': memory.storage_type}), mimetype='application/json')
+
+    @app.route('/data/memory/export')
+    def export_memory():
+        return Response(to_ndjson(loop.iterate(memory.export_sessions())), mimetype='application/x-ndjson')
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_workers_sharing_a_mongodb_store_are_read_once():
+    loop = BackgroundLoop()
+    collection = FakeAsyncCollection()
+    managers = [async_manager(collection) for _ in range(3)]
+    for memory in managers:
+        loop.call(memory.connect())
+    for i in range(5):
+        loop.call(managers[i % 3].add_message(f"s{i}", "hello", "hi"))
+    workers = [memory_worker(memory, loop) for memory in managers]
+    sock = socket.create_server(('127.0.0.1', 0))
+    dispatcher = Dispatcher(sock, [worker.port for worker in workers])
+    threading.Thread(target=dispatcher.serve_forever, daemon=True).start()
+    port = sock.getsockname()[1]
+    try:
+        page = call(port, '/data/memory?limit=3')[0]
+        assert [record['session_id'] for record in page['sessions']] == ['s0', 's1', 's2']
+        page = call(port, f"/data/memory?limit=3&cursor={page['next_cursor']}")[0]
+        assert [record['session_id'] for record in page['sessions']] == ['s3', 's4']
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/data/memory/export", timeout=30) as response:
+            exported = [json.loads(line)['session_id'] for line in response]
+        assert exported == [f"s{i}" for i in range(5)]
+    finally:
+        dispatcher.shutdown()
+        dispatcher.server_close()
+        for worker in workers:
+            worker.shutdown()
+        loop.stop()
+
+
+def test_a_worker_answers_a_connection_accepted_before_it_stops():
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-Length', '2')])
+        return [b'ok']
+
+    sock = socket.create_server(('127.0.0.1', 0))
+    in_flight = InFlight()
+    server = make_worker_server(app, sock, in_flight)
+    serving = threading.Thread(target=server.serve_forever, daemon=True)
+    serving.start()
+    connection = HTTPConnection(*sock.getsockname()[:2], timeout=10)
+    try:
+        # Accepted, its request not sent yet, when the worker is told to stop
+        connection.connect()
+        wait_for(lambda: in_flight.count == 1)
+        server.shutdown()
+        serving.join()
+        assert not in_flight.wait_idle(0)
+        connection.request('GET', '/')
+        response = connection.getresponse()
+        assert (response.status, response.read()) == (200, b'ok')
+        assert in_flight.wait_idle(10)
+    finally:
+        connection.close()
+        server.server_close()
+
+
+def test_cluster_keeps_sessions_on_their_worker_through_crashes_and_restarts():
+    master, port = start_cluster(3, env={'SESSION_JOURNAL_DIR': tempfile.mkdtemp()})
+    try:
+        # New sessions are made round-robin, each by a worker that owns it
+        sessions = {}
+        for _ in range(6):
+            reply, worker = call(port, '/chat', {'message': "hello"})
+            sessions[reply['session_id']] = int(worker)
+            assert worker_ring(3).node_for(reply['session_id']) == int(worker)
+        assert sorted(Counter(sessions.values()).values()) == [2, 2, 2]
+        for session_id, worker in sessions.items():
+            reply, routed = call(port, '/chat', {'message': "thanks", 'session_id': session_id})
+            assert int(routed) == worker and reply['context'] == "Conversation has 2 exchanges"
+        stats = call(port, '/stats')[0]
+        assert (stats['total_sessions'], stats['total_messages'], len(stats['workers'])) == (6, 12, 3)
+        assert list(call(port, '/data?limit=4')[0]['sessions']) == sorted(sessions)[:4]
+
+        # A worker that dies is forked again and recovers its sessions from its journal
+        os.kill(cluster_workers(port)[0]['pid'], signal.SIGKILL)
+        wait_for(lambda: cluster_workers(port)[0]['restarts'] == 1 and cluster_workers(port)[0]['state'] == 'ready')
+        assert call(port, '/stats')[0]['total_sessions'] == 6
+
+        # A rolling restart drops no requests and loses no sessions
+        session_id = next(iter(sessions))
+        replies, restarted = [], threading.Event()
+
+        def chat_during_restart():
+            while not restarted.is_set():
+                replies.append(call(port, '/chat', {'message': "still there?", 'session_id': session_id})[0])
+
+        chatting = threading.Thread(target=chat_during_restart)
+        chatting.start()
+        master.send_signal(signal.SIGHUP)
+        try:
+            wait_for(lambda: [worker['restarts'] for worker in cluster_workers(port)] == [2, 1, 1])
+        finally:
+            restarted.set()
+            chatting.join()
+        assert len(replies) > 10 and all('response' in reply for reply in replies)
+        assert call(port, '/stats')[0]['total_messages'] == 12 + len(replies)
+
+        # X-Worker picks the worker for a request without a session but cannot move a session
+        reply, routed = call(port, '/chat', {'message': "hello"}, {'X-Worker': '2'})
+        assert routed == '2' and worker_ring(3).node_for(reply['session_id']) == 2
+        session_id, worker = next(iter(sessions.items()))
+        reply, routed = call(port, '/chat', {'message': "hi", 'session_id': session_id},
+                             {'X-Worker': str((worker + 1) % 3)})
+        assert int(routed) == worker
+
+        master.send_signal(signal.SIGTERM)
+        assert master.wait(timeout=30) == 0
+    finally:
+        if master.poll() is None:
+            master.kill()
+            master.wait()
+
+
+if __name__ == "__main__":
+    test_ring_spreads_sessions_evenly_and_agrees_across_instances()
+    test_adding_a_worker_only_moves_the_sessions_it_takes_over()
+    test_new_session_ids_belong_to_the_worker_that_made_them()
+    test_session_key_comes_from_body_query_or_header()
+    test_batches_split_by_owner_and_merge_back_in_order()
+    test_pages_merge_into_the_first_ids_of_every_worker()
+    test_record_pages_merge_into_the_first_records_of_every_worker()
+    test_workers_sharing_a_mongodb_store_are_read_once()
+    test_a_worker_answers_a_connection_accepted_before_it_stops()
+    test_cluster_keeps_sessions_on_their_worker_through_crashes_and_restarts()
+    print("✅ Cluster tests passed")
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Test background session expiry: scheduler metrics and bounded cleanup batches
+"""
+
+import sys
+import os
+import time
+from datetime import timedelta
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from expiry_scheduler import ExpiryScheduler
+from enhanced_features import ensure_ttl_index, utcnow
+from storage_backends import ensure_ttl_index_async
+from async_memory import BackgroundLoop
+from fake_mongo import FakeAsyncCollection, FakeCollection, async_manager, blocking_manager
+from benchmark_session_store import in_memory_manager
+
+
+def test_tick_records_cost_and_backlog():
+    scheduler = ExpiryScheduler(interval=0, max_per_tick=5)
+    pending = [12]
+
+    def job(budget):
+        done = min(budget, pending[0])
+        pending[0] -= done
+        return done, pending[0]
+
+    scheduler.add_job('queue', job)
+    assert scheduler.tick() == 5
+    metrics = scheduler.metrics()['jobs']['queue']
+    assert metrics['backlog'] == 7 and metrics['processed_total'] == 5
+    scheduler.tick()
+    scheduler.tick()
+    metrics = scheduler.metrics()['jobs']['queue']
+    assert metrics['ticks'] == 3 and metrics['backlog'] == 0 and metrics['processed_total'] == 12
+    assert metrics['max_tick_ms'] >= metrics['last_tick_ms'] >= 0
+    assert metrics['avg_tick_ms'] >= 0
+
+
+def test_failing_job_is_counted_not_raised():
+    scheduler = ExpiryScheduler(max_per_tick=1)
+    scheduler.add_job('broken', lambda budget: 1 / 0)
+    assert scheduler.tick() == 0
+    assert scheduler.metrics()['jobs']['broken']['errors'] == 1
+
+
+def test_background_thread_ticks():
+    scheduler = ExpiryScheduler(interval=0.01)
+    calls = []
+    scheduler.add_job('count', lambda budget: (calls.append(budget) or 0, 0))
+    scheduler.start()
+    try:
+        deadline = time.monotonic() + 2
+        while len(calls) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert scheduler.running and len(calls) >= 3
+    finally:
+        scheduler.stop()
+    assert not scheduler.running
+
+
+def test_in_memory_expiry_is_batched():
+    memory = in_memory_manager(max_sessions=100)
+    memory.expiry.max_per_tick = 4
+    for i in range(10):
+        memory.get_session(f"s{i}")
+    for session in memory.sessions.values():
+        session['last_active'] -= timedelta(hours=25)
+
+    memory.get_session('fresh')
+    assert len(memory.sessions) == 11
+    memory.expiry.tick()
+    assert len(memory.sessions) == 7
+    assert memory.get_session_stats()['expiry']['jobs']['sessions']['backlog'] == 4
+    memory.expiry.tick()
+    memory.expiry.tick()
+    assert list(memory.sessions) == ['fresh']
+
+
+def test_mongodb_expiry_uses_a_ttl_index():
+    collection = FakeCollection()
+    collection.indexes['last_active_1'] = {}  # plain index from an older version
+    memory = blocking_manager(collection)
+    assert collection.indexes['last_active_1'] == {'expireAfterSeconds': 24 * 3600}
+
+    for i in range(4):
+        memory.get_session(f"s{i}")
+    collection.documents['s0']['last_active'] = utcnow() - timedelta(hours=25)
+    assert memory.expiry.tick() == 0  # under the cap, expiry is left to MongoDB
+    collection.run_ttl_monitor()
+    assert sorted(collection.documents) == ['s1', 's2', 's3']
+
+
+class NeverDropped(FakeCollection):
+    def drop_index(self, name):
+        raise AssertionError("the TTL index is changed in place")
+
+
+def test_ttl_index_is_changed_in_place():
+    collection = NeverDropped()
+    ensure_ttl_index(collection, 3600)
+    ensure_ttl_index(collection, 7200)  # another timeout setting
+    assert collection.indexes['last_active_1'] == {'expireAfterSeconds': 7200}
+
+    collection = FakeAsyncCollection()
+    collection.indexes['last_active_1'] = {'expireAfterSeconds': 60}
+    loop = BackgroundLoop()
+    try:
+        loop.call(ensure_ttl_index_async(collection, 7200))
+    finally:
+        loop.stop()
+    assert collection.indexes['last_active_1'] == {'expireAfterSeconds': 7200}
+
+
+def test_ttl_index_survives_racing_workers():
+    class DroppedMeanwhile(FakeCollection):
+        def command(self, command, value, **options):
+            # Another worker drops the index between our create and collMod
+            self.indexes.pop('last_active_1', None)
+            return super().command(command, value, **options)
+
+    collection = DroppedMeanwhile()
+    collection.indexes['last_active_1'] = {}
+    ensure_ttl_index(collection, 3600)
+    assert collection.indexes['last_active_1'] == {'expireAfterSeconds': 3600}
+
+
+def test_mongodb_cap_is_batched():
+    collection = FakeCollection()
+    memory = blocking_manager(collection, max_sessions=5)
+    memory.expiry.max_per_tick = 3
+    for i in range(10):
+        memory.get_session(f"s{i}")
+
+    commands = collection.commands
+    memory.get_session('s9')
+    assert collection.commands - commands == 1  # one touching upsert, no cleanup
+    assert len(collection.documents) == 10
+
+    commands = collection.commands
+    assert memory.expiry.tick() == 3
+    assert collection.commands - commands == 3  # estimated count, find, delete
+    assert memory.expiry.metrics()['jobs']['sessions']['backlog'] == 2
+    memory.expiry.tick()
+    assert sorted(collection.documents) == ['s5', 's6', 's7', 's8', 's9']
+    assert memory.expiry.metrics()['jobs']['sessions']['backlog'] == 0
+
+    commands = collection.commands
+    assert memory.expiry.tick() == 0
+    assert collection.commands - commands == 1  # within the cap: just the estimated count
+
+
+def test_async_manager_expires_on_its_loop():
+    collection = FakeAsyncCollection()
+    memory = async_manager(collection, max_sessions=1)
+    loop = BackgroundLoop()
+    try:
+        loop.call(memory.connect())
+        assert 'expireAfterSeconds' in collection.indexes['last_active_1']
+        loop.call(memory.add_message('old', 'hello', 'hi'))
+        loop.call(memory.add_message('new', 'hello', 'hi'))
+        collection.documents['old']['last_active'] = utcnow() - timedelta(minutes=5)
+        assert memory.expiry.tick() == 1
+        assert list(collection.documents) == ['new']
+        assert loop.call(memory.get_session_stats())['expiry']['jobs']['sessions']['ticks'] == 1
+        loop.call(memory.close_connection())
+    finally:
+        loop.stop()
+
+
+if __name__ == "__main__":
+    test_tick_records_cost_and_backlog()
+    test_failing_job_is_counted_not_raised()
+    test_background_thread_ticks()
+    test_in_memory_expiry_is_batched()
+    test_mongodb_expiry_uses_a_ttl_index()
+    test_ttl_index_is_changed_in_place()
+    test_ttl_index_survives_racing_workers()
+    test_mongodb_cap_is_batched()
+    test_async_manager_expires_on_its_loop()
+    print("✅ Expiry scheduler tests passed")
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Test the compiled intent matcher against the original elif chain
+"""
+
+import sys
+import os
+import random
+import json
+import shutil
+import tempfile
+import threading
+import time
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from intent_engine import PhraseMatcher, IntentCatalog, DEFAULT_CATALOG_PATH, get_catalog
+from benchmark_intents import SAMPLE_MESSAGES, legacy_detect_intent, intent_matcher
+
+
+def _fuzz_messages(count=3000, seed=7):
+    """Messages glued together from phrase fragments to provoke overlaps"""
+    rng = random.Random(seed)
+    fragments = sorted(intent_matcher.phrase_matcher.phrases) + ['', ' ', 'x', 'is', 'o', "'s"]
+    messages = []
+    for _ in range(count):
+        parts = []
+        for _ in range(rng.randint(1, 5)):
+            fragment = rng.choice(fragments)
+            if fragment and rng.random() < 0.3:
+                start = rng.randint(0, len(fragment) - 1)
+                fragment = fragment[start:]
+            parts.append(fragment)
+        messages.append(rng.choice(['', ' ']).join(parts))
+    return messages
+
+
+def test_phrase_matcher_matches_substring_semantics():
+    """Every phrase reported must be exactly the phrases contained in the text"""
+    matcher = PhraseMatcher(['sad', 'down', 'did i say', 'hi', 'this', 'bye', 'goodbye', 'a', 'ab', 'bc'])
+    for text in ['sadown', 'this', 'goodbye', 'abc', 'did i sadown', 'nothing', '', 'hhi']:
+        expected = {p for p in matcher.phrases if p in text}
+        assert matcher.find(text) == expected, text
+
+    for text in _fuzz_messages():
+        expected = {p for p in intent_matcher.phrase_matcher.phrases if p in text}
+        assert intent_matcher.phrase_matcher.find(text) == expected, text
+
+
+def test_intent_selection_identical_to_elif_chain():
+    """The compiled matcher must pick the same intent as the original chain"""
+    messages = [m.lower().strip() for m in SAMPLE_MESSAGES] + _fuzz_messages()
+    for message in messages:
+        assert intent_matcher.match(message) == legacy_detect_intent(message), message
+
+
+def test_priority_order_and_compound_rules():
+    matcher = intent_matcher
+    # 'hi' inside 'this' still counts as a greeting, like the original chain
+    assert matcher.match('this is it') == 'greeting'
+    assert matcher.match("what's your name") == 'bot_identity'
+    assert matcher.match('my name is') is None
+    assert matcher.match('thanks, bye') == 'thanks'
+    assert matcher.match('random words only') is None
+
+
+def _legacy_lightweight_intent(user_input_lower):
+    """Intent selection of the original SimpleChatbot.generate_response chain"""
+    if any(word in user_input_lower for word in ['hello', 'hi', 'hey', 'greetings']):
+        return 'greeting'
+    elif any(phrase in user_input_lower for phrase in ['how are you', 'how are you doing']):
+        return 'how_are_you'
+    elif any(phrase in user_input_lower for phrase in ['joke', 'funny', 'make me laugh', 'tell me something funny']):
+        return 'jokes'
+    elif any(phrase in user_input_lower for phrase in ['what can you do', 'help me', 'capabilities']):
+        return 'capabilities'
+    elif any(word in user_input_lower for word in ['thank', 'thanks', 'appreciate']):
+        return 'thanks'
+    return None
+
+
+def test_lightweight_profile_matches_simple_chatbot():
+    engine = get_catalog().engine('lightweight')
+    messages = [m.lower() for m in SAMPLE_MESSAGES] + _fuzz_messages(1000)
+    for message in messages:
+        assert engine.match(message) == _legacy_lightweight_intent(message), message
+    assert engine.respond('zzz') in engine.default_responses
+
+
+def test_catalog_hot_reload_swaps_engines():
+    workdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(workdir, 'intents.json')
+        shutil.copy(DEFAULT_CATALOG_PATH, path)
+        catalog = IntentCatalog(path, check_interval=0)
+        old_engine = catalog.engine('full')
+        catalog.wait_for_reload()
+        assert old_engine.match('how about a pizza') is None
+
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        data['profiles']['full']['intents'].append(
+            {'name': 'food', 'phrases': ['pizza'], 'responses': ['Pizza sounds great! 🍕']})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+
+        # The request that finds the check due gets an engine without waiting;
+        # the new one is compiled in the background
+        catalog.engine('full')
+        catalog.wait_for_reload()
+        new_engine = catalog.engine('full')
+        assert new_engine is not old_engine
+        assert new_engine.match('how about a pizza') == 'food'
+        assert new_engine.respond('how about a pizza') == 'Pizza sounds great! 🍕'
+        # Engines already handed out keep working unchanged
+        assert old_engine.match('how about a pizza') is None
+
+        # A broken file keeps the last good catalog
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{not json')
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 2_000_000))
+        catalog.engine('full')
+        catalog.wait_for_reload()
+        assert catalog.engine('full') is new_engine
+        catalog.wait_for_reload()
+    finally:
+        shutil.rmtree(workdir)
+
+
+def test_one_watcher_thread_and_no_reparse_of_an_unchanged_file():
+    import intent_engine
+    workdir = tempfile.mkdtemp()
+    real_load = intent_engine.json.load
+    parses = []
+    try:
+        path = os.path.join(workdir, 'intents.json')
+        shutil.copy(DEFAULT_CATALOG_PATH, path)
+        catalog = IntentCatalog(path, check_interval=0)
+        good_engine = catalog.engine('full')
+        threads = threading.active_count()
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{not json')
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+        intent_engine.json.load = lambda f: parses.append(f.name) or real_load(f)
+        for _ in range(5):
+            assert catalog.engine('full') is good_engine
+            assert catalog.wait_for_reload(5)
+        # The broken file was parsed once, not on every check
+        assert parses == [path]
+        # Every check ran on the one watcher, no thread was started per check
+        assert catalog._watcher.is_alive()
+        assert threading.active_count() == threads
+
+        shutil.copy(DEFAULT_CATALOG_PATH, path)
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 2_000_000))
+        assert catalog.wait_for_reload(5)
+        assert len(parses) == 2
+        assert catalog.engine('full') is not good_engine
+    finally:
+        intent_engine.json.load = real_load
+        shutil.rmtree(workdir)
+
+
+def test_requests_do_not_wait_for_a_reload():
+    catalog = IntentCatalog(DEFAULT_CATALOG_PATH, check_interval=0)
+    engine = catalog.engine('full')
+    catalog.wait_for_reload()
+    compiling = threading.Event()
+    catalog.reload = lambda: compiling.wait(5)  # a recompile that takes a while
+    start = time.perf_counter()
+    assert catalog.engine('full') is engine
+    assert time.perf_counter() - start < 1
+    compiling.set()
+    catalog.wait_for_reload()
+
+
+if __name__ == "__main__":
+    test_phrase_matcher_matches_substring_semantics()
+    test_intent_selection_identical_to_elif_chain()
+    test_priority_order_and_compound_rules()
+    test_lightweight_profile_matches_simple_chatbot()
+    test_catalog_hot_reload_swaps_engines()
+    test_one_watcher_thread_and_no_reparse_of_an_unchanged_file()
+    test_requests_do_not_wait_for_a_reload()
+    print("✅ Intent matcher tests passed")
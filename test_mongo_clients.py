@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test MongoDB pool settings and the process-wide, fork-safe client registry
+"""
+
+import sys
+import os
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import mongodb_config
+from mongodb_config import MongoDBConfig, get_client
+from enhanced_features import EnhancedMemoryManager
+
+UNREACHABLE = 'mongodb://127.0.0.1:9/'
+
+
+def test_pool_settings_come_from_the_environment():
+    assert set(MongoDBConfig().get_connection_options()) >= {'connectTimeoutMS', 'serverSelectionTimeoutMS'}
+    saved = dict(os.environ)
+    os.environ.update({'MONGODB_MAX_POOL_SIZE': '20', 'MONGODB_MIN_POOL_SIZE': '2',
+                       'MONGODB_MAX_IDLE_TIME_MS': '30000', 'MONGODB_WAIT_QUEUE_TIMEOUT_MS': '500',
+                       'MONGODB_COMPRESSORS': 'zlib'})
+    try:
+        options = MongoDBConfig().get_connection_options()
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+    assert options['maxPoolSize'] == 20 and options['minPoolSize'] == 2
+    assert options['maxIdleTimeMS'] == 30000 and options['waitQueueTimeoutMS'] == 500
+    assert options['compressors'] == 'zlib' and 'zlibCompressionLevel' not in options
+
+    pool = get_client(UNREACHABLE, options).options.pool_options
+    assert (pool.max_pool_size, pool.min_pool_size, pool.wait_queue_timeout) == (20, 2, 0.5)
+
+
+def test_clients_are_shared_per_settings():
+    options = {'serverSelectionTimeoutMS': 50}
+    client = get_client(UNREACHABLE, options)
+    assert get_client(UNREACHABLE, dict(options)) is client
+    assert get_client(UNREACHABLE, {'serverSelectionTimeoutMS': 50, 'maxPoolSize': 5}) is not client
+
+
+def test_managers_share_one_client():
+    config = MongoDBConfig()
+    config.MONGODB_URI = UNREACHABLE
+    config.SERVER_SELECTION_TIMEOUT = 50
+    first = EnhancedMemoryManager(mongodb_uri=UNREACHABLE, mongo_config=config, cleanup_interval=None)
+    second = EnhancedMemoryManager(mongodb_uri=UNREACHABLE, mongo_config=config, cleanup_interval=None)
+    assert first.client is second.client is config.get_client()
+    assert not first.mongodb  # unreachable, fell back to memory
+
+
+def test_forked_child_gets_its_own_client():
+    if not hasattr(os, 'fork'):
+        return
+    parent_client = get_client(UNREACHABLE, {'serverSelectionTimeoutMS': 50})
+    pid = os.fork()
+    if pid == 0:
+        child_client = get_client(UNREACHABLE, {'serverSelectionTimeoutMS': 50})
+        os._exit(0 if child_client is not parent_client and get_client(UNREACHABLE, {'serverSelectionTimeoutMS': 50}) is child_client else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert get_client(UNREACHABLE, {'serverSelectionTimeoutMS': 50}) is parent_client
+
+
+def test_close_clients_empties_the_registry():
+    client = get_client(UNREACHABLE, {'serverSelectionTimeoutMS': 51})
+    mongodb_config.close_clients()
+    assert get_client(UNREACHABLE, {'serverSelectionTimeoutMS': 51}) is not client
+
+
+if __name__ == "__main__":
+    test_pool_settings_come_from_the_environment()
+    test_clients_are_shared_per_settings()
+    test_managers_share_one_client()
+    test_forked_child_gets_its_own_client()
+    test_close_clients_empties_the_registry()
+    print("✅ MongoDB client registry tests passed")
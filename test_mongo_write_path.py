@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test that add_message in MongoDB mode costs exactly one round trip
+"""
+
+import sys
+import os
+import asyncio
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from enhanced_features import EnhancedMemoryManager, message_upsert
+from fake_mongo import FakeAsyncCollection, FakeCollection, async_manager, blocking_manager
+
+
+def test_one_command_per_message():
+    collection = FakeCollection()
+    memory = blocking_manager(collection)
+    for i in range(30):
+        before = collection.commands
+        memory.add_message('s1', f"message {i} about work", "ok", 'neutral')
+        assert collection.commands - before == 1
+
+    document = collection.documents['s1']
+    assert document['message_count'] == 30
+    assert len(document['history']) == EnhancedMemoryManager.HISTORY_LIMIT
+    assert document['history'][0]['user'] == "message 10 about work"
+    assert document['conversation_topics'] == ['work']
+
+
+def test_upsert_creates_the_same_document_as_get_session():
+    created = FakeCollection()
+    blocking_manager(created).get_session('s1')
+    upserted = FakeCollection()
+    blocking_manager(upserted).add_message('s1', "hi", "hello")
+    assert set(upserted.documents['s1']) == set(created.documents['s1'])
+    assert upserted.documents['s1']['conversation_topics'] == []
+
+
+def test_update_operators_touch_disjoint_fields():
+    for topics in ([], ['work']):
+        update = message_upsert([{'user': 'x'}], topics, 20)
+        fields = [field for operator in update.values() for field in operator]
+        assert len(fields) == len(set(fields)), update
+
+
+def test_async_manager_uses_one_command_too():
+    collection = FakeAsyncCollection()
+    memory = async_manager(collection)
+
+    async def chat():
+        for i in range(25):
+            await memory.add_message('s1', f"message {i}", "ok")
+
+    asyncio.run(chat())
+    assert collection.commands == 25
+    assert len(collection.documents['s1']['history']) == memory.HISTORY_LIMIT
+
+
+if __name__ == "__main__":
+    test_one_command_per_message()
+    test_upsert_creates_the_same_document_as_get_session()
+    test_update_operators_touch_disjoint_fields()
+    test_async_manager_uses_one_command_too()
+    print("✅ MongoDB write path tests passed")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test the normalized-input intent/sentiment cache
+"""
+
+import sys
+import os
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from caching import LRUCache
+from intent_engine import IntentEngine
+from app import app, respond_to_message, response_cache, fact_store, intent_catalog
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['hits'] == 3
+    assert cache.stats()['misses'] == 1
+    assert len(cache) == 2
+
+
+def test_normalize_keeps_phrase_punctuation():
+    engine = intent_catalog.engine('full')
+    assert engine.normalize('  Hi!') == engine.normalize('hi') == 'hi'
+    assert engine.normalize('THANKS!!') == 'thanks'
+
+    custom = IntentEngine({'intents': [{'name': 'q', 'phrases': ['are you ok?']}]})
+    # '?' belongs to a phrase here, so it must survive normalization
+    assert custom.normalize('Are you ok?') == 'are you ok?'
+
+
+def test_repeated_messages_hit_the_cache():
+    response_cache.clear()
+    response_cache.hits = response_cache.misses = 0
+
+    respond_to_message('hi', 'cache-test')
+    response, sentiment = respond_to_message('Hi!', 'cache-test')
+    assert response == "Hello! I'm STAN, your AI assistant. How can I help you today?"
+    assert sentiment == 'neutral'
+    respond_to_message('thanks!!', 'cache-test')
+    respond_to_message('Thanks', 'cache-test')
+
+    stats = response_cache.stats()
+    assert stats['hits'] == 2
+    assert stats['misses'] == 2
+
+    # The response text is still drawn per request
+    jokes = {respond_to_message('tell me a joke', 'cache-test')[0] for _ in range(60)}
+    assert len(jokes) > 1
+
+
+def test_personalized_messages_bypass_the_cache():
+    response_cache.clear()
+    fact_store.clear()
+
+    response, _ = respond_to_message('My name is Ada', 'p1')
+    assert response.startswith('Nice to meet you, Ada!')
+    response, _ = respond_to_message('My name is Ada', 'p2')
+    assert response.startswith('Nice to meet you, Ada!')
+    assert fact_store.get('p2', 'name') == 'Ada'
+
+    respond_to_message('what did i say my name was?', 'p1')
+    response, _ = respond_to_message('what did i say my name was?', 'p3')
+    assert response == "I don't recall you mentioning that. Could you tell me again?"
+    assert len(response_cache) == 0
+
+
+def test_stats_exposes_cache_counters():
+    client = app.test_client()
+    body = client.get('/stats').get_json()
+    assert set(body['response_cache']) >= {'hits', 'misses', 'hit_ratio', 'size', 'max_size'}
+
+
+if __name__ == "__main__":
+    test_lru_cache_evicts_least_recently_used()
+    test_normalize_keeps_phrase_punctuation()
+    test_repeated_messages_hit_the_cache()
+    test_personalized_messages_bypass_the_cache()
+    test_stats_exposes_cache_counters()
+    print("✅ Response cache tests passed")
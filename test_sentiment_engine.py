@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Regression test: vectorized sentiment labels vs the per-message implementations
+"""
+
+import sys
+import os
+import random
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from sentiment_engine import LEXICONS, SentimentLexicon
+from benchmark_intents import SAMPLE_MESSAGES
+from benchmark_sentiment import build_unique_messages
+
+
+def legacy_app_sentiment(message):
+    """app.analyze_sentiment as originally written"""
+    positive_words = ['happy', 'good', 'great', 'awesome', 'love', 'like', 'wonderful']
+    negative_words = ['sad', 'bad', 'awful', 'hate', 'dislike', 'terrible', 'upset']
+    message_lower = message.lower()
+    positive_count = sum(1 for word in positive_words if word in message_lower)
+    negative_count = sum(1 for word in negative_words if word in message_lower)
+    if positive_count > negative_count:
+        return 'positive'
+    elif negative_count > positive_count:
+        return 'negative'
+    return 'neutral'
+
+
+def legacy_simple_sentiment(text):
+    """SimpleChatbot.analyze_sentiment as originally written"""
+    positive_words = ['good', 'great', 'excellent', 'happy', 'love', 'wonderful', 'amazing']
+    negative_words = ['bad', 'terrible', 'sad', 'hate', 'awful', 'horrible', 'angry']
+    text_lower = text.lower()
+    positive_count = sum(1 for word in positive_words if word in text_lower)
+    negative_count = sum(1 for word in negative_words if word in text_lower)
+    if positive_count > negative_count:
+        return 'positive'
+    elif negative_count > positive_count:
+        return 'negative'
+    return 'neutral'
+
+
+def legacy_enhanced_sentiment(text):
+    """SentimentAnalyzer.analyze as originally written"""
+    positive_words = ['good', 'great', 'awesome', 'amazing', 'wonderful', 'fantastic', 'love', 'like', 'happy', 'excited']
+    negative_words = ['bad', 'terrible', 'awful', 'hate', 'sad', 'angry', 'frustrated', 'disappointed', 'upset']
+    question_words = ['what', 'how', 'why', 'when', 'where', 'who', 'which']
+    text_lower = text.lower()
+    positive_count = sum(1 for word in positive_words if word in text_lower)
+    negative_count = sum(1 for word in negative_words if word in text_lower)
+    has_question = any(word in text_lower for word in question_words)
+    if negative_count > positive_count:
+        return 'negative'
+    elif positive_count > negative_count:
+        return 'positive'
+    elif has_question:
+        return 'questioning'
+    return 'neutral'
+
+
+LEGACY = {
+    'full': legacy_app_sentiment,
+    'lightweight': legacy_simple_sentiment,
+    'enhanced': legacy_enhanced_sentiment,
+}
+
+EDGE_CASES = [
+    "", "good", "GOOD", "goo", "d", "I dislike it", "likely goodbye", "Bad!good?",
+    "terrible\x00wonderful", "\x00", "sad\x00", "LIKE this",  # Kelvin sign lowercases to 'k'
+    "café is great", "naïve but happy", "what's up", "WHY so sad", "upset, but amazing and excited",
+    "hatexcited", "frustrated disappointed angry", "a" * 500 + "love",
+]
+
+
+def regression_set():
+    rng = random.Random(11)
+    messages = list(SAMPLE_MESSAGES) + EDGE_CASES + build_unique_messages(3000)
+    words = sorted({w for lex in LEXICONS.values() for w in lex.words})
+    for _ in range(2000):
+        parts = [rng.choice(words + ['', ' ', 'x', '!', 'É'])[rng.randint(0, 2):] for _ in range(rng.randint(0, 6))]
+        messages.append(rng.choice(['', ' ']).join(parts))
+    return messages
+
+
+@pytest.mark.parametrize('profile', sorted(LEGACY))
+def test_batch_labels_match_legacy_per_message_labels(profile):
+    messages = regression_set()
+    lexicon = LEXICONS[profile]
+    expected = [LEGACY[profile](m) for m in messages]
+    assert [lexicon.analyze(m) for m in messages] == expected
+    assert list(lexicon.analyze_batch(messages)) == expected
+
+
+@pytest.mark.parametrize('profile', sorted(LEGACY))
+def test_repeated_history_uses_same_labels(profile):
+    rng = random.Random(2)
+    messages = [rng.choice(SAMPLE_MESSAGES + EDGE_CASES) for _ in range(5000)]
+    lexicon = LEXICONS[profile]
+    assert list(lexicon.analyze_batch(messages)) == [LEGACY[profile](m) for m in messages]
+
+
+def test_counts_and_empty_batches():
+    lexicon = LEXICONS['full']
+    assert len(lexicon.analyze_batch([])) == 0
+    positive, negative, _ = lexicon.score_counts(["good good great", "sad and bad", "x"])
+    assert list(positive) == [2, 0, 0]
+    assert list(negative) == [0, 2, 0]
+
+
+@pytest.mark.parametrize('profile', sorted(LEGACY))
+def test_batches_without_any_lexicon_bigram(profile):
+    lexicon = LEXICONS[profile]
+    for messages in (['xyz'], ['zz'], ['zz', 'qq']):
+        assert list(lexicon.analyze_batch(messages)) == [LEGACY[profile](m) for m in messages]
+        assert not lexicon.presence_matrix(messages).any()
+
+
+def test_non_vectorizable_lexicon_falls_back_to_loop():
+    lexicon = SentimentLexicon(['so good'], ['not good'])
+    assert list(lexicon.analyze_batch(['so good', 'not good at all'])) == ['positive', 'negative']
+
+
+if __name__ == "__main__":
+    for name in sorted(LEGACY):
+        test_batch_labels_match_legacy_per_message_labels(name)
+        test_repeated_history_uses_same_labels(name)
+        test_batches_without_any_lexicon_bigram(name)
+    test_counts_and_empty_batches()
+    test_non_vectorizable_lexicon_falls_back_to_loop()
+    print("✅ Sentiment engine tests passed")
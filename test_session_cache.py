@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test the read-through session cache in front of MongoDB
+"""
+
+import sys
+import os
+import asyncio
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from async_memory import AsyncEnhancedMemoryManager
+from fake_mongo import FakeAsyncCollection, FakeCollection, fake_database
+from enhanced_features import EnhancedMemoryManager
+from session_cache import SessionCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def cached_manager(collection):
+    return EnhancedMemoryManager(database=fake_database(collection), cleanup_interval=None,
+                                 session_cache_size=100)
+
+
+def test_cache_expires_evicts_and_checks_versions():
+    clock = FakeClock()
+    cache = SessionCache(max_entries=2, ttl=30, clock=clock)
+    assert cache.get('a') is None
+    cache.put('a', {'version': 3})
+    cache.put('b', {'version': 0})
+    assert cache.get('a') == {'version': 3}
+    cache.put('c', {'version': 0})  # evicts 'b', the least recently used
+    assert 'b' not in cache and 'a' in cache
+
+    cache.update('a', lambda session: dict(session, seen=True), version=4)
+    assert cache.get('a')['seen']
+    cache.update('a', lambda session: session, version=6)  # version 5 was written elsewhere
+    assert 'a' not in cache
+
+    clock.now = 31
+    assert cache.get('c') is None
+    metrics = cache.metrics()
+    assert (metrics['hits'], metrics['misses'], metrics['stale'], metrics['evictions']) == (2, 2, 2, 1)
+    assert metrics['hit_ratio'] == 0.5 and metrics['mongo_reads'] == 2
+
+
+def test_touch_is_rate_limited():
+    clock = FakeClock()
+    cache = SessionCache(clock=clock)
+    cache.put('a', {})
+    assert not cache.needs_touch('a', 60)
+    clock.now = 61
+    assert cache.needs_touch('a', 60)
+    assert not cache.needs_touch('a', 60)
+
+
+def test_a_chat_turn_reads_mongodb_once():
+    collection = FakeCollection()
+    memory = cached_manager(collection)
+    commands = collection.commands
+    for turn in range(3):
+        memory.get_session('a')
+        memory.get_context_summary('a')
+        memory.add_message('a', f"message {turn} about work", "ok")
+        assert memory.get_context_summary('a') == "Recent topics: work"
+    # One upsert reads or creates the session, then one write per message
+    assert collection.commands - commands == 1 + 3
+
+    session = memory.get_session('a')
+    assert session['message_count'] == 3 and session['version'] == 3
+    assert session['history'] == collection.documents['a']['history']
+    metrics = memory.get_session_stats()['session_cache']
+    assert metrics['mongo_reads'] == 1 and metrics['hits'] == 9
+
+
+def test_writes_from_another_process_invalidate_the_entry():
+    collection = FakeCollection()
+    here, elsewhere = cached_manager(collection), cached_manager(collection)
+    here.get_session('a')
+    elsewhere.add_message('a', "hello from elsewhere", "hi")
+    here.add_message('a', "hello from here", "hi")
+    assert 'a' not in here.session_cache
+    assert [m['user'] for m in here.get_session('a')['history']] == ["hello from elsewhere", "hello from here"]
+
+
+def test_cache_is_off_by_default_and_in_memory():
+    assert EnhancedMemoryManager(database=fake_database(FakeCollection()), cleanup_interval=None).session_cache is None
+    assert EnhancedMemoryManager(mongodb_uri=None, cleanup_interval=None, session_cache_size=10).session_cache is None
+
+
+def test_async_manager_caches_sessions():
+    collection = FakeAsyncCollection()
+    memory = AsyncEnhancedMemoryManager(database=fake_database(collection), cleanup_interval=None,
+                                        session_cache_size=10)
+
+    async def turn():
+        await memory.get_session('a')
+        await memory.add_message('a', "tell me about the weather", "sunny")
+        return await memory.get_context_summary('a')
+
+    assert asyncio.run(turn()) == "Recent topics: weather"
+    assert collection.commands == 2  # two find_one_and_update: touch-or-create, then the message
+    assert asyncio.run(memory.get_session_stats())['session_cache']['hits'] == 1
+
+
+if __name__ == "__main__":
+    test_cache_expires_evicts_and_checks_versions()
+    test_touch_is_rate_limited()
+    test_a_chat_turn_reads_mongodb_once()
+    test_writes_from_another_process_invalidate_the_entry()
+    test_cache_is_off_by_default_and_in_memory()
+    test_async_manager_caches_sessions()
+    print("✅ Session cache tests passed")
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Test cursor pagination and the streaming NDJSON export of sessions
+"""
+
+import sys
+import os
+import asyncio
+import json
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_mongo import FakeAsyncCollection, FakeCollection, async_manager, blocking_manager
+from benchmark_session_store import in_memory_manager
+from async_memory import AsyncEnhancedMemoryManager, BackgroundLoop
+from session_export import MAX_PAGE_SIZE, export_ids, export_pages, page_args, page_ids, to_ndjson
+
+
+def test_page_ids_follow_the_cursor_in_id_order():
+    sessions = {f"s{i:02d}": None for i in (7, 3, 9, 1, 5)}
+    assert page_ids(sessions, limit=2) == ['s01', 's03']
+    assert page_ids(sessions, 's03', 2) == ['s05', 's07']
+    assert page_ids(sessions, 's07', 2) == ['s09']
+    assert page_ids(sessions, 's09', 2) == []
+
+
+def test_export_fetches_one_batch_at_a_time():
+    fetched = []
+
+    def fetch_page(after, limit):
+        fetched.append(after)
+        return [{'session_id': session_id} for session_id in page_ids(ids, after, limit)]
+
+    ids = dict.fromkeys(f"s{i:03d}" for i in range(25))
+    records = export_pages(fetch_page, batch_size=10)
+    assert next(records) == {'session_id': 's000'}
+    assert fetched == [None]  # nothing beyond the first batch is read yet
+    assert [record['session_id'] for record in records] == sorted(ids)[1:]
+    assert fetched == [None, 's009', 's019']
+
+
+def test_in_memory_exports_hold_one_page_of_ids():
+    fetched = []
+
+    def fetch(session_ids):
+        fetched.append(session_ids)
+        return [{'session_id': session_id} for session_id in session_ids if session_id in ids]
+
+    ids = dict.fromkeys(f"s{i:03d}" for i in reversed(range(25)))
+    records = export_ids(ids, fetch, batch_size=10)
+    assert next(records) == {'session_id': 's000'}
+    assert len(fetched) == 1  # nothing beyond the first page is picked yet
+    ids['s100'] = None  # added ahead of the export's position
+    ids['a000'] = None  # added behind it
+    del ids['s015']  # removed before its page was picked
+    assert [record['session_id'] for record in records] == [f"s{i:03d}" for i in range(1, 25) if i != 15] + ['s100']
+    assert [len(batch) for batch in fetched] == [10, 10, 5]
+
+
+def test_page_args_validate_and_clamp_limit():
+    assert page_args({}) == (None, 100)
+    assert page_args({'cursor': 'abc', 'limit': '5000'}) == ('abc', MAX_PAGE_SIZE)
+    for bad in ('0', 'ten'):
+        try:
+            page_args({'limit': bad})
+        except ValueError:
+            continue
+        raise AssertionError(f"limit={bad} was accepted")
+
+
+def test_managers_export_every_session_once():
+    collection = FakeCollection()
+    for memory in (blocking_manager(collection), in_memory_manager(1000)):
+        for i in range(12):
+            memory.add_message(f"user-{i:02d}", "hello", "hi")
+        exported = list(memory.export_sessions(batch_size=5))
+        assert [session['session_id'] for session in exported] == [f"user-{i:02d}" for i in range(12)]
+        assert all(session['message_count'] == 1 for session in exported)
+        lines = list(to_ndjson(exported))
+        assert json.loads(lines[0])['history'][0]['user'] == "hello"
+
+
+def test_async_manager_pages_and_exports():
+    async def main(memory):
+        await memory.connect()
+        for i in range(7):
+            await memory.add_message(f"user-{i}", "hello", "hi")
+        page = await memory.page_sessions('user-2', 3)
+        exported = [session['session_id'] async for session in memory.export_sessions(batch_size=3)]
+        await memory.close_connection()
+        return page, exported
+
+    for memory in (async_manager(FakeAsyncCollection()), AsyncEnhancedMemoryManager(cleanup_interval=None)):
+        page, exported = asyncio.run(main(memory))
+        assert [session['session_id'] for session in page] == ['user-3', 'user-4', 'user-5']
+        assert exported == [f"user-{i}" for i in range(7)]
+
+
+def test_background_loop_iterates_an_async_export_in_batches():
+    async def numbers():
+        for i in range(7):
+            yield i
+
+    loop = BackgroundLoop()
+    try:
+        assert list(loop.iterate(numbers(), batch_size=3)) == list(range(7))
+        assert list(loop.iterate(numbers(), batch_size=7)) == list(range(7))
+        items = loop.iterate(numbers(), batch_size=3)
+        assert next(items) == 0
+        items.close()  # closes the async generator on the loop too
+    finally:
+        loop.stop()
+
+
+def test_apps_page_and_stream_data():
+    import app
+    import app_backend_only
+
+    for module in (app, app_backend_only):
+        module.chat_sessions.clear()
+        client = module.app.test_client()
+        for i in range(5):
+            client.post('/chat', json={'message': 'hello', 'session_id': f"s{i}"})
+
+        seen, cursor = [], None
+        while True:
+            query = {'limit': 2} if cursor is None else {'limit': 2, 'cursor': cursor}
+            page = client.get('/data', query_string=query).get_json()
+            seen.extend(page['sessions'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        assert seen == [f"s{i}" for i in range(5)]
+        assert client.get('/data', query_string={'limit': 'x'}).status_code == 400
+
+        response = client.get('/data/export')
+        assert response.mimetype == 'application/x-ndjson'
+        records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert [record['session_id'] for record in records] == seen
+        assert records[0]['history'][0]['user'] == 'hello'
+
+
+if __name__ == "__main__":
+    test_page_ids_follow_the_cursor_in_id_order()
+    test_export_fetches_one_batch_at_a_time()
+    test_in_memory_exports_hold_one_page_of_ids()
+    test_page_args_validate_and_clamp_limit()
+    test_managers_export_every_session_once()
+    test_async_manager_pages_and_exports()
+    test_background_loop_iterates_an_async_export_in_batches()
+    test_apps_page_and_stream_data()
+    print("✅ Session export tests passed")
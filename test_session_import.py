@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test the chunked NDJSON import of session archives
+"""
+
+import sys
+import os
+from datetime import datetime
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_mongo import FakeCollection, blocking_manager
+from benchmark_session_store import in_memory_manager
+from session_export import to_ndjson
+from session_import import import_sessions, read_ndjson
+
+
+def test_read_ndjson_is_lazy_and_reports_bad_lines():
+    consumed = []
+
+    def lines():
+        for i in range(10):
+            consumed.append(i)
+            yield f'{{"session_id": "s{i}"}}\n'
+            yield '\n'
+
+    chunks = []
+    stats = import_sessions(read_ndjson(lines()), chunks.append, chunk_size=4,
+                            progress=lambda stats: chunks.append(len(consumed)))
+    # Each chunk was handed over before the next lines were read
+    assert [len(item) if isinstance(item, list) else item for item in chunks] == [4, 4, 4, 8, 2, 10]
+    assert (stats.imported, stats.chunks) == (10, 3)
+
+    for bad, line in (('{"session_id": "a"}\n{oops}\n', 2), ('\n["a"]\n', 2), ('{"history": []}', 1)):
+        try:
+            list(read_ndjson(bad.splitlines()))
+        except ValueError as e:
+            assert str(e).startswith(f"line {line}:"), e
+        else:
+            raise AssertionError(f"{bad!r} was accepted")
+
+
+def test_managers_restore_their_own_exports():
+    for source, target, collection in (
+            (blocking_manager(FakeCollection()), None, FakeCollection()),
+            (in_memory_manager(1000), in_memory_manager(1000), None)):
+        if target is None:
+            target = blocking_manager(collection)
+        for i in range(7):
+            source.add_message(f"user-{i}", "how's work?", "busy", 'neutral')
+        archive = list(to_ndjson(source.export_sessions()))
+
+        commands = collection.commands if collection else 0
+        stats = target.import_sessions(read_ndjson(archive), chunk_size=3)
+        assert (stats.imported, stats.chunks) == (7, 3)
+        if collection:
+            assert collection.commands - commands == 3  # one bulk_write per chunk
+        restored = target.get_session('user-4')
+        assert restored['message_count'] == 1 and restored['history'][0]['user'] == "how's work?"
+        assert 'work' in restored['conversation_topics']
+        assert isinstance(restored['created_at'], datetime)
+        # Restored sessions count as active from the import on
+        assert target.get_session_stats()['total_sessions'] == 7
+        target.add_message('user-4', "and the weather?", "sunny")
+        assert target.get_session('user-4')['message_count'] == 2
+
+
+def test_apps_import_what_they_export():
+    import app
+    import app_backend_only
+
+    for module in (app, app_backend_only):
+        module.chat_sessions.clear()
+        client = module.app.test_client()
+        for i in range(5):
+            client.post('/chat', json={'message': f'hello {i}', 'session_id': f"s{i}"})
+        archive = client.get('/data/export').get_data()
+
+        module.chat_sessions.clear()
+        result = client.post('/data/import?chunk_size=2', data=archive).get_json()
+        assert (result['imported'], result['chunks']) == (5, 3)
+        assert client.get('/data/export').get_data() == archive
+        assert module.chat_sessions.total_messages == 5
+        assert client.post('/data/import', data=b'{"session_id": "x", "history": [{}]}\n').status_code == 400
+
+
+if __name__ == "__main__":
+    test_read_ndjson_is_lazy_and_reports_bad_lines()
+    test_managers_restore_their_own_exports()
+    test_apps_import_what_they_export()
+    print("✅ Session import tests passed")
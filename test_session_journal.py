@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Test the append-only session journal, its snapshots and recovery
+"""
+
+import sys
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from chat_history import Exchange, SessionHistories, session_history
+import storage_backends
+from enhanced_features import EnhancedMemoryManager
+from storage_backends import MemoryBackend
+
+
+def contents(histories):
+    return {session_id: (history.total, [(e.user, e.bot, e.timestamp, e.sentiment) for e in history])
+            for session_id, history in histories.items()}
+
+
+def test_histories_survive_a_restart():
+    directory = tempfile.mkdtemp()
+    histories = SessionHistories()
+    assert histories.open_journal(directory)['replayed_records'] == 0
+    for i in range(30):
+        session_history(histories, f"s{i % 4}").append(Exchange(f"hello {i}", "hi", sentiment='positive'))
+    session_history(histories, 'batch').extend([Exchange("a", "b"), Exchange("c", "d")])
+    histories.load([{'session_id': 'imported', 'history': [{'user': "x", 'bot': "y"}]}])
+    histories.close_journal()
+
+    recovered = SessionHistories()
+    assert recovered.open_journal(directory)['replayed_records'] == 32
+    assert contents(recovered) == contents(histories)
+    assert recovered.total_messages == histories.total_messages == 33
+    recovered.close_journal()
+
+
+def test_snapshots_bound_replay_to_the_tail():
+    directory = tempfile.mkdtemp()
+    histories = SessionHistories()
+    histories.open_journal(directory, snapshot_every=1000)
+    for i in range(250):
+        session_history(histories, f"s{i % 10}").append(Exchange(f"message {i}", "ok"))
+    assert histories.journal.snapshot() == 10
+    for i in range(5):
+        session_history(histories, 's0').append(Exchange(f"tail {i}", "ok"))
+    histories.close_journal()
+    assert sorted(os.listdir(directory)) == ['journal-00000001.ndjson', 'snapshot-00000001.ndjson']
+
+    recovered = SessionHistories()
+    stats = recovered.open_journal(directory)
+    assert (stats['snapshot_records'], stats['replayed_records']) == (10, 5)
+    assert contents(recovered) == contents(histories)
+    assert recovered['s0'].total == 30
+    recovered.close_journal()
+
+
+def test_appends_while_a_snapshot_is_written_are_recovered_once():
+    directory = tempfile.mkdtemp()
+    histories = SessionHistories()
+    histories.open_journal(directory, snapshot_every=1000)
+    for i in range(40):
+        session_history(histories, f"s{i % 8}").append(Exchange(f"message {i}", "ok"))
+    encode = histories.journal.encode
+
+    def encode_between_appends(item):
+        # Sessions are copied shard by shard as the snapshot is written, outside the journal lock
+        for session_id in ('s0', 'late'):
+            session_history(histories, session_id).append(Exchange(f"while writing {item[0]}", "ok"))
+        return encode(item)
+
+    histories.journal.encode = encode_between_appends
+    assert histories.journal.snapshot() >= 8
+    histories.close_journal()
+
+    recovered = SessionHistories()
+    recovered.open_journal(directory)
+    assert contents(recovered) == contents(histories)
+    assert recovered.total_messages == histories.total_messages
+    recovered.close_journal()
+
+
+def test_replay_skips_what_the_snapshot_holds():
+    histories = SessionHistories()
+    histories._apply({'s': 'a', 'n': 3, 'x': [["one", "1", 1.0, 0], ["two", "2", 2.0, 0]], 'r': 1})
+    # Recorded just before the snapshot captured it, replayed after it
+    histories._apply({'s': 'a', 'n': 3, 'x': [["two", "2", 2.0, 0]]})
+    assert [e.user for e in histories['a']] == ["one", "two"] and histories['a'].total == 3
+    histories._apply({'s': 'a', 'n': 5, 'x': [["two", "2", 2.0, 0], ["three", "3", 3.0, 0], ["four", "4", 4.0, 0]]})
+    assert [e.user for e in histories['a']] == ["one", "two", "three", "four"]
+    assert histories['a'].total == histories.total_messages == 5
+
+
+def test_torn_tail_is_ignored():
+    directory = tempfile.mkdtemp()
+    histories = SessionHistories()
+    histories.open_journal(directory)
+    for i in range(3):
+        session_history(histories, 'a').append(Exchange(f"hello {i}", "hi"))
+    histories.close_journal()
+    with open(os.path.join(directory, 'journal-00000000.ndjson'), 'ab') as journal:
+        journal.write(b'{"s":"a","n":4,"x":[["cut')
+
+    recovered = SessionHistories()
+    assert recovered.open_journal(directory)['replayed_records'] == 3
+    assert recovered['a'].total == 3
+    recovered.close_journal()
+
+
+def test_concurrent_appends_share_commits():
+    directory = tempfile.mkdtemp()
+    histories = SessionHistories()
+    histories.open_journal(directory, commit_interval_ms=5)
+
+    def writer(index):
+        for i in range(50):
+            session_history(histories, f"writer-{index}").append(Exchange(f"message {i}", "ok"))
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    metrics = histories.journal.metrics()
+    assert metrics['records'] == 400 and metrics['uncommitted_records'] == 0
+    assert metrics['commits'] < 400  # group commit: one fsync covers many appends
+    histories.close_journal()
+
+
+def test_commit_waits_do_not_hold_the_shard_lock():
+    histories = SessionHistories(shards=1)
+    histories.open_journal(tempfile.mkdtemp())
+    waiting, committed = threading.Event(), threading.Event()
+
+    def slow_wait(sequence):
+        waiting.set()
+        committed.wait(5)
+
+    histories.journal.wait = slow_wait
+    first = threading.Thread(target=lambda: session_history(histories, 'a').append(Exchange("hello", "hi")))
+    first.start()
+    assert waiting.wait(5)
+    histories.journal.wait = lambda sequence: None
+    # Another session of the same shard goes ahead while the first append waits for its commit
+    second = threading.Thread(target=lambda: session_history(histories, 'b').append(Exchange("hey", "hi")))
+    second.start()
+    second.join(5)
+    assert not second.is_alive() and histories.total_messages == 2
+    committed.set()
+    first.join()
+    del histories.journal.wait
+    histories.close_journal()
+
+
+def test_memory_manager_recovers_in_memory_sessions():
+    directory = tempfile.mkdtemp()
+    memory = EnhancedMemoryManager(mongodb_uri=None, cleanup_interval=None, journal_dir=directory)
+    for i in range(25):
+        memory.add_message(f"user-{i % 3}", f"how's work {i}?", "busy", 'neutral')
+    memory.journal.snapshot()
+    memory.add_message('user-0', "and the weather?", "sunny")
+    memory.close_connection()
+
+    recovered = EnhancedMemoryManager(mongodb_uri=None, cleanup_interval=None, journal_dir=directory)
+    assert recovered.get_session_stats()['journal']['recovery']['replayed_records'] == 1
+    for session_id in ('user-0', 'user-1', 'user-2'):
+        before, after = memory.sessions[session_id], recovered.sessions[session_id]
+        assert after['history'] == before['history']
+        assert after['message_count'] == before['message_count']
+        assert after['conversation_topics'] == before['conversation_topics'] == {'work'} | (
+            {'weather'} if session_id == 'user-0' else set())
+    recovered.close_connection()
+
+
+def memory_contents(backend):
+    return {session_id: (session['message_count'], session['history'], session['conversation_topics'])
+            for session_id, session in backend.sessions.items()}
+
+
+def message(text):
+    return {'timestamp': datetime.now().isoformat(), 'user': text, 'bot': "ok", 'sentiment': 'neutral'}
+
+
+def test_memory_snapshot_copies_in_batches_between_changes():
+    directory = tempfile.mkdtemp()
+    backend = MemoryBackend(max_sessions=8, journal_dir=directory)
+    for i in range(40):
+        backend.append(f"s{i % 8}", message(f"message {i}"), ['work'])
+    encode = backend.journal.encode
+    written = []
+
+    def encode_between_changes(item):
+        # Sessions are copied a batch at a time as the snapshot is written
+        written.append(item[0])
+        backend.append('s7', message(f"while writing {item[0]}"), ['weather'])
+        backend.trim('s6', 2)
+        backend.append(f"late-{len(written)}", message("new"), [])  # evicts the idlest session
+        return encode(item)
+
+    storage_backends.SNAPSHOT_COPY_BATCH, batch = 3, storage_backends.SNAPSHOT_COPY_BATCH
+    try:
+        backend.journal.encode = encode_between_changes
+        assert backend.journal.snapshot() == 8
+    finally:
+        storage_backends.SNAPSHOT_COPY_BATCH = batch
+    backend.close()
+    assert written[:3] == ['s0', 's1', 's2'] and 's0' not in backend.sessions
+
+    recovered = MemoryBackend(max_sessions=8, journal_dir=directory)
+    assert memory_contents(recovered) == memory_contents(backend)
+    recovered.close()
+
+
+def test_evicted_and_expired_sessions_stay_gone_after_a_restart():
+    directory = tempfile.mkdtemp()
+    backend = MemoryBackend(max_sessions=3, journal_dir=directory)
+    for session_id in ('a', 'b', 'c'):
+        backend.append(session_id, message("hi"), [])
+    backend.get('d')  # a new session evicts the idlest, 'a'
+    backend.sessions['b']['last_active'] -= timedelta(days=2)
+    assert backend.expire() == (1, 0)
+    backend.close()
+
+    recovered = MemoryBackend(max_sessions=3, journal_dir=directory)
+    assert sorted(recovered.sessions) == ['c']
+    recovered.close()
+
+
+def test_imported_sessions_survive_a_restart():
+    directory = tempfile.mkdtemp()
+    source = EnhancedMemoryManager(mongodb_uri=None, cleanup_interval=None)
+    for i in range(10):
+        source.add_message(f"user-{i % 4}", f"how's work {i}?", "busy", 'neutral')
+    records = list(source.export_sessions())
+
+    memory = EnhancedMemoryManager(mongodb_uri=None, cleanup_interval=None, journal_dir=directory)
+    memory.add_message('user-0', "an older conversation", "ok")
+    assert memory.import_sessions(records).imported == 4
+    memory.add_message('user-0', "and the weather?", "sunny")
+    memory.close_connection()
+
+    recovered = EnhancedMemoryManager(mongodb_uri=None, cleanup_interval=None, journal_dir=directory)
+    assert len(recovered.sessions) == 4
+    for session_id in ('user-0', 'user-1', 'user-2', 'user-3'):
+        before, after = memory.sessions[session_id], recovered.sessions[session_id]
+        assert after['history'] == before['history']
+        assert after['message_count'] == before['message_count']
+        assert after['conversation_topics'] == before['conversation_topics']
+    assert recovered.sessions['user-0']['message_count'] == 4
+    recovered.close_connection()
+
+
+if __name__ == "__main__":
+    test_histories_survive_a_restart()
+    test_snapshots_bound_replay_to_the_tail()
+    test_appends_while_a_snapshot_is_written_are_recovered_once()
+    test_replay_skips_what_the_snapshot_holds()
+    test_torn_tail_is_ignored()
+    test_concurrent_appends_share_commits()
+    test_commit_waits_do_not_hold_the_shard_lock()
+    test_memory_manager_recovers_in_memory_sessions()
+    test_memory_snapshot_copies_in_batches_between_changes()
+    test_evicted_and_expired_sessions_stay_gone_after_a_restart()
+    test_imported_sessions_survive_a_restart()
+    print("✅ Session journal tests passed")
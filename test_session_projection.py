@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test projected session reads: fields and history windows pushed down to MongoDB
+"""
+
+import sys
+import os
+import asyncio
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_mongo import FakeAsyncCollection, FakeCollection, async_manager, blocking_manager, fake_database
+from benchmark_session_store import in_memory_manager
+from enhanced_features import EnhancedMemoryManager, session_projection
+
+
+class RecordingCollection(FakeCollection):
+    def find_one_and_update(self, query, update, projection=None, upsert=False, return_document=False):
+        self.projection = projection
+        return super().find_one_and_update(query, update, projection, upsert, return_document)
+
+
+def chatty_session(memory, turns=12):
+    for turn in range(turns):
+        memory.add_message('a', f"message {turn} about work", "A fairly long reply " * 10, 'neutral')
+
+
+def test_projection_shapes():
+    assert session_projection() is None
+    assert session_projection(history=5) == {'history': {'$slice': -5}}
+    assert session_projection(('conversation_topics',), 5) == {
+        'conversation_topics': 1, 'session_id': 1, 'history': {'$slice': -5}}
+
+
+def test_fields_and_history_are_pushed_down():
+    collection = RecordingCollection()
+    memory = blocking_manager(collection)
+    chatty_session(memory)
+
+    session = memory.get_session('a', fields=('message_count',), history=3)
+    assert collection.projection == {'message_count': 1, 'session_id': 1, 'history': {'$slice': -3}}
+    assert set(session) == {'session_id', 'message_count', 'history'}
+    assert [m['user'] for m in session['history']] == [f"message {turn} about work" for turn in (9, 10, 11)]
+
+    full_bytes = collection.bytes_read
+    memory.get_session('a')
+    full_bytes = collection.bytes_read - full_bytes
+    summary_bytes = collection.bytes_read
+    assert memory.get_context_summary('a') == "Recent topics: work"
+    summary_bytes = collection.bytes_read - summary_bytes
+    assert summary_bytes < full_bytes / 2
+
+
+def test_cache_keeps_whole_documents():
+    collection = RecordingCollection()
+    memory = EnhancedMemoryManager(database=fake_database(collection), cleanup_interval=None,
+                                   session_cache_size=10)
+    chatty_session(memory)
+    session = memory.get_session('a', history=2)
+    assert collection.projection is None  # read whole, then cached
+    assert len(session['history']) == 2
+    assert len(memory.session_cache.get('a')['history']) == 12
+
+
+def test_in_memory_returns_the_whole_session():
+    memory = in_memory_manager(max_sessions=10)
+    chatty_session(memory)
+    assert len(memory.get_session('a', fields=('message_count',), history=2)['history']) == 12
+
+
+def test_async_manager_pushes_projections_down():
+    collection = FakeAsyncCollection()
+    memory = async_manager(collection)
+
+    async def scenario():
+        for turn in range(8):
+            await memory.add_message('a', f"message {turn}", "ok")
+        return await memory.get_session('a', fields=(), history=1)
+
+    session = asyncio.run(scenario())
+    assert set(session) == {'session_id', 'history'}
+    assert session['history'][0]['user'] == "message 7"
+
+
+if __name__ == "__main__":
+    test_projection_shapes()
+    test_fields_and_history_are_pushed_down()
+    test_cache_keeps_whole_documents()
+    test_in_memory_returns_the_whole_session()
+    test_async_manager_pushes_projections_down()
+    print("✅ Session projection tests passed")
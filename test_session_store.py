@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Test the recency-ordered session store and the in-memory memory manager on top of it
+"""
+
+import sys
+import os
+import random
+from datetime import datetime, timedelta
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from session_store import ActivityWindow, SessionStore
+from fake_mongo import FakeCollection, blocking_manager
+from benchmark_session_store import LegacyInMemorySessions, in_memory_manager
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = datetime(2024, 1, 1)
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, **kwargs):
+        self.now += timedelta(**kwargs)
+
+
+def test_touch_moves_session_to_most_recent():
+    clock = FakeClock()
+    store = SessionStore(max_sessions=3, ttl=timedelta(hours=1), clock=clock)
+    for session_id in 'abc':
+        store.add(session_id, {})
+        clock.advance(seconds=1)
+    assert store.touch('a')['last_active'] == clock.now
+    assert store.touch('missing') is None
+    assert list(store) == ['b', 'c', 'a']
+    assert store.oldest()[0] == 'b'
+
+
+def test_full_store_evicts_least_recently_used():
+    store = SessionStore(max_sessions=2)
+    store.add('a', {})
+    store.add('b', {})
+    store.touch('a')
+    store.add('c', {})
+    assert list(store) == ['a', 'c']
+    assert 'b' not in store and len(store) == 2
+
+
+def test_expire_drops_only_idle_sessions():
+    clock = FakeClock()
+    store = SessionStore(max_sessions=10, ttl=timedelta(minutes=30), clock=clock)
+    for session_id in 'abcd':
+        store.add(session_id, {})
+        clock.advance(minutes=10)
+    store.touch('a')
+    # now = +40min: b (+10) is idle 30min (not past the TTL), c and d are newer
+    assert store.expire() == 0
+    clock.advance(minutes=1)
+    assert store.expire() == 1
+    assert list(store) == ['c', 'd', 'a']
+    assert store.count_active(clock.now - timedelta(minutes=15)) == 2
+
+
+def test_manager_matches_original_in_memory_behaviour():
+    rng = random.Random(3)
+    memory = in_memory_manager(max_sessions=50)
+    legacy = LegacyInMemorySessions(50, timedelta(hours=24))
+    for i in range(2000):
+        session_id = f"s{rng.randrange(120)}"
+        memory.get_session(session_id)
+        memory.expiry.tick()
+        legacy.get_session(session_id)
+        assert set(memory.sessions) == set(legacy.sessions), i
+
+
+def test_manager_add_message_and_stats():
+    memory = in_memory_manager(max_sessions=2)
+    memory.add_message('a', "hello", "hi")
+    memory.add_message('b', "how's work", "busy")
+    memory.add_message('a', "and the weather?", "sunny")
+    memory.add_message('c', "bye", "bye")
+    assert list(memory.sessions) == ['a', 'c']
+    assert memory.sessions['a']['message_count'] == 2
+    assert memory.get_context_summary('a') == "Recent topics: weather"
+    stats = memory.get_session_stats()
+    assert stats['total_sessions'] == 2 and stats['active_sessions_last_hour'] == 2
+    assert stats['storage_type'] == 'In-Memory'
+
+    # Activity is counted from accesses, in a sliding one-hour window
+    assert memory.sessions.activity.count(datetime.now() + timedelta(minutes=61)) == 0
+
+    # 'c' is now the least recently active session; let it go idle
+    memory.sessions['c']['last_active'] -= timedelta(hours=25)
+    memory.get_session('a')
+    assert list(memory.sessions) == ['c', 'a']  # expiry is not on the request path
+    memory.expiry.tick()
+    assert list(memory.sessions) == ['a']
+
+
+def test_activity_window_slides():
+    clock = FakeClock()
+    window = ActivityWindow(timedelta(hours=1), clock)
+    window.touch('a')
+    clock.advance(minutes=30)
+    window.touch('b')
+    assert window.count() == 2
+    clock.advance(minutes=31)
+    assert window.count() == 1
+    window.touch('a')
+    clock.advance(minutes=45)
+    assert window.count() == 1
+    window.discard('a')
+    assert window.count() == 0
+
+
+def test_store_keeps_activity_in_step():
+    clock = FakeClock()
+    store = SessionStore(max_sessions=2, ttl=timedelta(hours=24), clock=clock)
+    for session_id in 'abc':
+        store.add(session_id, {})
+    assert store.activity.count() == 2  # 'a' was evicted
+    store.remove('b')
+    assert store.activity.count() == 1
+
+
+def test_mongodb_stats_do_not_scan():
+    collection = FakeCollection()
+    memory = blocking_manager(collection)
+    for i in range(5):
+        memory.add_message(f"s{i}", "hello", "hi")
+    commands = collection.commands
+    stats = memory.get_session_stats()
+    assert collection.commands - commands == 1  # estimated_document_count only
+    assert (stats['total_sessions'], stats['active_sessions_last_hour']) == (5, 5)
+
+
+if __name__ == "__main__":
+    test_touch_moves_session_to_most_recent()
+    test_full_store_evicts_least_recently_used()
+    test_expire_drops_only_idle_sessions()
+    test_manager_matches_original_in_memory_behaviour()
+    test_manager_add_message_and_stats()
+    test_activity_window_slides()
+    test_store_keeps_activity_in_step()
+    test_mongodb_stats_do_not_scan()
+    print("✅ Session store tests passed")
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Stress test the lock-striped session store with 16 threads
+"""
+
+import sys
+import os
+import threading
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from benchmark_sharded_store import distinct_shard_keys, run_threads
+from chat_history import Exchange, SessionHistories, session_history
+from sharded_store import ShardedDict
+from slot_extraction import FactStore
+
+THREADS = 16
+
+
+def test_shards_are_a_power_of_two():
+    assert ShardedDict(8).shards == 8
+    with pytest.raises(ValueError):
+        ShardedDict(12)
+
+
+def test_get_or_create_runs_the_factory_once_per_key():
+    store = ShardedDict()
+    created, seen = [], [[] for _ in range(THREADS)]
+
+    def factory(key):
+        created.append(key)
+        return [key]
+
+    def worker(index):
+        for i in range(200):
+            seen[index].append(store.get_or_create(f"k{i}", lambda: factory(f"k{i}")))
+
+    run_threads(worker, THREADS)
+    assert sorted(created) == sorted(f"k{i}" for i in range(200))
+    assert all(value is store[value[0]] for values in seen for value in values)
+
+
+def test_compute_loses_no_updates():
+    store = ShardedDict(4)
+
+    def worker(index):
+        for i in range(1000):
+            store.compute(f"k{i % 8}", lambda count: (count or 0) + 1)
+
+    run_threads(worker, THREADS)
+    assert [store[f"k{i}"] for i in range(8)] == [THREADS * 1000 // 8] * 8
+    assert store.compute('k0', lambda count: None) is None and 'k0' not in store and len(store) == 7
+
+
+def test_concurrent_appends_are_all_kept_and_counted():
+    sessions = SessionHistories()
+
+    def worker(index):
+        for i in range(300):
+            session_history(sessions, f"s{i % 10}", capacity=5).append(Exchange(f"{index}-{i}", "ok"))
+
+    run_threads(worker, THREADS)
+    assert len(sessions) == 10
+    assert sessions.total_messages == THREADS * 300 == sum(history.total for history in sessions.values())
+    assert all(history.total == THREADS * 30 and len(history) == 5 for history in sessions.values())
+    sessions.pop('s0')
+    assert sessions.total_messages == THREADS * 270
+
+
+def test_fact_store_keeps_every_concurrent_fact():
+    facts = FactStore()
+
+    def worker(index):
+        for i in range(100):
+            facts.update(f"s{i % 5}", {f"fact-{index}-{i}": "x"})
+
+    run_threads(worker, THREADS)
+    assert [len(facts.facts(f"s{i}")) for i in range(5)] == [THREADS * 20] * 5
+
+
+def test_sessions_in_different_shards_do_not_wait_on_each_other():
+    store = ShardedDict()
+    keys = distinct_shard_keys(store, THREADS)
+    # Every thread reaches the barrier only while holding its session's
+    # lock, so it can only trip if no lock waits on another
+    all_holding = threading.Barrier(THREADS, timeout=5)
+    held_together = []
+
+    def worker(index):
+        with store.lock(keys[index]):
+            try:
+                all_holding.wait()
+                held_together.append(index)
+            except threading.BrokenBarrierError:
+                pass
+
+    run_threads(worker, THREADS)
+    assert sorted(held_together) == list(range(THREADS))
+
+    # Keys sharing a shard do wait on each other
+    single = ShardedDict(1)
+    with single.lock(keys[0]):
+        assert not single.lock(keys[1]).acquire(blocking=False)
+
+
+if __name__ == "__main__":
+    test_shards_are_a_power_of_two()
+    test_get_or_create_runs_the_factory_once_per_key()
+    test_compute_loses_no_updates()
+    test_concurrent_appends_are_all_kept_and_counted()
+    test_fact_store_keeps_every_concurrent_fact()
+    test_sessions_in_different_shards_do_not_wait_on_each_other()
+    print("✅ Sharded session store tests passed")
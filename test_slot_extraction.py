@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test catalog-driven slot extraction and the per-session fact store
+"""
+
+import sys
+import os
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from slot_extraction import FactStore, Slot, SlotExtractor
+from app import fact_store, intent_catalog, respond_to_message
+
+
+def test_one_pass_finds_every_slot_in_priority_order():
+    extractor = intent_catalog.engine('full').slots
+    found = extractor.extract("my fav color is green and my name is grace")
+    assert [(slot.key, value) for slot, value in found] == [('name', 'Grace'), ('favorite_color', 'green')]
+    assert extractor.extract("what is my name") == []
+
+
+def test_first_match_of_a_slot_wins():
+    extractor = SlotExtractor([Slot('pet', 'my pet is a {value}')])
+    found = extractor.extract("my pet is a cat, my pet is a dog")
+    assert [value for _, value in found] == ['cat']
+
+
+def test_invalid_slots_are_rejected():
+    with pytest.raises(ValueError):
+        Slot('bad', 'no placeholder')
+    with pytest.raises(ValueError):
+        Slot('bad', '(?P<x>a) {value}')
+    with pytest.raises(ValueError):
+        Slot('bad', '{value}', transform='reverse')
+
+
+def test_recall_uses_stored_facts():
+    extractor = intent_catalog.engine('full').slots
+    facts = {'name': 'Ada', 'favorite_color': 'blue'}
+    assert extractor.recall("what did i say my name was?", facts) == "You told me your name is Ada!"
+    assert extractor.recall("do you remember my color?", facts) == "You said your favorite color is blue!"
+    assert extractor.recall("do you remember my color?", {}) is None
+
+
+def test_chat_responses_match_previous_wording():
+    fact_store.clear()
+    response, _ = respond_to_message("My name is Ada", 'slots')
+    assert response == "Nice to meet you, Ada! I'll remember that. How can I help you today?"
+    response, _ = respond_to_message("My favorite color is blue", 'slots')
+    assert response == "Blue is a lovely color! I'll remember that you like blue."
+    response, _ = respond_to_message("What did I say my name was?", 'slots')
+    assert response == "You told me your name is Ada!"
+    assert fact_store.facts('slots') == {'name': 'Ada', 'favorite_color': 'blue'}
+
+
+def test_fact_store_is_per_session():
+    store = FactStore()
+    store.update('a', {'name': 'Ada'})
+    store.update('a', {'favorite_color': 'red'})
+    store.update('b', {'name': 'Bob'})
+    assert store.facts('a') == {'name': 'Ada', 'favorite_color': 'red'}
+    assert store.get('b', 'name') == 'Bob' and store.get('c', 'name') is None
+    store.forget('a')
+    assert 'a' not in store and len(store) == 1
+    assert store.to_dict() == {'b': {'name': 'Bob'}}
+
+
+if __name__ == "__main__":
+    test_one_pass_finds_every_slot_in_priority_order()
+    test_first_match_of_a_slot_wins()
+    test_invalid_slots_are_rejected()
+    test_recall_uses_stored_facts()
+    test_chat_responses_match_previous_wording()
+    test_fact_store_is_per_session()
+    print("✅ Slot extraction tests passed")
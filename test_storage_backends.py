@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Conformance tests every session storage backend must pass
+(in-memory, MongoDB on a fake collection, and SQLite)
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_mongo import FakeAsyncCollection, FakeCollection
+from enhanced_features import EnhancedMemoryManager
+from storage_backends import (AsyncMemoryBackend, AsyncMongoBackend, MemoryBackend, MongoBackend, SQLiteBackend,
+                              create_backend)
+
+HISTORY_LIMIT = 20
+
+
+def each_backend(max_sessions=1000, ttl=timedelta(hours=24)):
+    """One empty backend of each kind"""
+    collection = FakeCollection()
+    yield MemoryBackend(max_sessions, ttl, HISTORY_LIMIT)
+    yield MongoBackend(lambda: collection, max_sessions, ttl, HISTORY_LIMIT)
+    yield SQLiteBackend(os.path.join(tempfile.mkdtemp(), 'sessions.db'), max_sessions, ttl, HISTORY_LIMIT)
+
+
+def message(i):
+    return {'timestamp': datetime.now().isoformat(), 'user': f"message {i}", 'bot': "ok", 'sentiment': 'neutral'}
+
+
+def users(session):
+    return [m['user'] for m in session['history']]
+
+
+def test_get_creates_then_returns_the_session():
+    for backend in each_backend():
+        session = backend.get('a')
+        assert (session['history'], session['message_count'], list(session['conversation_topics'])) == ([], 0, [])
+        assert session['user_info'] == {} and session['sentiment_history'] == []
+        assert backend.get('a')['created_at'] == session['created_at'], backend.storage_type
+        assert backend.stats()['total_sessions'] == 1
+        backend.close()
+
+
+def test_mongodb_creates_a_session_once_when_two_requests_race():
+    collection = FakeCollection(latency=0.01)
+    backend = MongoBackend(lambda: collection, 1000, timedelta(hours=24), HISTORY_LIMIT)
+    start = threading.Barrier(2)
+    sessions, errors = [], []
+
+    def first_request():
+        start.wait()
+        try:
+            sessions.append(backend.get('new'))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=first_request) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert [s['message_count'] for s in sessions] == [0, 0]
+    assert sessions[0]['created_at'] == sessions[1]['created_at']
+    assert list(collection.documents) == ['new']
+    backend.close()
+
+
+def test_append_trims_history_and_records_topics():
+    for backend in each_backend():
+        for i in range(25):
+            backend.append('a', message(i), ['work'] if i % 2 else ['weather'])
+        session = backend.get('a')
+        assert users(session) == [f"message {i}" for i in range(5, 25)], backend.storage_type
+        assert session['message_count'] == 25
+        assert set(session['conversation_topics']) == {'weather', 'work'}
+        # Backends may return more than was asked for, never less
+        assert users(backend.get('a', history=3))[-3:] == ["message 22", "message 23", "message 24"]
+        narrowed = backend.get('a', fields=('conversation_topics',), history=2)
+        assert set(narrowed['conversation_topics']) == {'weather', 'work'}
+        assert users(narrowed)[-2:] == ["message 23", "message 24"]
+        backend.append('b', message(0), [])
+        assert backend.get('b')['message_count'] == 1
+        backend.close()
+
+
+def test_trim_keeps_the_newest_messages():
+    for backend in each_backend():
+        for i in range(10):
+            backend.append('a', message(i), [])
+        backend.trim('a', 2)
+        assert users(backend.get('a')) == ["message 8", "message 9"], backend.storage_type
+        backend.append('a', message(10), [])
+        session = backend.get('a')
+        assert users(session) == ["message 8", "message 9", "message 10"]
+        assert session['message_count'] == 11
+        backend.trim('missing', 2)
+        backend.close()
+
+
+def test_expire_enforces_the_cap_and_the_ttl():
+    for backend in each_backend(max_sessions=3):
+        for session_id in ('a', 'b', 'c', 'd', 'e'):
+            backend.append(session_id, message(0), [])
+            time.sleep(0.002)
+        backend.expire(budget=10)
+        assert backend.stats()['total_sessions'] == 3, backend.storage_type
+        assert users(backend.get('e')) == ["message 0"]
+        backend.close()
+
+    for backend in each_backend(ttl=timedelta(0)):
+        for session_id in ('a', 'b', 'c'):
+            backend.append(session_id, message(0), [])
+        time.sleep(0.002)
+        if isinstance(backend, MongoBackend):
+            backend.collection.run_ttl_monitor()  # MongoDB expires idle sessions itself
+        assert backend.expire(budget=2)[0] <= 2
+        backend.expire(budget=2)
+        assert backend.stats()['total_sessions'] == 0, backend.storage_type
+        backend.close()
+
+
+def test_stats_count_total_and_active_sessions():
+    for backend in each_backend():
+        for session_id in ('a', 'b', 'c'):
+            backend.get(session_id)
+        stats = backend.stats()
+        assert (stats['total_sessions'], stats['active_sessions_last_hour']) == (3, 3), backend.storage_type
+        assert stats['storage_type'] == backend.storage_type
+        backend.close()
+
+
+def test_sessions_export_from_one_backend_into_another():
+    backends = list(each_backend())
+    source = backends[0]
+    for i in range(30):
+        source.append(f"s{i % 7}", message(i), ['work'])
+    records = list(source.export(batch_size=3))
+    assert [record['session_id'] for record in records] == [f"s{i}" for i in range(7)]
+    for target in backends[1:]:
+        target.load(records[:4])
+        target.load(records[4:])
+        copied = list(target.export(batch_size=3))
+        assert [record['session_id'] for record in copied] == [f"s{i}" for i in range(7)], target.storage_type
+        for original, copy in zip(records, copied):
+            assert copy['history'] == original['history']
+            assert copy['message_count'] == original['message_count']
+            assert list(copy['conversation_topics']) == ['work']
+        target.append('s0', message(99), [])
+        assert users(target.get('s0'))[-2:] == users(records[0])[-1:] + ["message 99"]
+        assert target.stats()['total_sessions'] == 7
+    for backend in backends:
+        backend.close()
+
+
+def test_sqlite_runs_in_wal_mode_and_takes_concurrent_writers():
+    backend = SQLiteBackend(os.path.join(tempfile.mkdtemp(), 'sessions.db'))
+    assert backend.stats()['sqlite']['journal_mode'] == 'wal'
+
+    def writer(index):
+        for i in range(25):
+            backend.append(f"writer-{index}", message(i), ['work'])
+            backend.get(f"writer-{index % 2}", history=5)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(backend.get(f"writer-{i}")['message_count'] == 25 for i in range(6))
+    assert backend.stats()['total_sessions'] == 6
+    backend.close()
+
+
+def test_sqlite_keeps_a_bounded_pool_of_connections():
+    path = os.path.join(tempfile.mkdtemp(), 'sessions.db')
+    backend = SQLiteBackend(path, pool_size=3)
+
+    def open_connections():
+        return sum(os.path.realpath(os.path.join('/proc/self/fd', fd)) == os.path.realpath(path)
+                   for fd in os.listdir('/proc/self/fd'))
+
+    threads = [threading.Thread(target=backend.append, args=(f"s{i}", message(i), [])) for i in range(100)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert backend.stats()['total_sessions'] == 100
+    assert 1 <= open_connections() <= 3
+    backend.close()
+    assert open_connections() == 0
+
+
+def test_async_backends_behave_like_the_blocking_ones():
+    async def use(backend):
+        await backend.connect()
+        for i in range(25):
+            await backend.append(f"s{i % 3}", message(i), ['work'] if i % 2 else [])
+        session = await backend.get('s0')
+        page = await backend.page('s0', 10)
+        exported = [s async for s in backend.export(2)]
+        removed = await backend.expire()
+        stats = await backend.stats()
+        await backend.close()
+        return session, page, exported, removed, stats
+
+    for backend in (AsyncMemoryBackend(history_limit=HISTORY_LIMIT),
+                    AsyncMongoBackend(FakeAsyncCollection(), history_limit=HISTORY_LIMIT)):
+        session, page, exported, removed, stats = asyncio.run(use(backend))
+        assert session['message_count'] == 9 and users(session)[-1] == "message 24", backend.storage_type
+        assert len(session['history']) == 9
+        assert list(session['conversation_topics']) == ['work']
+        assert [s['session_id'] for s in page] == ['s1', 's2']
+        assert [s['session_id'] for s in exported] == ['s0', 's1', 's2']
+        assert removed == (0, 0)
+        assert stats['total_sessions'] == 3 and stats['storage_type'] == backend.storage_type
+
+
+def test_manager_picks_its_backend_by_name():
+    path = os.path.join(tempfile.mkdtemp(), 'sessions.db')
+    memory = EnhancedMemoryManager(backend='sqlite', sqlite_path=path, cleanup_interval=None)
+    memory.add_message('a', "the weather is lovely", "Isn't it?")
+    memory.close_connection()
+
+    reopened = EnhancedMemoryManager(backend='sqlite', sqlite_path=path, cleanup_interval=None)
+    assert not reopened.mongodb and reopened.get_session_stats()['storage_type'] == 'SQLite'
+    assert reopened.get_context_summary('a') == "Recent topics: weather"
+    assert reopened.get_session('a')['message_count'] == 1
+    reopened.close_connection()
+
+    assert EnhancedMemoryManager(backend='memory', cleanup_interval=None).get_session_stats()[
+        'storage_type'] == 'In-Memory'
+    try:
+        create_backend('redis')
+        assert False, "unknown backends are rejected"
+    except ValueError as e:
+        assert 'redis' in str(e)
+
+
+if __name__ == "__main__":
+    test_get_creates_then_returns_the_session()
+    test_mongodb_creates_a_session_once_when_two_requests_race()
+    test_append_trims_history_and_records_topics()
+    test_trim_keeps_the_newest_messages()
+    test_expire_enforces_the_cap_and_the_ttl()
+    test_stats_count_total_and_active_sessions()
+    test_sessions_export_from_one_backend_into_another()
+    test_sqlite_runs_in_wal_mode_and_takes_concurrent_writers()
+    test_sqlite_keeps_a_bounded_pool_of_connections()
+    test_async_backends_behave_like_the_blocking_ones()
+    test_manager_picks_its_backend_by_name()
+    print("✅ Storage backend conformance tests passed")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test the shared per-request preprocessing stage and its consumers
+"""
+
+import sys
+import os
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from text_processing import NormalizedText, preprocess
+from intent_engine import get_catalog
+from sentiment_engine import LEXICONS
+from enhanced_features import EnhancedMemoryManager
+from topic_taxonomy import get_taxonomy
+
+
+def test_normalized_text_fields():
+    text = preprocess("  Hey, What's UP with the weather?  ")
+    assert text.raw == "  Hey, What's UP with the weather?  "
+    assert text.lower == "  hey, what's up with the weather?  "
+    assert text.text == "hey, what's up with the weather?"
+    assert text.tokens == ['hey', "what's", 'up', 'with', 'the', 'weather']
+    assert 'weather' in text.token_set
+    assert text.ngrams(2)[:2] == [('hey', "what's"), ("what's", 'up')]
+    assert text.ngrams(10) == []
+    assert preprocess(text) is text
+
+
+def test_consumers_accept_preprocessed_text():
+    engine = get_catalog().engine('full')
+    memory = object.__new__(EnhancedMemoryManager)
+    memory.taxonomy = get_taxonomy()
+    for message in ["Hello there", "I HATE this awful day", "tell me a JOKE about work", "  random  "]:
+        text = NormalizedText(message)
+        assert engine.match(text) == engine.match(message.lower().strip())
+        assert engine.normalize(text) == engine.normalize(message)
+        for lexicon in LEXICONS.values():
+            assert lexicon.analyze(text) == lexicon.analyze(message)
+
+        from_text = {'conversation_topics': set()}
+        from_str = {'conversation_topics': set()}
+        memory._extract_topics(from_text, text)
+        memory._extract_topics(from_str, message)
+        assert from_text == from_str
+
+
+def test_every_entry_point_chats():
+    import app
+    import app_backend_only
+    import app_lightweight
+
+    for module in (app, app_backend_only, app_lightweight):
+        client = module.app.test_client()
+        response = client.post('/chat', json={'message': 'Hello, I feel great!', 'session_id': 'pre-1'})
+        assert response.status_code == 200, module.__name__
+        body = response.get_json()
+        assert body['sentiment'] == 'positive'
+        assert 'Hello' in body['response'] or 'Hi' in body['response'] or 'Welcome' in body['response']
+
+
+if __name__ == "__main__":
+    test_normalized_text_fields()
+    test_consumers_accept_preprocessed_text()
+    test_every_entry_point_chats()
+    print("✅ Preprocessing tests passed")
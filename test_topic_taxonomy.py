@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test the compiled topic taxonomy and topic tracking in EnhancedMemoryManager
+"""
+
+import sys
+import os
+import random
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from topic_taxonomy import TopicTaxonomy, get_taxonomy
+from benchmark_intents import SAMPLE_MESSAGES
+from fake_mongo import FakeCollection, blocking_manager
+
+LEGACY_TOPICS = ['weather', 'time', 'jokes', 'help', 'technology', 'work', 'family']
+
+
+def test_original_keywords_are_still_found():
+    taxonomy = get_taxonomy()
+    rng = random.Random(5)
+    messages = list(SAMPLE_MESSAGES) + ["sometimes", "homework help", "TECHNOLOGY!", ""]
+    messages += [' '.join(rng.choice(LEGACY_TOPICS + ['x', 'ok', 'net']) for _ in range(4)) for _ in range(500)]
+    for message in messages:
+        expected = [topic for topic in LEGACY_TOPICS if topic in message.lower()]
+        found = taxonomy.extract(message)
+        # Synonyms may add topics, but no original keyword hit is lost
+        assert set(expected) <= set(found), message
+
+
+def test_synonyms_map_to_their_topic():
+    taxonomy = get_taxonomy()
+    assert taxonomy.extract("Is it raining? I need an umbrella") == ['weather']
+    assert taxonomy.extract("my boss moved our meeting") == ['work']
+    assert taxonomy.extract("I can't sleep, so stressed about exams") == ['mental health', 'sleep', 'school']
+    assert taxonomy.extract("nothing in particular") == []
+
+
+def test_custom_taxonomy_keeps_declared_order():
+    taxonomy = TopicTaxonomy([('b', ['beta', 'bee']), ('a', ['alpha', 'alp'])])
+    assert taxonomy.extract("alphabet beta") == ['b', 'a']
+    assert taxonomy.extract("ALP") == ['a']
+    assert taxonomy.topics == ['b', 'a']
+
+
+class RecordingCollection(FakeCollection):
+    """Fake collection that also records the update documents it receives"""
+
+    def __init__(self):
+        super().__init__()
+        self.updates = []
+
+    def update_one(self, query, update, upsert=False):
+        self.updates.append(update)
+        return super().update_one(query, update, upsert)
+
+
+def test_topics_are_written_with_the_message():
+    memory = blocking_manager(RecordingCollection())
+
+    memory.get_session('s1')
+    memory.sessions_collection.updates.clear()
+    memory.add_message('s1', "Tell me a joke about the weather", "Sure!", 'neutral')
+
+    appends = [u for u in memory.sessions_collection.updates if '$push' in u]
+    assert len(appends) == 1
+    assert appends[0]['$addToSet'] == {'conversation_topics': {'$each': ['weather', 'jokes']}}
+    assert not any('$addToSet' in u and '$push' not in u for u in memory.sessions_collection.updates)
+    assert memory.sessions_collection.documents['s1']['conversation_topics'] == ['weather', 'jokes']
+
+
+if __name__ == "__main__":
+    test_original_keywords_are_still_found()
+    test_synonyms_map_to_their_topic()
+    test_custom_taxonomy_keeps_declared_order()
+    test_topics_are_written_with_the_message()
+    print("✅ Topic taxonomy tests passed")
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Test the write-behind buffer: coalesced bulk flushes, read-your-writes and retries
+"""
+
+import sys
+import os
+import subprocess
+import textwrap
+import threading
+import time
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pymongo.errors import BulkWriteError
+
+from fake_mongo import FakeCollection, fake_database
+from enhanced_features import EnhancedMemoryManager
+from write_behind import WriteBehindBuffer
+
+
+def write_behind_manager(collection, interval_ms=60000, ops=500, **options):
+    return EnhancedMemoryManager(database=fake_database(collection), cleanup_interval=None,
+                                 write_behind_ms=interval_ms, write_behind_ops=ops, **options)
+
+
+def test_messages_are_buffered_and_coalesced():
+    collection = FakeCollection()
+    memory = write_behind_manager(collection)
+    commands = collection.commands
+    for i in range(25):
+        memory.add_message('a', f"message {i} about work", "ok", 'neutral')
+    memory.add_message('b', "tell me about the weather", "sunny")
+    assert collection.commands == commands
+    assert memory.write_behind.metrics()['unflushed_ops'] == 26
+
+    assert memory.write_behind.flush() == (26, 0)
+    assert collection.commands - commands == 1  # one bulk_write for both sessions
+    a = collection.documents['a']
+    assert a['message_count'] == 25 and len(a['history']) == memory.HISTORY_LIMIT
+    assert a['history'][-1]['user'] == "message 24 about work"
+    assert a['conversation_topics'] == ['work']
+    assert collection.documents['b']['conversation_topics'] == ['weather']
+    metrics = memory.get_session_stats()['write_behind']
+    assert metrics['unflushed_ops'] == 0 and metrics['flushed_ops'] == 26 and metrics['flushes'] == 1
+    memory.close_connection()
+
+
+def test_reads_see_unflushed_messages():
+    collection = FakeCollection()
+    memory = write_behind_manager(collection)
+    memory.add_message('a', "hello", "hi")
+    memory.write_behind.flush()
+    memory.add_message('a', "let's talk about work", "sure")
+    session = memory.get_session('a')
+    assert session['message_count'] == 2
+    assert [m['user'] for m in session['history']] == ["hello", "let's talk about work"]
+    assert memory.get_context_summary('a') == "Recent topics: work"
+    assert collection.documents['a']['message_count'] == 1
+    memory.close_connection()
+
+
+def test_reads_during_a_flush_see_each_message_once():
+    read_once = threading.Event()
+
+    class Acknowledging(FakeCollection):
+        def find_one_and_update(self, query, update, projection=None, upsert=False, return_document=False):
+            document = super().find_one_and_update(query, update, projection, upsert, return_document)
+            read_once.set()
+            return document
+
+        def bulk_write(self, requests, ordered=True):
+            # The writes are stored, but the acknowledgement is still on its way
+            result = super().bulk_write(requests, ordered)
+            reader.start()
+            assert read_once.wait(5)
+            return result
+
+    collection = Acknowledging()
+    memory = write_behind_manager(collection, session_cache_size=10)
+    memory.add_message('a', "hello", "hi")
+    sessions = []
+    reader = threading.Thread(target=lambda: sessions.append(memory.get_session('a')))
+    memory.write_behind.flush()
+    reader.join()
+    assert sessions[0]['message_count'] == 1 and [m['user'] for m in sessions[0]['history']] == ["hello"]
+    assert memory.get_session('a')['message_count'] == 1  # and that is what was cached
+    memory.close_connection()
+
+
+def test_reads_that_keep_overlapping_flushes_are_bounded():
+    collection = FakeCollection()
+    memory = write_behind_manager(collection)
+    buffer = memory.write_behind
+    reads = []
+
+    def read():
+        # Every optimistic read overlaps a flush of a new message
+        reads.append(len(reads))
+        if not buffer._flush_lock.locked():
+            buffer.add('a', {'user': f"message {len(reads)}"}, [])
+            buffer.flush()
+        return collection.find_one({'session_id': 'a'})
+
+    document, pending = buffer.read(read, lambda document: ['a'])
+    assert len(reads) == WriteBehindBuffer.READ_ATTEMPTS + 1
+    assert document['message_count'] == WriteBehindBuffer.READ_ATTEMPTS and pending == {}
+    memory.close_connection()
+
+
+def test_buffered_writes_are_flushed_at_exit():
+    script = textwrap.dedent("""
+        import atexit
+        from fake_mongo import FakeCollection
+        from test_write_behind import write_behind_manager
+
+        collection = FakeCollection()
+        atexit.register(lambda: print(collection.documents['a']['message_count']))
+        memory = write_behind_manager(collection)
+        memory.add_message('a', "hello", "hi")
+        memory.add_message('a', "still buffered", "ok")
+    """)
+    output = subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, timeout=60)
+    assert output.stdout.split() == ['2'], output.stderr
+
+
+def test_flush_on_op_count_and_on_close():
+    collection = FakeCollection()
+    memory = write_behind_manager(collection, ops=10)
+    for i in range(10):
+        memory.add_message(f"s{i}", "hello", "hi")
+    deadline = time.monotonic() + 2
+    while len(collection.documents) < 10 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(collection.documents) == 10
+
+    memory.add_message('late', "hello", "hi")
+    memory.close_connection()
+    assert 'late' in collection.documents
+    assert not memory.write_behind.running
+    assert memory.write_behind.metrics()['unflushed_ops'] == 0
+
+
+def test_failed_writes_are_requeued_in_order():
+    class Flaky(FakeCollection):
+        failures = [ConnectionError("network"), BulkWriteError({'writeErrors': [{'index': 1}]})]
+
+        def bulk_write(self, requests, ordered=True):
+            if self.failures:
+                error = self.failures.pop(0)
+                if isinstance(error, BulkWriteError):
+                    requests = [r for i, r in enumerate(requests) if i != 1]
+                    super().bulk_write(requests, ordered)
+                raise error
+            return super().bulk_write(requests, ordered)
+
+    collection = Flaky()
+    memory = write_behind_manager(collection)
+    memory.add_message('a', "first", "ok")
+    memory.add_message('b', "first", "ok")
+    assert memory.write_behind.flush() == (0, 2)
+    memory.add_message('b', "second", "ok")
+    assert memory.write_behind.flush() == (1, 2)  # 'a' written, both of 'b' requeued
+    assert memory.write_behind.metrics()['errors'] == 2
+    assert memory.write_behind.flush() == (2, 0)
+    assert [m['user'] for m in collection.documents['b']['history']] == ["first", "second"]
+    memory.close_connection()
+
+
+def test_write_behind_is_opt_in():
+    collection = FakeCollection()
+    memory = EnhancedMemoryManager(database=fake_database(collection), cleanup_interval=None)
+    assert memory.write_behind is None
+    memory.add_message('a', "hello", "hi")
+    assert collection.documents['a']['message_count'] == 1
+    assert 'write_behind' not in memory.get_session_stats()
+
+
+if __name__ == "__main__":
+    test_messages_are_buffered_and_coalesced()
+    test_reads_see_unflushed_messages()
+    test_reads_during_a_flush_see_each_message_once()
+    test_reads_that_keep_overlapping_flushes_are_bounded()
+    test_buffered_writes_are_flushed_at_exit()
+    test_flush_on_op_count_and_on_close()
+    test_failed_writes_are_requeued_in_order()
+    test_write_behind_is_opt_in()
+    print("✅ Write-behind tests passed")
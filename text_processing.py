@@ -0,0 +1,57 @@
+"""
+Per-request text preprocessing for STAN Chatbot
+"""
+
+import re
+from typing import FrozenSet, List, Tuple, Union
+
+TOKEN_PATTERN = re.compile(r"[\w']+")
+
+
+class NormalizedText:
+    """A message normalized once and shared by intent, sentiment and topic code.
+
+    ``lower`` is the lowercased message and ``text`` the lowercased message
+    with surrounding whitespace removed. Tokens, the token set and n-grams are
+    derived lazily on first use, so consumers that only need substring checks
+    do not pay for tokenization.
+    """
+
+    __slots__ = ('raw', 'lower', 'text', '_tokens', '_token_set', '_ngrams')
+
+    def __init__(self, raw: str):
+        self.raw = raw
+        self.lower = raw.lower()
+        self.text = self.lower.strip()
+        self._tokens = None
+        self._token_set = None
+        self._ngrams = {}
+
+    @property
+    def tokens(self) -> List[str]:
+        if self._tokens is None:
+            self._tokens = TOKEN_PATTERN.findall(self.lower)
+        return self._tokens
+
+    @property
+    def token_set(self) -> FrozenSet[str]:
+        if self._token_set is None:
+            self._token_set = frozenset(self.tokens)
+        return self._token_set
+
+    def ngrams(self, n: int = 2) -> List[Tuple[str, ...]]:
+        """Token n-grams of length ``n``"""
+        if n not in self._ngrams:
+            tokens = self.tokens
+            self._ngrams[n] = [tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1)]
+        return self._ngrams[n]
+
+    def __repr__(self) -> str:
+        return f"NormalizedText({self.raw!r})"
+
+
+def preprocess(message: Union[str, NormalizedText]) -> NormalizedText:
+    """Normalize a message, passing already normalized text through unchanged"""
+    if isinstance(message, NormalizedText):
+        return message
+    return NormalizedText(message)
@@ -0,0 +1,68 @@
+"""
+Conversation topic taxonomy for STAN Chatbot
+"""
+
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from intent_engine import PhraseMatcher
+from text_processing import NormalizedText, preprocess
+
+DEFAULT_TAXONOMY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'topics.json')
+
+
+class TopicTaxonomy:
+    """Topics and their synonym phrases, compiled once for single-pass extraction.
+
+    Every phrase of every topic goes into one ``PhraseMatcher``, so a message is
+    scanned once no matter how many topics the taxonomy holds. Phrases match
+    as substrings of the lowercased message, like the original keyword list.
+    """
+
+    # Upper bound on memoised phrase-mask -> topics resolutions
+    MAX_RESOLVED = 4096
+
+    def __init__(self, topics: Sequence[Tuple[str, Sequence[str]]]):
+        self.topics: List[str] = [name for name, _ in topics]
+        self.matcher = PhraseMatcher(phrase for _, phrases in topics for phrase in phrases)
+        self._topic_masks: List[Tuple[str, int]] = []
+        for name, phrases in topics:
+            mask = 0
+            for phrase in phrases:
+                mask |= self.matcher.bits.get(phrase, 0)
+            self._topic_masks.append((name, mask))
+        self._resolved: Dict[int, List[str]] = {0: []}
+
+    def extract(self, text: Union[str, NormalizedText]) -> List[str]:
+        """Topics mentioned in a message, in taxonomy order"""
+        mask = self.matcher.find_mask(preprocess(text).lower)
+        try:
+            return list(self._resolved[mask])
+        except KeyError:
+            pass
+        topics = [name for name, topic_mask in self._topic_masks if mask & topic_mask]
+        if len(self._resolved) < self.MAX_RESOLVED:
+            self._resolved[mask] = topics
+        return list(topics)
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_TAXONOMY_PATH) -> 'TopicTaxonomy':
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls([(topic['name'], topic['phrases']) for topic in data.get('topics', [])])
+
+
+_taxonomy: Optional[TopicTaxonomy] = None
+_taxonomy_lock = threading.Lock()
+
+
+def get_taxonomy() -> TopicTaxonomy:
+    """Return the process-wide topic taxonomy, loading it on first use"""
+    global _taxonomy
+    if _taxonomy is None:
+        with _taxonomy_lock:
+            if _taxonomy is None:
+                _taxonomy = TopicTaxonomy.from_file(os.environ.get('TOPIC_TAXONOMY', DEFAULT_TAXONOMY_PATH))
+    return _taxonomy
@@ -0,0 +1,225 @@
+"""
+Write-behind buffer for MongoDB session history in STAN Chatbot
+"""
+
+import atexit
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class PendingSession:
+    """Exchanges and topics buffered for one session since the last flush"""
+
+    __slots__ = ('messages', 'topics', 'since')
+
+    def __init__(self):
+        self.messages: List[Dict] = []
+        self.topics: List[str] = []
+        self.since = time.monotonic()
+
+    def add(self, message: Dict, topics: List[str]):
+        self.messages.append(message)
+        self.topics.extend(topic for topic in topics if topic not in self.topics)
+
+    def merge(self, newer: 'PendingSession'):
+        """Put ``newer`` after this session's (older, requeued) writes"""
+        self.messages.extend(newer.messages)
+        self.topics.extend(topic for topic in newer.topics if topic not in self.topics)
+
+
+class WriteBehindBuffer:
+    """Buffers add_message writes in process and flushes them with bulk_write.
+
+    Each flush sends one coalesced upsert per session (every message pushed
+    with a single ``$each``/``$slice``), unordered, in one ``bulk_write``. A
+    flush happens every ``flush_interval_ms`` milliseconds and as soon as
+    ``flush_ops`` messages are waiting, so at most that much history is lost
+    if the process dies; ``close`` flushes whatever is left, and ``start``
+    registers it to run at interpreter exit.
+
+    The collection is looked up through ``get_collection`` at every flush.
+    Writes that fail are requeued ahead of newer ones and retried on the next
+    flush. When the error does not say which writes failed (a network error,
+    say), all of them are retried, so a message can be stored twice.
+
+    Reads go through ``read``, which pairs a database read with the writes
+    it cannot contain yet: a read that overlaps a flush may or may not see
+    that flush's writes, so it is made again once the flush is over, at most
+    ``READ_ATTEMPTS`` times before flushes are held off for the read.
+    """
+
+    # Reads tried alongside flushes before one is made with flushes held off
+    READ_ATTEMPTS = 3
+
+    def __init__(self, get_collection: Callable[[], Any], build_update: Callable[[List[Dict], List[str]], Dict],
+                 flush_interval_ms: int = 100, flush_ops: int = 500):
+        self.get_collection = get_collection
+        self.build_update = build_update
+        self.flush_interval_ms = flush_interval_ms
+        self.flush_ops = flush_ops
+        self._pending: Dict[str, PendingSession] = {}
+        self._pending_ops = 0
+        self._in_flight: Dict[str, PendingSession] = {}
+        self._flushes_done = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._metrics = {
+            'flushes': 0,
+            'flushed_ops': 0,
+            'flushed_sessions': 0,
+            'errors': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+        }
+
+    def add(self, session_id: str, message: Dict, topics: List[str]):
+        """Buffer one message; returns without touching the database"""
+        with self._lock:
+            pending = self._pending.get(session_id)
+            if pending is None:
+                pending = self._pending[session_id] = PendingSession()
+            pending.add(message, topics)
+            self._pending_ops += 1
+            full = self._pending_ops >= self.flush_ops
+        if full:
+            self._wake.set()
+
+    def read(self, read: Callable[[], T],
+             session_ids: Callable[[T], Iterable[str]]) -> Tuple[T, Dict[str, PendingSession]]:
+        """Run ``read``, a database read, and return its result with a copy of
+        the unflushed writes of the sessions ``session_ids(result)`` names.
+
+        Every buffered write is then in exactly one of the two. A flush that
+        was in progress for one of the sessions, or finished, while ``read``
+        ran may or may not be in its result, so ``read`` is run again after it;
+        the last attempt holds the flush lock, so none can overlap it.
+        """
+        for _ in range(self.READ_ATTEMPTS):
+            with self._lock:
+                flushes = self._flushes_done
+            result = read()
+            with self._lock:
+                ids = list(session_ids(result))
+                if self._flushes_done == flushes and not any(session_id in self._in_flight for session_id in ids):
+                    return result, self._copy_pending(ids)
+            with self._flush_lock:  # wait for the flush to finish
+                pass
+        with self._flush_lock:
+            result = read()
+            with self._lock:
+                return result, self._copy_pending(session_ids(result))
+
+    def _copy_pending(self, session_ids: Iterable[str]) -> Dict[str, PendingSession]:
+        # The caller holds the lock
+        pending = {}
+        for session_id in session_ids:
+            if session_id in self._pending:
+                pending[session_id] = PendingSession()
+                pending[session_id].merge(self._pending[session_id])
+        return pending
+
+    def flush(self) -> Tuple[int, int]:
+        """Write everything buffered; returns (messages written, messages still pending)"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._in_flight = batch
+                self._pending_ops = 0
+            if not batch:
+                return 0, 0
+
+            session_ids = list(batch)
+            requests = [UpdateOne({"session_id": session_id},
+                                  self.build_update(batch[session_id].messages, batch[session_id].topics),
+                                  upsert=True)
+                        for session_id in session_ids]
+            start = time.perf_counter()
+            failed = set()
+            try:
+                self.get_collection().bulk_write(requests, ordered=False)
+            except BulkWriteError as e:
+                failed = {session_ids[error['index']] for error in e.details.get('writeErrors', [])}
+                logger.error(f"Write-behind flush failed for {len(failed)} sessions: {e}")
+            except Exception as e:
+                failed = set(session_ids)
+                logger.error(f"Write-behind flush failed: {e}")
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            written = sum(len(batch[session_id].messages) for session_id in session_ids if session_id not in failed)
+            if failed:
+                self._requeue({session_id: batch[session_id] for session_id in session_ids if session_id in failed})
+            with self._lock:
+                # Acknowledged writes leave the overlay in the same step
+                self._in_flight = {}
+                self._flushes_done += 1
+                self._metrics['flushes'] += 1
+                self._metrics['flushed_ops'] += written
+                self._metrics['flushed_sessions'] += len(session_ids) - len(failed)
+                self._metrics['errors'] += bool(failed)
+                self._metrics['last_flush_ms'] = elapsed_ms
+                self._metrics['max_flush_ms'] = max(self._metrics['max_flush_ms'], elapsed_ms)
+                return written, self._pending_ops
+
+    def _requeue(self, failed: Dict[str, PendingSession]):
+        with self._lock:
+            for session_id, pending in failed.items():
+                newer = self._pending.get(session_id)
+                if newer is not None:
+                    pending.merge(newer)
+                self._pending[session_id] = pending
+                self._pending_ops += len(pending.messages) - (len(newer.messages) if newer else 0)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval_ms / 1000)
+            self._wake.clear()
+            self.flush()
+
+    def start(self):
+        """Start the background flusher (no-op when already running); what is
+        buffered is flushed at interpreter exit if ``close`` was not called"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='stan-write-behind', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def close(self):
+        """Stop the flusher and write out everything still buffered"""
+        atexit.unregister(self.close)
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        self.flush()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def metrics(self) -> Dict:
+        """Flush counts and cost, plus what is waiting to be written"""
+        with self._lock:
+            oldest = min((pending.since for pending in self._pending.values()), default=None)
+            return dict(
+                self._metrics,
+                running=self.running,
+                flush_interval_ms=self.flush_interval_ms,
+                flush_ops=self.flush_ops,
+                unflushed_ops=self._pending_ops,
+                unflushed_sessions=len(self._pending),
+                oldest_unflushed_ms=(time.monotonic() - oldest) * 1000 if oldest is not None else 0.0,
+            )